@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Benchmark for BART micro-batching.
+Sends N concurrent summarization requests (one chunk each, as concurrent
+/process_document?ai_model=bart calls do) straight to the summarizer, then through the
+micro-batching scheduler, and reports throughput and per-request latency.
+Needs transformers and torch; the model is downloaded on first run.
+Run from the backend directory: python benchmark_bart_batching.py
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from inference_batcher import length_bucket
+from model_tiers import DEFAULT_MODEL_TIER, registry_name
+from nlp_processing import models, get_summary_batcher, _run_summarizer_batch
+
+CONCURRENCY = [1, 4, 8, 16]
+MAX_LENGTH, MIN_LENGTH = 120, 30
+SUMMARIZER = registry_name("summarizer", DEFAULT_MODEL_TIER)
+
+CLAUSE_TEXT = (
+    "The Tenant shall pay the monthly rent of Rs. 25,000 on or before the fifth day of each month. "
+    "If the rent remains unpaid for more than fifteen days, the Landlord may charge interest at twelve "
+    "percent per annum and, after written notice, terminate this Agreement. The security deposit is "
+    "refundable within thirty days after vacating, less any deductions for damage beyond normal wear. "
+)
+
+def make_requests(count: int):
+    # Slightly different texts of similar length, as separate documents would be
+    return [f"Agreement {i}. " + CLAUSE_TEXT * (3 + i % 2) for i in range(count)]
+
+def direct(text: str) -> str:
+    return _run_summarizer_batch([text], (DEFAULT_MODEL_TIER, MAX_LENGTH, MIN_LENGTH, None))[0]
+
+def batched(text: str) -> str:
+    tokens = len(models.get(SUMMARIZER).tokenizer.encode(text, add_special_tokens=False))
+    return get_summary_batcher().submit(text, (DEFAULT_MODEL_TIER, MAX_LENGTH, MIN_LENGTH, length_bucket(tokens))).result()
+
+def timed(function, text):
+    start = time.perf_counter()
+    function(text)
+    return time.perf_counter() - start
+
+def run_benchmark():
+    models.get(SUMMARIZER)
+    direct(CLAUSE_TEXT)  # warm up
+    print(f"{'concurrent':>10} {'mode':>8} {'req/s':>7} {'p50 ms':>8} {'max ms':>8}")
+    for concurrency in CONCURRENCY:
+        texts = make_requests(concurrency * 2)
+        for mode, function in (("direct", direct), ("batched", batched)):
+            with ThreadPoolExecutor(concurrency) as executor:
+                start = time.perf_counter()
+                latencies = sorted(executor.map(lambda text: timed(function, text), texts))
+                elapsed = time.perf_counter() - start
+            print(f"{concurrency:>10} {mode:>8} {len(texts) / elapsed:>7.2f} "
+                  f"{latencies[len(latencies) // 2] * 1000:>8.0f} {latencies[-1] * 1000:>8.0f}")
+    print(get_summary_batcher().stats())
+
+if __name__ == "__main__":
+    run_benchmark()
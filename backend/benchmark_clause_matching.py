@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Benchmark for rule-based clause detection.
+Compares the old two nested loops (every sentence and token walked once for action
+words and again for condition words) with the single compiled PhraseMatcher pass used by
+highlight_key_points, on a synthetic 100-page contract. Parsing is done once up front
+and not included in either timing.
+Uses en_core_web_lg if installed, else en_core_web_sm, else a blank English pipeline
+with a sentencizer (no dependency labels, so fewer obligations are found).
+Run from the backend directory: python benchmark_clause_matching.py
+"""
+
+import time
+
+import spacy
+
+from nlp_processing import LEGAL_ACTION_WORDS, CONDITIONAL_WORDS, _build_clause_matcher, _match_clauses
+
+PAGES = 100
+SENTENCES_PER_PAGE = 30
+REPEATS = 5
+
+CLAUSE_SENTENCES = [
+    "The Tenant shall pay the monthly rent on or before the first day of each month.",
+    "Provided that the Landlord gives thirty days' notice, the rent may be revised annually.",
+    "In the event of a breach, the non-defaulting party may terminate this Agreement.",
+    "This Agreement is subject to the laws of the State of Maharashtra.",
+    "The parties acknowledge that the premises were inspected before signing.",
+    "If the Tenant fails to pay, interest will accrue at twelve percent per annum.",
+    "Unless otherwise agreed in writing, all notices must be delivered by registered post.",
+    "The security deposit is refundable within sixty days after the lease ends.",
+    "The Contractor undertakes to complete the works according to the approved schedule.",
+    "Each party agrees to keep the terms of this Agreement confidential.",
+]
+
+def load_pipeline():
+    for name in ("en_core_web_lg", "en_core_web_sm"):
+        try:
+            return spacy.load(name), name
+        except OSError:
+            continue
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp, "blank en + sentencizer"
+
+def nested_loops(doc):
+    """Old path: _extract_legal_actions followed by _extract_conditional_clauses."""
+    clauses = []
+    for sent in doc.sents:
+        for token in sent:
+            if token.text.lower() in LEGAL_ACTION_WORDS and token.dep_ in ("ROOT", "aux", "auxpass"):
+                clauses.append(("obligation/right", sent.text.strip()))
+                break
+    for sent in doc.sents:
+        for token in sent:
+            if token.text.lower() in CONDITIONAL_WORDS:
+                clauses.append(("condition", sent.text.strip()))
+                break
+    return clauses
+
+def time_call(function, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        function(*args)
+    return (time.perf_counter() - start) / REPEATS
+
+def run_benchmark():
+    nlp, name = load_pipeline()
+    sentence_count = PAGES * SENTENCES_PER_PAGE
+    text = " ".join(CLAUSE_SENTENCES[i % len(CLAUSE_SENTENCES)] for i in range(sentence_count))
+    nlp.max_length = max(nlp.max_length, len(text) + 1)
+
+    start = time.perf_counter()
+    doc = nlp(text)
+    parse = time.perf_counter() - start
+    matcher = _build_clause_matcher(nlp.vocab, nlp.make_doc)
+
+    old_clauses = nested_loops(doc)
+    new_clauses = [(clause["type"], clause["text"]) for clause in _match_clauses(doc, matcher, text)]
+    count = lambda clauses, label: sum(1 for clause_type, _ in clauses if clause_type == label)
+
+    print(f"pipeline: {name}, {PAGES} pages, {len(doc)} tokens, parsed in {parse:.1f}s")
+    print(f"{'':>14} {'ms':>9} {'obligations':>12} {'conditions':>11}")
+    for label, function, args, clauses in (
+        ("nested loops", nested_loops, (doc,), old_clauses),
+        ("phrase matcher", _match_clauses, (doc, matcher, text), new_clauses),
+    ):
+        elapsed = time_call(function, *args)
+        print(f"{label:>14} {elapsed * 1000:>9.1f} {count(clauses, 'obligation/right'):>12} {count(clauses, 'condition'):>11}")
+    print("Conditions found only by the matcher come from multi-word terms (e.g. 'provided that').")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Benchmark for the upload-to-OCR path.
+Compares the old temp-file round trip (write upload to disk, cv2.imread it back)
+with the in-memory decode used by /process_document for normal-sized uploads.
+Decoding dominates both paths, so expect them within noise of each other (0.7x-1.1x on
+a typical dev machine): the in-memory path is about not writing uploads to disk and not
+colliding on file names, not about decode speed.
+Run from the backend directory: python benchmark_upload_decode.py
+"""
+
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from ocr import decode_image_bytes
+
+# (width, height) of synthetic captures: scanner page, phone photo, 12 MP photo
+IMAGE_SIZES = [(1240, 1754), (3024, 4032), (4000, 3000)]
+ENCODINGS = ['.png', '.jpg']
+REPEATS = 10
+
+def make_document_image(width: int, height: int) -> np.ndarray:
+    """Draws lines of dark text on a light background so the encoder sees a realistic page."""
+    img = np.full((height, width, 3), 235, dtype=np.uint8)
+    line_height = max(height // 60, 20)
+    for y in range(line_height * 2, height - line_height, line_height):
+        cv2.putText(img, "The Tenant shall pay the monthly rent on or before the first day.",
+                    (width // 20, y), cv2.FONT_HERSHEY_SIMPLEX, width / 2500, (20, 20, 20), 2)
+    return img
+
+def time_temp_file_path(data: bytes, suffix: str) -> float:
+    """Old path: copy the upload to a temp file and read it back with cv2.imread."""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as buffer:
+            buffer.write(data)
+            path = buffer.name
+        try:
+            img = cv2.imread(path)
+            assert img is not None
+        finally:
+            os.remove(path)
+    return (time.perf_counter() - start) / REPEATS
+
+def time_in_memory_path(data: bytes) -> float:
+    """New path: decode the buffered upload bytes directly."""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        decode_image_bytes(data)
+    return (time.perf_counter() - start) / REPEATS
+
+def run_benchmark():
+    print(f"{'size':>11} {'format':>6} {'bytes':>10} {'temp file ms':>13} {'in-memory ms':>13} {'ratio':>8}")
+    for width, height in IMAGE_SIZES:
+        img = make_document_image(width, height)
+        for suffix in ENCODINGS:
+            ok, encoded = cv2.imencode(suffix, img)
+            assert ok
+            data = encoded.tobytes()
+            disk = time_temp_file_path(data, suffix)
+            memory = time_in_memory_path(data)
+            print(f"{width:>5}x{height:<5} {suffix:>6} {len(data):>10} "
+                  f"{disk * 1000:>13.1f} {memory * 1000:>13.1f} {disk / memory:>7.2f}x")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Clause Taxonomy and Precomputed Concept Embeddings
+The clause concepts used for semantic matching live in a versioned JSON file
+(data/clause_taxonomy.json). Their Sentence-BERT embeddings are built offline into an
+.npy artifact with a manifest recording the taxonomy and encoder fingerprint; workers
+memory-map the artifact read-only instead of re-encoding the taxonomy on every start.
+
+Build (or refresh) the artifact from the backend directory:
+    python clause_taxonomy.py [--taxonomy PATH] [--model NAME | --all-tiers] [--force]
+Each Sentence-BERT model tier gets its own artifact, only rebuilt when the taxonomy
+phrases, the model weights (revision) or the inference backend (PyTorch, ONNX, int8) change.
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from semantic_index import ConceptIndex, normalize_rows
+from onnx_backend import encoder_backend, model_revision
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAXONOMY_PATH = os.getenv(
+    'CLAUSE_TAXONOMY_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'clause_taxonomy.json')
+)
+# Where the embedding artifact is written (default: next to the taxonomy file)
+EMBEDDINGS_DIR = os.getenv('CLAUSE_EMBEDDINGS_DIR')
+
+def load_taxonomy(path: str = DEFAULT_TAXONOMY_PATH) -> Dict:
+    """Reads and validates a taxonomy file: {"version", "concepts": [{"id", "phrase", "category"}]}."""
+    with open(path, encoding="utf-8") as f:
+        taxonomy = json.load(f)
+    concepts = taxonomy.get("concepts") or []
+    if not concepts:
+        raise ValueError(f"Clause taxonomy {path} has no concepts")
+    missing = [index for index, concept in enumerate(concepts) if not concept.get("phrase") or not concept.get("category")]
+    if missing:
+        raise ValueError(f"Clause taxonomy {path}: concepts at {missing[:5]} need a phrase and a category")
+    ids = [concept.get("id", concept["phrase"]) for concept in concepts]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Clause taxonomy {path} has duplicate concept ids")
+    return taxonomy
+
+def encoder_identity(model_name: str, backend: str = None) -> Dict:
+    """
+    What decides the embeddings besides the model name: the weights revision (new weights
+    can be published under the same name) and the backend (int8 ONNX embeddings differ).
+    """
+    return {"revision": model_revision(model_name), "backend": encoder_backend(backend)}
+
+def taxonomy_fingerprint(taxonomy: Dict, model_name: str, encoder: Optional[Dict] = None) -> str:
+    """
+    SHA-256 of everything the embedding matrix depends on: the model, its weights revision
+    and inference backend (`encoder`, default: encoder_identity of the model) and the
+    phrases, in row order. Category or description edits do not invalidate the artifact.
+    """
+    payload = {
+        "model": model_name,
+        "encoder": encoder if encoder is not None else encoder_identity(model_name),
+        "phrases": [concept["phrase"] for concept in taxonomy["concepts"]]
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def artifact_paths(taxonomy_path: str, model_name: str) -> Tuple[str, str]:
+    """(embeddings .npy path, manifest .json path) for a taxonomy file and model; each model tier has its own."""
+    stem = os.path.splitext(os.path.basename(taxonomy_path))[0]
+    model_slug = re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name)
+    directory = EMBEDDINGS_DIR or os.path.dirname(os.path.abspath(taxonomy_path))
+    return (os.path.join(directory, f"{stem}.{model_slug}.embeddings.npy"),
+            os.path.join(directory, f"{stem}.{model_slug}.manifest.json"))
+
+def _artifact_is_current(taxonomy_path: str, model_name: str, fingerprint: str) -> bool:
+    embeddings_path, manifest_path = artifact_paths(taxonomy_path, model_name)
+    if not (os.path.exists(embeddings_path) and os.path.exists(manifest_path)):
+        return False
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f).get("fingerprint") == fingerprint
+
+def _encode(encode: Callable, phrases) -> np.ndarray:
+    return normalize_rows(encode(phrases))
+
+def build_embeddings(taxonomy_path: str, model_name: str, encode: Optional[Callable] = None,
+                     force: bool = False) -> bool:
+    """
+    Encodes every taxonomy phrase and writes the normalised float32 matrix and its manifest.
+    Files are written under temporary names and renamed into place, so workers that already
+    mapped the previous artifact keep reading a consistent file.
+
+    Args:
+        taxonomy_path (str): Taxonomy JSON file
+        model_name (str): Sentence-BERT model the embeddings are for
+        encode (callable): Function mapping a list of phrases to embeddings (default: load the model)
+        force (bool): Rebuild even when the artifact is current
+
+    Returns:
+        bool: True if the artifact was (re)built, False if it was already current
+    """
+    taxonomy = load_taxonomy(taxonomy_path)
+    if encode is None:
+        # Same loader (and backend) the server encodes sentences with
+        from onnx_backend import load_sentence_encoder
+        encode = load_sentence_encoder(model_name).encode
+    # The model is available locally from here on, so its revision is known
+    encoder = encoder_identity(model_name)
+    fingerprint = taxonomy_fingerprint(taxonomy, model_name, encoder)
+    if not force and _artifact_is_current(taxonomy_path, model_name, fingerprint):
+        logger.info(f"Concept embeddings for {taxonomy_path} are current ({fingerprint[:12]})")
+        return False
+
+    phrases = [concept["phrase"] for concept in taxonomy["concepts"]]
+    embeddings = _encode(encode, phrases)
+
+    embeddings_path, manifest_path = artifact_paths(taxonomy_path, model_name)
+    os.makedirs(os.path.dirname(embeddings_path), exist_ok=True)
+    with open(embeddings_path + ".tmp", "wb") as f:
+        np.save(f, embeddings)
+    manifest = {
+        "fingerprint": fingerprint,
+        "taxonomy_version": taxonomy.get("version"),
+        "model": model_name,
+        "model_revision": encoder["revision"],
+        "backend": encoder["backend"],
+        "concepts": len(phrases),
+        "dim": int(embeddings.shape[1]),
+        "built_at": datetime.now().isoformat()
+    }
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(embeddings_path + ".tmp", embeddings_path)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    logger.info(f"Built concept embeddings for {len(phrases)} phrases -> {embeddings_path}")
+    return True
+
+def load_concept_index(taxonomy_path: str, model_name: str, encode: Callable) -> ConceptIndex:
+    """
+    ConceptIndex over the taxonomy, backed by the memory-mapped artifact when it matches the
+    taxonomy, model revision and backend. A missing or stale artifact falls back to encoding
+    the phrases with `encode` in this process (and logs how to build it). Load the model
+    before calling this, so its revision can be resolved from the local cache.
+    """
+    taxonomy = load_taxonomy(taxonomy_path)
+    concepts = taxonomy["concepts"]
+    phrases = [concept["phrase"] for concept in concepts]
+    categories = [concept["category"] for concept in concepts]
+    fingerprint = taxonomy_fingerprint(taxonomy, model_name)
+
+    if _artifact_is_current(taxonomy_path, model_name, fingerprint):
+        embeddings_path, _ = artifact_paths(taxonomy_path, model_name)
+        # Read-only mapping: pages are shared by every worker on the host
+        embeddings = np.load(embeddings_path, mmap_mode="r")
+        logger.info(f"Memory-mapped {len(phrases)} concept embeddings (taxonomy {taxonomy.get('version')})")
+        return ConceptIndex(phrases, embeddings, categories=categories, normalized=True)
+
+    logger.warning(f"Concept embeddings for {taxonomy_path} are missing or stale; encoding "
+                   f"{len(phrases)} phrases in-process. Run 'python clause_taxonomy.py' to build them.")
+    return ConceptIndex(phrases, _encode(encode, phrases), categories=categories, normalized=True)
+
+def main(argv=None) -> int:
+    from model_tiers import MODEL_TIERS, TIER_ORDER
+    from nlp_processing import SBERT_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Build the clause taxonomy embedding artifacts.")
+    parser.add_argument("--taxonomy", default=DEFAULT_TAXONOMY_PATH, help="Taxonomy JSON file")
+    parser.add_argument("--model", action="append", help="Sentence-BERT model name (repeatable; default: the default tier's)")
+    parser.add_argument("--all-tiers", action="store_true", help="Build for every Sentence-BERT model tier")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the artifact is current")
+    args = parser.parse_args(argv)
+
+    models = args.model or [SBERT_MODEL_NAME]
+    if args.all_tiers:
+        models = [MODEL_TIERS["sbert"][tier] for tier in TIER_ORDER]
+
+    logging.basicConfig(level=logging.INFO)
+    for model_name in models:
+        build_embeddings(args.taxonomy, model_name, force=args.force)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Sentence Embedding Cache
+Boilerplate legal sentences repeat across documents, so Sentence-BERT embeddings are
+cached by a hash of the normalised sentence text. Vectors are kept as float16 in a
+byte-bounded in-memory LRU, with an optional memory-mapped file behind it that survives
+restarts and is shared by every worker process pointing at the same directory.
+"""
+
+import os
+import re
+import atexit
+import hashlib
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+def sentence_key(text: str, model_name: str) -> bytes:
+    """
+    Content address of a sentence for a given model: SHA-1 of its normalised text.
+    Normalisation (NFKC, collapsed whitespace) only folds differences that OCR and
+    line wrapping introduce; case is kept because the model is case sensitive.
+    """
+    normalized = _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+    return hashlib.sha1(f"{model_name}\x00{normalized}".encode("utf-8")).digest()
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock on `path` across processes (flock on POSIX, msvcrt on Windows)."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class _DiskTier:
+    """
+    Direct-mapped table in two memory-mapped files: slot i holds one key (20-byte SHA-1)
+    and one float16 vector. A key always lives in slot `key % slots`, so lookups need no
+    index and a newer sentence simply overwrites an older one that maps to the same slot.
+
+    The layout is part of the file names, so a worker configured with other slots or
+    dimensions gets its own table instead of resizing one that others have mapped. Tables
+    are created under a file lock, zero-filled under temporary names and renamed into place.
+    Writes take the same lock, so two processes never interleave their writes to one slot;
+    reads take no lock and treat a slot that changes while it is copied as a miss.
+    """
+    KEY_BYTES = 20
+    EMPTY_KEY = b""
+
+    def __init__(self, directory: str, slots: int, dim: int):
+        os.makedirs(directory, exist_ok=True)
+        self.slots = slots
+        self.dim = dim
+        keys_path = os.path.join(directory, f"keys.{slots}.bin")
+        vectors_path = os.path.join(directory, f"vectors.{slots}x{dim}.f16")
+        self.lock_path = os.path.join(directory, ".lock")
+        with _file_lock(self.lock_path):
+            if not (os.path.exists(keys_path) and os.path.exists(vectors_path)):
+                self._create(directory, keys_path, vectors_path)
+            self.keys = np.memmap(keys_path, dtype=f"S{self.KEY_BYTES}", mode="r+", shape=(slots,))
+            self.vectors = np.memmap(vectors_path, dtype=np.float16, mode="r+", shape=(slots, dim))
+
+    def _create(self, directory: str, keys_path: str, vectors_path: str):
+        # Called with the directory lock held
+        for path, dtype, shape in ((vectors_path, np.float16, (self.slots, self.dim)),
+                                   (keys_path, f"S{self.KEY_BYTES}", (self.slots,))):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            table = np.memmap(tmp_path, dtype=dtype, mode="w+", shape=shape)
+            table.flush()
+            del table
+            os.replace(tmp_path, path)
+        # Tables of other layouts (and the pre-versioned keys.bin / vectors.f16) are unlinked,
+        # not truncated: workers that still map them keep a valid mapping until they restart
+        current = {os.path.basename(keys_path), os.path.basename(vectors_path)}
+        for file_name in os.listdir(directory):
+            if (file_name.startswith(("keys.", "vectors.")) or file_name == "meta.json") and file_name not in current:
+                try:
+                    os.remove(os.path.join(directory, file_name))
+                except OSError:
+                    pass
+        logger.info(f"Created embedding disk cache table in {directory} (slots={self.slots}, dim={self.dim})")
+
+    def _slot(self, key: bytes) -> int:
+        return int.from_bytes(key[:8], "little") % self.slots
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        slot = self._slot(key)
+        stored = key.rstrip(b"\x00")  # Fixed-width bytes come back without trailing NULs
+        if self.keys[slot] != stored:
+            return None
+        vector = np.array(self.vectors[slot])
+        # A writer in another process may have started replacing the slot while it was copied
+        if self.keys[slot] != stored:
+            return None
+        return vector
+
+    def put_many(self, items: List[Tuple[bytes, np.ndarray]]):
+        """Writes (key, vector) pairs under the directory lock, one lock round trip per batch."""
+        with _file_lock(self.lock_path):
+            for key, vector in items:
+                slot = self._slot(key)
+                # Clear the key, write the vector, then publish the key: a reader never pairs a key
+                # with a vector that belongs to (or is half-way through replacing) another sentence
+                self.keys[slot] = self.EMPTY_KEY
+                self.vectors[slot] = vector
+                self.keys[slot] = key
+
+    def flush(self):
+        self.vectors.flush()
+        self.keys.flush()
+
+class SentenceEmbeddingCache:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 disk_slots: int = 100000):
+        """
+        Args:
+            max_bytes (int): Size of the in-memory tier before least recently used vectors are evicted
+            disk_dir (str): Directory for the memory-mapped tier (None keeps the cache in memory only)
+            disk_slots (int): Number of vectors the memory-mapped tier holds
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_slots = disk_slots
+        self._entries = OrderedDict()  # key -> float16 vector
+        self._bytes = 0
+        self._disks: Dict[int, _DiskTier] = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _disk_tier(self, dim: int) -> Optional[_DiskTier]:
+        # Opened on first use, once the embedding size is known; models of different
+        # sizes (e.g. the small and large tiers) each get their own table
+        if not self.disk_dir:
+            return None
+        if dim not in self._disks:
+            self._disks[dim] = _DiskTier(os.path.join(self.disk_dir, f"dim{dim}"), self.disk_slots, dim)
+        return self._disks[dim]
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key).nbytes
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def get_many(self, keys: List[bytes], dim: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        """Cached float16 vectors for `keys`, None where missing. `dim` enables the disk tier lookup."""
+        results = []
+        with self._lock:
+            disk = self._disk_tier(dim) if dim else None
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                elif disk is not None and (vector := disk.get(key)) is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+                results.append(vector)
+        return results
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float16)
+        with self._lock:
+            disk = self._disk_tier(vectors.shape[1])
+            items = [(key, vector.copy()) for key, vector in zip(keys, vectors)]
+            for key, vector in items:
+                self._remember(key, vector)
+            if disk is not None and items:
+                disk.put_many(items)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def flush(self):
+        with self._lock:
+            for disk in self._disks.values():
+                disk.flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_tier": self.disk_dir is not None,
+                "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+def encode_with_cache(model, sentences: List[str], model_name: str,
+                      cache: Optional["SentenceEmbeddingCache"] = None) -> np.ndarray:
+    """
+    Embeds `sentences` with `model` (a SentenceTransformer), encoding only sentences that are
+    neither cached nor repeated earlier in the batch. Returns float32 rows in input order;
+    every vector passes through float16 so cached and freshly encoded results are identical.
+    """
+    cache = cache or get_embedding_cache()
+    dim = model.get_sentence_embedding_dimension()
+    if not sentences:
+        return np.zeros((0, dim), dtype=np.float32)
+    keys = [sentence_key(sentence, model_name) for sentence in sentences]
+    vectors = cache.get_many(keys, dim)
+
+    missing = {}
+    for index, (key, vector) in enumerate(zip(keys, vectors)):
+        if vector is None and key not in missing:
+            missing[key] = index
+    if missing:
+        encoded = np.asarray(model.encode([sentences[index] for index in missing.values()]), dtype=np.float16)
+        cache.put_many(list(missing), encoded)
+        fresh = dict(zip(missing, encoded))
+        vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+    return np.stack(vectors).astype(np.float32)
+
+# Global instance
+embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> SentenceEmbeddingCache:
+    """Get or create the global embedding cache, configured from EMBEDDING_CACHE_* settings."""
+    global embedding_cache
+    with _embedding_cache_lock:
+        if embedding_cache is None:
+            embedding_cache = SentenceEmbeddingCache(
+                max_bytes=int(float(os.getenv('EMBEDDING_CACHE_MAX_MB', '32')) * 1024 * 1024),
+                disk_dir=os.getenv('EMBEDDING_CACHE_DIR') or None,
+                disk_slots=int(os.getenv('EMBEDDING_CACHE_DISK_SLOTS', '100000'))
+            )
+            logger.info(f"Sentence embedding cache enabled ({embedding_cache.max_bytes // (1024 * 1024)}MB in memory"
+                        f"{', disk tier at ' + embedding_cache.disk_dir if embedding_cache.disk_dir else ''})")
+            atexit.register(embedding_cache.flush)
+    return embedding_cache
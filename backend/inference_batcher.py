@@ -0,0 +1,142 @@
+"""
+Dynamic Micro-Batching for Local Model Inference
+Concurrent requests used to call the BART summarizer one at a time, each as its own
+batch-size-1 generate on the same CPU. Callers now hand their inputs to one scheduler
+thread, which collects requests for a few milliseconds, groups them by generation
+settings and input-length bucket (so padding stays small), runs one batched call per
+group and hands each result back to the caller waiting on it.
+"""
+
+import os
+import math
+import time
+import queue
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Largest batch handed to the model, and how long the first request of a batch waits for company
+BATCH_MAX_SIZE = int(os.getenv('BART_BATCH_MAX_SIZE', '8'))
+BATCH_MAX_WAIT_MS = float(os.getenv('BART_BATCH_MAX_WAIT_MS', '10'))
+BATCHING_ENABLED = os.getenv('BART_BATCHING', 'true').lower() == 'true'
+
+def length_bucket(tokens: int) -> int:
+    """Power-of-two bucket of an input length: 1-64, 65-128, 129-256, ... share a bucket."""
+    return max(6, math.ceil(math.log2(max(tokens, 1))))
+
+class _Request:
+    __slots__ = ("payload", "group", "future", "enqueued")
+
+    def __init__(self, payload: Any, group: Hashable):
+        self.payload = payload
+        self.group = group
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+class MicroBatcher:
+    def __init__(self, run_batch: Callable[[List[Any], Hashable], List[Any]], max_batch_size: int = BATCH_MAX_SIZE,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS, name: str = "inference"):
+        """
+        Args:
+            run_batch (callable): (payloads, group) -> one result per payload, in order.
+                Every payload in a call was submitted with the same group key.
+            max_batch_size (int): Largest batch passed to run_batch
+            max_wait_ms (float): Longest a request waits for others before its batch is run
+            name (str): Name of the scheduler thread, for logs
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.queue_wait_seconds = 0.0
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, payload: Any, group: Hashable = None) -> Future:
+        """Queues one input; the returned future resolves to its result (or raises the batch's error)."""
+        self._ensure_started()
+        request = _Request(payload, group)
+        self._queue.put(request)
+        return request.future
+
+    def run(self, payloads: List[Any], group: Hashable = None, timeout: Optional[float] = None) -> List[Any]:
+        """Submits several inputs and blocks until all of their results are back."""
+        futures = [self.submit(payload, group) for payload in payloads]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _collect(self) -> "OrderedDict[Hashable, List[_Request]]":
+        """Blocks for the first request, then gathers more until max_wait passes or a group is full."""
+        first = self._queue.get()
+        groups = OrderedDict({first.group: [first]})
+        deadline = time.perf_counter() + self.max_wait
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            groups.setdefault(request.group, []).append(request)
+            if len(groups[request.group]) >= self.max_batch_size:
+                break
+        # Anything else already queued joins without further waiting
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            groups.setdefault(request.group, []).append(request)
+        return groups
+
+    def _run(self):
+        while True:
+            groups = self._collect()
+            # Oldest group first, each split into batches of at most max_batch_size
+            for group, requests in groups.items():
+                for start in range(0, len(requests), self.max_batch_size):
+                    self._dispatch(group, requests[start:start + self.max_batch_size])
+
+    def _dispatch(self, group: Hashable, requests: List[_Request]):
+        started = time.perf_counter()
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(requests)
+            self.queue_wait_seconds += sum(started - request.enqueued for request in requests)
+        try:
+            results = self.run_batch([request.payload for request in requests], group)
+            if len(results) != len(requests):
+                raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(requests)} inputs")
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(requests)} failed: {e}")
+            for request in requests:
+                request.future.set_exception(e)
+            return
+        for request, result in zip(requests, results):
+            request.future.set_result(result)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "mean_queue_wait_ms": round(self.queue_wait_seconds / self.requests * 1000, 2) if self.requests else 0.0,
+                "queued": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000
+            }
@@ -0,0 +1,374 @@
+"""
+LLM Response Cache
+Identical documents and identical /generate_document form submissions used to call the
+LLM again every time. Responses are cached by a hash of the normalised prompt, the model
+and its generation config: a byte-bounded in-memory LRU in front of an optional tier of
+one JSON file per response on disk (LLM_CACHE_DIR), which survives restarts and is shared
+by every worker process pointing at the same directory. Entries expire after a TTL; optionally an expired entry is still
+served for a grace period while a background call refreshes it (stale-while-revalidate).
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+# Bumped when the key or entry format changes, so old disk entries are ignored
+CACHE_FORMAT_VERSION = 1
+
+def normalize_prompt(prompt: str) -> str:
+    """NFKC and collapsed whitespace: prompts that differ only in indentation or line wrapping share an entry."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", prompt)).strip()
+
+def llm_cache_key(prompt: str, model: str, generation_config: Optional[Dict] = None) -> str:
+    """SHA-256 of the normalised prompt, the model name and the generation config."""
+    payload = json.dumps({
+        "v": CACHE_FORMAT_VERSION,
+        "model": model,
+        "config": generation_config or {},
+        "prompt": normalize_prompt(prompt)
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class _DiskTier:
+    """One JSON file per response, fanned out into subdirectories by the first two hex digits of the key."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+            return entry["value"], entry["stored_at"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, value: Any, stored_at: float, model: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so other processes never read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"value": value, "stored_at": stored_at, "model": model}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write LLM cache entry {key[:12]}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def purge(self, older_than: float) -> int:
+        """Deletes entries stored before `older_than` (epoch seconds); returns how many."""
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                try:
+                    if os.path.getmtime(path) < older_than:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
+
+class LLMResponseCache:
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 ttl_seconds: float = 7 * 24 * 3600, stale_seconds: float = 0):
+        """
+        Args:
+            max_bytes (int): Size of the in-memory tier before least recently used responses are evicted
+            disk_dir (str): Directory for the on-disk tier (None keeps the cache in memory only)
+            ttl_seconds (float): Age after which a response is no longer served as fresh (0 never expires)
+            stale_seconds (float): How long past the TTL a response is still served while it is
+                refreshed in the background (0 disables stale-while-revalidate)
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries = OrderedDict()  # key -> (value, stored_at, size in bytes)
+        self._bytes = 0
+        self._disk = _DiskTier(disk_dir) if disk_dir else None
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @staticmethod
+    def _entry_size(value: Any) -> int:
+        # Approximate footprint: the serialised response plus a fixed per-entry overhead
+        return len(json.dumps(value, default=str).encode("utf-8")) + 200
+
+    def _age_state(self, stored_at: float) -> Optional[str]:
+        """'fresh', 'stale' (past the TTL, within the grace period) or None (expired)."""
+        if not self.ttl_seconds:
+            return "fresh"
+        age = time.time() - stored_at
+        if age < self.ttl_seconds:
+            return "fresh"
+        if age < self.ttl_seconds + self.stale_seconds:
+            return "stale"
+        return None
+
+    def _remember(self, key: str, value: Any, stored_at: float, size: int):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[2]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, stored_at, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    # A lookup is split so the disk read can happen outside the lock (and, on the async
+    # path, off the event loop): the memory tier is checked, the disk tier is read only if
+    # memory has nothing fresh, then the two are reconciled under the lock again.
+
+    def _memory_entry(self, key: str) -> Optional[Tuple[Any, float, int]]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def _needs_disk(self, entry: Optional[Tuple[Any, float, int]]) -> bool:
+        # Missing or aged in memory: another worker may have stored a newer response on disk
+        return self._disk is not None and (entry is None or self._age_state(entry[1]) != "fresh")
+
+    def _resolve(self, key: str, entry: Optional[Tuple[Any, float, int]],
+                 found: Optional[Tuple[Any, float]]) -> Tuple[Optional[Any], Optional[str], bool]:
+        """Returns (value, state, whether the disk entry has expired and should be deleted)."""
+        source = "memory"
+        if found is not None and (entry is None or found[1] > entry[1]):
+            entry = (found[0], found[1], self._entry_size(found[0]))
+            source = "disk"
+        state = self._age_state(entry[1]) if entry is not None else None
+        with self._lock:
+            if state is None:
+                # Expired beyond the grace period (or absent): drop it from both tiers
+                if entry is not None and key in self._entries:
+                    self._bytes -= self._entries.pop(key)[2]
+                self.misses += 1
+                return None, None, entry is not None and self._disk is not None
+            if source == "memory":
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.memory_hits += 1
+            else:
+                self._remember(key, entry[0], entry[1], entry[2])
+                self.disk_hits += 1
+            if state == "stale":
+                self.stale_hits += 1
+            return entry[0], state, False
+
+    def lookup(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        Returns:
+            Tuple: (value, 'fresh' | 'stale') for a servable entry, (None, None) on a miss
+        """
+        entry = self._memory_entry(key)
+        found = self._disk.get(key) if self._needs_disk(entry) else None
+        value, state, expired = self._resolve(key, entry, found)
+        if expired:
+            self._disk.delete(key)
+        return value, state
+
+    async def lookup_async(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """lookup with disk reads and deletes in a worker thread, so the event loop never waits on the filesystem."""
+        entry = self._memory_entry(key)
+        found = await asyncio.to_thread(self._disk.get, key) if self._needs_disk(entry) else None
+        value, state, expired = self._resolve(key, entry, found)
+        if expired:
+            await asyncio.to_thread(self._disk.delete, key)
+        return value, state
+
+    def _put_memory(self, key: str, value: Any) -> float:
+        stored_at = time.time()
+        size = self._entry_size(value)
+        with self._lock:
+            self._remember(key, value, stored_at, size)
+        return stored_at
+
+    def put(self, key: str, value: Any, model: str = ""):
+        stored_at = self._put_memory(key, value)
+        if self._disk is not None:
+            self._disk.put(key, value, stored_at, model)
+
+    async def put_async(self, key: str, value: Any, model: str = ""):
+        """put with the disk write in a worker thread."""
+        stored_at = self._put_memory(key, value)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.put, key, value, stored_at, model)
+
+    def _claim_refresh(self, key: str) -> bool:
+        # One background refresh per key at a time
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self.refreshes += 1
+            return True
+
+    def _finish_refresh(self, key: str, error: Optional[Exception] = None):
+        with self._lock:
+            self._refreshing.discard(key)
+            if error is not None:
+                self.refresh_errors += 1
+        if error is not None:
+            logger.warning(f"Background refresh of LLM cache entry {key[:12]} failed: {error!r}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], model: str = "",
+                       accept: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Cached value for `key`, or compute() stored under it.
+
+        Args:
+            key (str): llm_cache_key of the call
+            compute (callable): Makes the LLM call; exceptions propagate and nothing is cached
+            model (str): Model name, recorded with the disk entry
+            accept (callable): Only values for which accept(value) is true are cached
+        """
+        value, state = self.lookup(key)
+        if state == "stale" and self._claim_refresh(key):
+            def refresh():
+                try:
+                    self._store(key, compute(), model, accept)
+                    self._finish_refresh(key)
+                except Exception as e:
+                    self._finish_refresh(key, e)
+            threading.Thread(target=refresh, name="llm-cache-refresh", daemon=True).start()
+        if state is not None:
+            return value
+        value = compute()
+        self._store(key, value, model, accept)
+        return value
+
+    async def get_or_compute_async(self, key: str, compute: Callable[[], Awaitable[Any]], model: str = "",
+                                   accept: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        get_or_compute for coroutines: `compute` returns an awaitable, disk I/O runs in worker
+        threads and stale refreshes run as tasks.
+        """
+        value, state = await self.lookup_async(key)
+        if state == "stale" and self._claim_refresh(key):
+            async def refresh():
+                try:
+                    await self._store_async(key, await compute(), model, accept)
+                    self._finish_refresh(key)
+                except Exception as e:
+                    self._finish_refresh(key, e)
+            # Keep a reference so the task is not garbage collected mid-flight
+            task = asyncio.get_running_loop().create_task(refresh())
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+        if state is not None:
+            return value
+        value = await compute()
+        await self._store_async(key, value, model, accept)
+        return value
+
+    def _store(self, key: str, value: Any, model: str, accept: Optional[Callable[[Any], bool]]):
+        if accept is None or accept(value):
+            self.put(key, value, model)
+
+    async def _store_async(self, key: str, value: Any, model: str, accept: Optional[Callable[[Any], bool]]):
+        if accept is None or accept(value):
+            await self.put_async(key, value, model)
+
+    def purge_expired(self) -> int:
+        """Deletes disk entries past their TTL and grace period; returns how many. Walks the whole directory."""
+        if self._disk is None or not self.ttl_seconds:
+            return 0
+        removed = self._disk.purge(time.time() - self.ttl_seconds - self.stale_seconds)
+        if removed:
+            logger.info(f"Purged {removed} expired LLM cache entries from {self.disk_dir}")
+        return removed
+
+    def start_purge(self) -> Optional[threading.Thread]:
+        """Runs purge_expired in a daemon thread (used at server startup); None without a disk tier."""
+        if self._disk is None or not self.ttl_seconds:
+            return None
+        thread = threading.Thread(target=self.purge_expired, name="llm-cache-purge", daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "disk_tier": self.disk_dir is not None,
+                "ttl_seconds": self.ttl_seconds,
+                "stale_seconds": self.stale_seconds,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0
+            }
+
+# Global instance
+llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+# Enabled by default; LLM_CACHE_ENABLED=false sends every call to the provider
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """
+    Get or create the global LLM response cache, configured from LLM_CACHE_* settings (None if disabled).
+    The disk tier is opt-in: responses contain summaries of uploaded documents, so they are only
+    written to disk when LLM_CACHE_DIR names a directory.
+    """
+    global llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _llm_cache_lock:
+        if llm_cache is None:
+            llm_cache = LLMResponseCache(
+                max_bytes=int(float(os.getenv('LLM_CACHE_MAX_MB', '16')) * 1024 * 1024),
+                disk_dir=os.getenv('LLM_CACHE_DIR') or None,
+                ttl_seconds=float(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600))),
+                stale_seconds=float(os.getenv('LLM_CACHE_STALE_SECONDS', '0'))
+            )
+            logger.info(f"LLM response cache enabled ({llm_cache.max_bytes // (1024 * 1024)}MB in memory"
+                        f"{', disk tier at ' + llm_cache.disk_dir if llm_cache.disk_dir else ''})")
+    return llm_cache
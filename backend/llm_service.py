@@ -4,10 +4,18 @@ Integrates with Google Gemini API for advanced document summarization and key po
 """
 
 import os
+import re
+import json
+import asyncio
+import threading
+import weakref
 import google.generativeai as genai
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 import logging
 from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError, validator
+
+from llm_cache import llm_cache_key, get_llm_cache
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +24,137 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Async calls: how many Gemini requests may be in flight at once per process, and how long
+# one may take before it is abandoned (0 disables the timeout)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '256'))
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+# Gemini mode asks for summary and key points in one JSON response (sending the document once)
+# instead of two separate calls; the two calls remain the fallback when the JSON is unusable
+LLM_FUSED_ANALYSIS = os.getenv('LLM_FUSED_ANALYSIS', 'true').lower() == 'true'
+
+# --- Prompts and response parsing (shared by the blocking and async calls) ---
+
+def _summary_prompt(text: str) -> str:
+    return f"""
+    You are a legal document analysis expert. Analyze the following legal document text and provide a comprehensive, professional summary.
+
+    Focus on:
+    1. Document type and purpose
+    2. Key parties involved
+    3. Main obligations and rights
+    4. Important terms and conditions
+    5. Potential risks or concerns
+    6. Critical deadlines or timeframes
+
+    Document Text:
+    {text}
+
+    Provide a clear, structured summary in 2-3 paragraphs that a non-lawyer can understand, while highlighting the most important legal aspects.
+    """
+
+def _key_points_prompt(text: str) -> str:
+    return f"""
+    You are a legal document analysis expert. Analyze the following legal document and extract the most crucial points that someone should be aware of before signing.
+
+    Focus on identifying:
+    1. Financial obligations and payment terms
+    2. Liability and indemnification clauses
+    3. Termination conditions and notice periods
+    4. Renewal and cancellation terms
+    5. Intellectual property rights
+    6. Confidentiality requirements
+    7. Dispute resolution mechanisms
+    8. Governing law and jurisdiction
+    9. Risk factors and potential consequences
+    10. Time-sensitive obligations
+
+    Document Text:
+    {text}
+
+    Return ONLY a list of the most important points, each starting with an appropriate emoji and written in clear, actionable language. Limit to 8-10 key points maximum.
+    """
+
+def _parse_key_points(points_text: str) -> List[str]:
+    # Parse the response into individual points
+    # Split by lines and clean up
+    points = []
+    for line in points_text.split('\n'):
+        line = line.strip()
+        if line and not line.startswith('#') and len(line) > 10:
+            # Remove bullet points and numbering
+            cleaned_line = line.lstrip('•-*1234567890. ')
+            if cleaned_line:
+                points.append(cleaned_line)
+
+    return points[:10]  # Limit to 10 points maximum
+
+def _analysis_prompt(text: str) -> str:
+    return f"""
+    You are a legal document analysis expert. Analyze the following legal document text and return both a summary and its crucial points.
+
+    The summary should be a clear, structured summary in 2-3 paragraphs that a non-lawyer can understand, covering the document type and purpose, key parties, main obligations and rights, important terms and conditions, potential risks or concerns, and critical deadlines or timeframes.
+
+    The key points should be the 8-10 most important points someone should be aware of before signing (financial obligations, liability and indemnification, termination and notice, renewal and cancellation, intellectual property, confidentiality, dispute resolution, governing law, risks, time-sensitive obligations), each starting with an appropriate emoji and written in clear, actionable language.
+
+    Document Text:
+    {text}
+
+    Respond with ONLY a JSON object, no markdown, in exactly this form:
+    {{"summary": "<summary text>", "key_points": ["<point>", "<point>"]}}
+    """
+
+class DocumentAnalysis(BaseModel):
+    """Schema the single-call analysis response must satisfy."""
+    summary: str
+    key_points: List[str]
+
+    @validator("summary")
+    def summary_not_empty(cls, value):
+        value = value.strip()
+        if not value:
+            raise ValueError("summary is empty")
+        return value
+
+    @validator("key_points")
+    def key_points_not_empty(cls, value):
+        points = [point.strip().lstrip('•-* ') for point in value if point and point.strip()]
+        if not points:
+            raise ValueError("no key points")
+        return points[:10]  # Limit to 10 points maximum
+
+def _parse_analysis(response_text: str) -> DocumentAnalysis:
+    """
+    Validates a single-call analysis response.
+
+    Raises:
+        ValueError: The response is not a JSON object matching DocumentAnalysis
+    """
+    # Models sometimes wrap JSON in a markdown fence or add a sentence around it
+    match = re.search(r"\{.*\}", response_text, re.DOTALL)
+    if not match:
+        raise ValueError("no JSON object in response")
+    try:
+        return DocumentAnalysis.parse_obj(json.loads(match.group(0)))
+    except (json.JSONDecodeError, ValidationError) as e:
+        raise ValueError(f"invalid analysis JSON: {e}")
+
+def _is_valid_analysis(response_text: str) -> bool:
+    # Unusable single-call responses are not cached, so the next upload asks again
+    try:
+        _parse_analysis(response_text)
+        return True
+    except ValueError:
+        return False
+
+def _generation_config(max_tokens: int) -> Dict:
+    # Configure generation parameters for longer, more comprehensive responses
+    return {
+        'max_output_tokens': max_tokens,
+        'temperature': 0.3,  # Lower temperature for more consistent legal language
+        'top_p': 0.8,
+        'top_k': 40
+    }
+
 class LLMService:
     def __init__(self):
         """Initialize the LLM service with Google Gemini."""
@@ -25,10 +164,104 @@ class LLMService:
         
         # Configure Gemini
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model_name = 'gemini-1.5-flash'
+        self.model = genai.GenerativeModel(self.model_name)
+        # Responses are cached by prompt, model and generation config (see llm_cache.py)
+        self.cache = get_llm_cache()
+
+        self.max_concurrency = max(1, LLM_MAX_CONCURRENCY)
+        self.timeout = LLM_TIMEOUT_SECONDS or None
+        # asyncio semaphores belong to one event loop; keep one per loop using the service
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.fused_analyses = 0
+        self.fused_fallbacks = 0
         
         logger.info("LLM Service initialized with Google Gemini")
 
+    def _generate(self, prompt: str, generation_config: Dict = None,
+                  accept: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        One blocking Gemini call, answered from the response cache when the same prompt and
+        generation config were sent before. Only responses passing `accept` are cached.
+        """
+        def call():
+            response = self.model.generate_content(prompt, generation_config=generation_config)
+            return response.text.strip()
+
+        if self.cache is None:
+            return call()
+        key = llm_cache_key(prompt, self.model_name, generation_config)
+        return self.cache.get_or_compute(key, call, model=self.model_name, accept=accept)
+
+    # --- Async API ---
+    # The *_async methods use the SDK's non-blocking generate_content_async, so a slow Gemini
+    # round-trip only suspends its own request; up to LLM_MAX_CONCURRENCY calls wait on the
+    # network together, each bounded by LLM_TIMEOUT_SECONDS.
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def _count(self, field: str, delta: int = 1):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    async def _generate_async(self, prompt: str, generation_config: Dict = None,
+                              accept: Optional[Callable[[str], bool]] = None) -> str:
+        """Non-blocking _generate: cached responses skip the call and the concurrency limit."""
+        if self.cache is None:
+            return await self._call_async(prompt, generation_config)
+        key = llm_cache_key(prompt, self.model_name, generation_config)
+        return await self.cache.get_or_compute_async(
+            key, lambda: self._call_async(prompt, generation_config), model=self.model_name, accept=accept
+        )
+
+    async def _call_async(self, prompt: str, generation_config: Dict = None) -> str:
+        """
+        One Gemini call without blocking the event loop.
+
+        Raises:
+            asyncio.TimeoutError: The call took longer than LLM_TIMEOUT_SECONDS
+        """
+        async with self._semaphore():
+            self._count("calls")
+            self._count("in_flight")
+            try:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, generation_config=generation_config),
+                    timeout=self.timeout
+                )
+                return response.text.strip()
+            except asyncio.TimeoutError:
+                self._count("timeouts")
+                raise
+            except Exception:
+                self._count("errors")
+                raise
+            finally:
+                self._count("in_flight", -1)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "fused_analyses": self.fused_analyses,
+                "fused_fallbacks": self.fused_fallbacks,
+                "max_concurrency": self.max_concurrency,
+                "timeout_seconds": self.timeout
+            }
+
     def summarize_document(self, text: str) -> str:
         """
         Generate a comprehensive summary of the legal document using Gemini.
@@ -42,26 +275,10 @@ class LLMService:
         if not text or len(text.strip()) < 50:
             return "Document text too short for meaningful analysis."
         
-        prompt = f"""
-        You are a legal document analysis expert. Analyze the following legal document text and provide a comprehensive, professional summary.
-
-        Focus on:
-        1. Document type and purpose
-        2. Key parties involved
-        3. Main obligations and rights
-        4. Important terms and conditions
-        5. Potential risks or concerns
-        6. Critical deadlines or timeframes
-
-        Document Text:
-        {text}
-
-        Provide a clear, structured summary in 2-3 paragraphs that a non-lawyer can understand, while highlighting the most important legal aspects.
-        """
+        prompt = _summary_prompt(text)
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._generate(prompt)
         except Exception as e:
             logger.error(f"Error in LLM summarization: {e}")
             # Fallback to simple text truncation
@@ -80,43 +297,10 @@ class LLMService:
         if not text or len(text.strip()) < 50:
             return ["Document text too short for key point extraction."]
         
-        prompt = f"""
-        You are a legal document analysis expert. Analyze the following legal document and extract the most crucial points that someone should be aware of before signing.
-
-        Focus on identifying:
-        1. Financial obligations and payment terms
-        2. Liability and indemnification clauses
-        3. Termination conditions and notice periods
-        4. Renewal and cancellation terms
-        5. Intellectual property rights
-        6. Confidentiality requirements
-        7. Dispute resolution mechanisms
-        8. Governing law and jurisdiction
-        9. Risk factors and potential consequences
-        10. Time-sensitive obligations
-
-        Document Text:
-        {text}
-
-        Return ONLY a list of the most important points, each starting with an appropriate emoji and written in clear, actionable language. Limit to 8-10 key points maximum.
-        """
+        prompt = _key_points_prompt(text)
         
         try:
-            response = self.model.generate_content(prompt)
-            points_text = response.text.strip()
-            
-            # Parse the response into individual points
-            # Split by lines and clean up
-            points = []
-            for line in points_text.split('\n'):
-                line = line.strip()
-                if line and not line.startswith('#') and len(line) > 10:
-                    # Remove bullet points and numbering
-                    cleaned_line = line.lstrip('•-*1234567890. ')
-                    if cleaned_line:
-                        points.append(cleaned_line)
-            
-            return points[:10]  # Limit to 10 points maximum
+            return _parse_key_points(self._generate(prompt))
             
         except Exception as e:
             logger.error(f"Error in LLM key point extraction: {e}")
@@ -137,20 +321,7 @@ class LLMService:
             return "Prompt too short for meaningful document generation."
 
         try:
-            # Configure generation parameters for longer, more comprehensive responses
-            generation_config = {
-                'max_output_tokens': max_tokens,
-                'temperature': 0.3,  # Lower temperature for more consistent legal language
-                'top_p': 0.8,
-                'top_k': 40
-            }
-
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-
-            generated_text = response.text.strip()
+            generated_text = self._generate(prompt, _generation_config(max_tokens))
 
             # Ensure the document is substantial
             if len(generated_text) < 500:
@@ -173,8 +344,12 @@ class LLMService:
             Dict containing summary and key_points
         """
         try:
-            summary = self.summarize_document(text)
-            key_points = self.extract_key_points(text)
+            if LLM_FUSED_ANALYSIS and text and len(text.strip()) >= 50:
+                analysis = self.analyze_document_fused(text)
+                summary, key_points = analysis["summary"], analysis["key_points"]
+            else:
+                summary = self.summarize_document(text)
+                key_points = self.extract_key_points(text)
             
             return {
                 "summary": summary,
@@ -191,6 +366,111 @@ class LLMService:
                 "success": False
             }
 
+    def analyze_document_fused(self, text: str) -> Dict:
+        """
+        Summary and key points from one Gemini call over the document, validated against
+        DocumentAnalysis. Falls back to the separate summary and key point calls only when
+        the response cannot be parsed; errors from the call itself are raised.
+
+        Args:
+            text (str): The extracted text from the legal document
+
+        Returns:
+            Dict containing summary, key_points and whether the single call was used (fused)
+        """
+        response_text = self._generate(_analysis_prompt(text), accept=_is_valid_analysis)
+        try:
+            analysis = _parse_analysis(response_text)
+        except ValueError as e:
+            logger.warning(f"Single-call analysis unusable ({e}), using separate summary and key point calls")
+            self._count("fused_fallbacks")
+            return {
+                "summary": self.summarize_document(text),
+                "key_points": self.extract_key_points(text),
+                "fused": False
+            }
+        self._count("fused_analyses")
+        return {"summary": analysis.summary, "key_points": analysis.key_points, "fused": True}
+
+    async def summarize_document_async(self, text: str) -> str:
+        """Non-blocking summarize_document: same prompt and fallback, awaited on the event loop."""
+        if not text or len(text.strip()) < 50:
+            return "Document text too short for meaningful analysis."
+
+        try:
+            return await self._generate_async(_summary_prompt(text))
+        except Exception as e:
+            logger.error(f"Error in LLM summarization: {e!r}")
+            return f"Summary generation failed. Document preview: {' '.join(text.split()[:150])}..."
+
+    async def extract_key_points_async(self, text: str) -> List[str]:
+        """Non-blocking extract_key_points."""
+        if not text or len(text.strip()) < 50:
+            return ["Document text too short for key point extraction."]
+
+        try:
+            return _parse_key_points(await self._generate_async(_key_points_prompt(text)))
+        except Exception as e:
+            logger.error(f"Error in LLM key point extraction: {e!r}")
+            return ["Key point extraction failed. Please review the document manually."]
+
+    async def generate_document_async(self, prompt: str, max_tokens: int = 2000) -> str:
+        """Non-blocking generate_document; raises on failure or timeout like the blocking call."""
+        if not prompt or len(prompt.strip()) < 50:
+            return "Prompt too short for meaningful document generation."
+
+        try:
+            generated_text = await self._generate_async(prompt, _generation_config(max_tokens))
+        except Exception as e:
+            logger.error(f"Error in document generation: {e!r}")
+            raise Exception(f"Document generation failed: {e!r}")
+
+        if len(generated_text) < 500:
+            logger.warning("Generated document seems short, may need prompt refinement")
+        return generated_text
+
+    async def analyze_document_fused_async(self, text: str) -> Dict:
+        """Non-blocking analyze_document_fused; the fallback calls run concurrently."""
+        response_text = await self._generate_async(_analysis_prompt(text), accept=_is_valid_analysis)
+        try:
+            analysis = _parse_analysis(response_text)
+        except ValueError as e:
+            logger.warning(f"Single-call analysis unusable ({e}), using separate summary and key point calls")
+            self._count("fused_fallbacks")
+            summary, key_points = await asyncio.gather(
+                self.summarize_document_async(text),
+                self.extract_key_points_async(text)
+            )
+            return {"summary": summary, "key_points": key_points, "fused": False}
+        self._count("fused_analyses")
+        return {"summary": analysis.summary, "key_points": analysis.key_points, "fused": True}
+
+    async def analyze_document_comprehensive_async(self, text: str) -> Dict[str, any]:
+        """Non-blocking analyze_document_comprehensive; without the single call, both calls are in flight together."""
+        try:
+            if LLM_FUSED_ANALYSIS and text and len(text.strip()) >= 50:
+                analysis = await self.analyze_document_fused_async(text)
+                summary, key_points = analysis["summary"], analysis["key_points"]
+            else:
+                summary, key_points = await asyncio.gather(
+                    self.summarize_document_async(text),
+                    self.extract_key_points_async(text)
+                )
+            return {
+                "summary": summary,
+                "key_points": key_points,
+                "analysis_method": "Google Gemini LLM",
+                "success": True
+            }
+        except Exception as e:
+            logger.error(f"Comprehensive analysis failed: {e}")
+            return {
+                "summary": "Document analysis failed due to technical issues.",
+                "key_points": ["Please try again or contact support."],
+                "analysis_method": "Error fallback",
+                "success": False
+            }
+
 # Global instance
 llm_service = None
 
@@ -206,3 +486,8 @@ def generate_document(prompt: str, max_tokens: int = 2000) -> str:
     """Generate a document using the global LLM service instance."""
     service = get_llm_service()
     return service.generate_document(prompt, max_tokens)
+
+async def generate_document_async(prompt: str, max_tokens: int = 2000) -> str:
+    """Generate a document without blocking the event loop."""
+    service = get_llm_service()
+    return await service.generate_document_async(prompt, max_tokens)
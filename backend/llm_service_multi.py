@@ -4,10 +4,21 @@ Supports multiple LLM providers with automatic fallback.
 """
 
 import os
+import importlib.util
 import logging
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
 
+from onnx_backend import load_summarization_pipeline
+from llm_cache import llm_cache_key, get_llm_cache
+
+# Model behind the Hugging Face provider (the same BART the local summarizer uses)
+HUGGINGFACE_SUMMARIZER_MODEL = "facebook/bart-large-cnn"
+# Models called by the hosted providers
+GEMINI_MODEL = "gemini-1.5-flash"
+OPENAI_MODEL = "gpt-3.5-turbo"
+ANTHROPIC_MODEL = "claude-3-sonnet-20240229"
+
 # Load environment variables
 load_dotenv()
 
@@ -19,6 +30,8 @@ class MultiLLMService:
     def __init__(self):
         """Initialize the LLM service with multiple provider support."""
         self.providers = []
+        # Hosted provider responses are cached by prompt, model and generation config (see llm_cache.py)
+        self.cache = get_llm_cache()
         self._setup_providers()
         
         if not self.providers:
@@ -34,7 +47,7 @@ class MultiLLMService:
             try:
                 import google.generativeai as genai
                 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-                model = genai.GenerativeModel('gemini-1.5-flash')
+                model = genai.GenerativeModel(GEMINI_MODEL)
                 self.providers.append(('gemini', model))
                 logger.info("✅ Gemini provider initialized")
             except Exception as e:
@@ -62,14 +75,13 @@ class MultiLLMService:
         
         # 4. Free alternative: Hugging Face (requires: pip install transformers)
         if os.getenv('HUGGINGFACE_API_KEY') or True:  # Can work without API key
-            try:
-                from transformers import pipeline
-                # Use a free, smaller model for basic functionality
-                summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-                self.providers.append(('huggingface', summarizer))
+            if importlib.util.find_spec("transformers") is not None:
+                # The summarization pipeline is built on the process-wide BART model from the
+                # model registry when first used, so it shares the weights the local path loads
+                self.providers.append(('huggingface', HUGGINGFACE_SUMMARIZER_MODEL))
                 logger.info("✅ Hugging Face provider initialized")
-            except Exception as e:
-                logger.error(f"❌ Hugging Face setup failed: {e}")
+            else:
+                logger.error("❌ Hugging Face setup failed: transformers is not installed")
 
     def summarize_document(self, text: str) -> str:
         """Generate summary using the first available provider."""
@@ -107,29 +119,12 @@ class MultiLLMService:
 
 {text}"""
         
-        if provider_name == 'gemini':
-            response = provider.generate_content(prompt)
-            return response.text.strip()
-        
-        elif provider_name == 'openai':
-            response = provider.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500
-            )
-            return response.choices[0].message.content.strip()
-        
-        elif provider_name == 'anthropic':
-            response = provider.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=500,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            return response.content[0].text.strip()
+        if provider_name in ('gemini', 'openai', 'anthropic'):
+            return self._complete(provider_name, provider, prompt, max_tokens=500)
         
         elif provider_name == 'huggingface':
-            # For Hugging Face, use the summarization pipeline
-            summary = provider(text, max_length=250, min_length=50, do_sample=False)
+            # For Hugging Face, use the summarization pipeline (provider is the model id)
+            summary = load_summarization_pipeline(provider)(text, max_length=250, min_length=50, do_sample=False, truncation=True)
             return summary[0]['summary_text']
         
         return "Provider not supported"
@@ -142,25 +137,8 @@ class MultiLLMService:
 
 Focus on: obligations, payments, termination, liability, deadlines, risks."""
         
-        if provider_name == 'gemini':
-            response = provider.generate_content(prompt)
-            return self._parse_points_response(response.text)
-        
-        elif provider_name == 'openai':
-            response = provider.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=600
-            )
-            return self._parse_points_response(response.choices[0].message.content)
-        
-        elif provider_name == 'anthropic':
-            response = provider.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=600,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            return self._parse_points_response(response.content[0].text)
+        if provider_name in ('gemini', 'openai', 'anthropic'):
+            return self._parse_points_response(self._complete(provider_name, provider, prompt, max_tokens=600))
         
         elif provider_name == 'huggingface':
             # For Hugging Face, use fallback method
@@ -168,6 +146,36 @@ Focus on: obligations, payments, termination, liability, deadlines, risks."""
         
         return ["Provider not supported"]
 
+    def _complete(self, provider_name: str, provider, prompt: str, max_tokens: int) -> str:
+        """
+        Response text of a hosted provider for `prompt`, from the response cache when the
+        same prompt was sent to the same model with the same settings before.
+        """
+        if provider_name == 'gemini':
+            # Gemini runs with its default generation settings
+            model, config = GEMINI_MODEL, {}
+            call = lambda: provider.generate_content(prompt).text.strip()
+        elif provider_name == 'openai':
+            model, config = OPENAI_MODEL, {"max_tokens": max_tokens}
+            call = lambda: provider.ChatCompletion.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens
+            ).choices[0].message.content.strip()
+        elif provider_name == 'anthropic':
+            model, config = ANTHROPIC_MODEL, {"max_tokens": max_tokens}
+            call = lambda: provider.messages.create(
+                model=ANTHROPIC_MODEL,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}]
+            ).content[0].text.strip()
+        else:
+            raise ValueError(f"Provider '{provider_name}' has no text completion API")
+
+        if self.cache is None:
+            return call()
+        return self.cache.get_or_compute(llm_cache_key(prompt, model, config), call, model=model)
+
     def _parse_points_response(self, response_text: str) -> List[str]:
         """Parse LLM response into clean key points."""
         points = []
@@ -0,0 +1,214 @@
+"""
+Hierarchical Map-Reduce Summarisation for Long Documents
+BART only sees 1024 tokens, so long contracts are split on section and sentence boundaries
+into chunks that fit the window (map), every chunk is summarised in one batched call, and
+the joined chunk summaries are summarised again (reduce) until they fit one window.
+Each level shrinks the text by the model's compression ratio, so total work grows linearly
+with document length and no part of the document is dropped. Chunk summaries are cached
+by content, so re-running a document (or one sharing boilerplate sections) only
+summarises the chunks that changed.
+"""
+
+import os
+import re
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tokens per chunk: BART's 1024-token window minus room for special tokens and any prompt prefix
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '900'))
+# Length of each chunk's summary (in tokens)
+SUMMARY_CHUNK_MAX_LENGTH = int(os.getenv('SUMMARY_CHUNK_MAX_LENGTH', '150'))
+SUMMARY_CHUNK_MIN_LENGTH = int(os.getenv('SUMMARY_CHUNK_MIN_LENGTH', '30'))
+# Chunks summarised per model call
+SUMMARY_BATCH_SIZE = int(os.getenv('SUMMARY_BATCH_SIZE', '4'))
+# Reduce levels before the remaining summaries are cut to one window
+SUMMARY_MAX_LEVELS = int(os.getenv('SUMMARY_MAX_LEVELS', '4'))
+
+# Section breaks: blank lines, or a line starting a numbered clause / article / schedule heading
+_SECTION_BREAK = re.compile(
+    r"\n\s*\n|\n(?=\s*(?:\d+(?:\.\d+)*[.)]\s|[A-Z][A-Z ]{3,}\n|(?:ARTICLE|Article|SECTION|Section|SCHEDULE|Schedule|CLAUSE|Clause)\b))"
+)
+# Sentence ends: terminal punctuation followed by whitespace and an upper-case letter, digit or quote
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+(?=[A-Z0-9\"'(])")
+
+def split_sentences(text: str) -> List[str]:
+    """Sections first, then sentences within each section; empty pieces are dropped."""
+    sentences = []
+    for section in _SECTION_BREAK.split(text):
+        section = " ".join(section.split())
+        if section:
+            sentences.extend(piece for piece in _SENTENCE_END.split(section) if piece)
+    return sentences
+
+def chunk_text(text: str, count_tokens: Callable[[str], int], max_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """
+    Packs consecutive sentences into chunks of at most `max_tokens` tokens.
+    Chunks end on a sentence boundary; a single sentence longer than the window is split on words.
+
+    Args:
+        text (str): Document text
+        count_tokens (callable): Tokens the model's tokenizer produces for a string
+        max_tokens (int): Chunk budget
+
+    Returns:
+        List[str]: Chunks in document order, together covering the whole text
+    """
+    chunks, current, current_tokens = [], [], 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        if tokens > max_tokens:
+            pieces = _split_long_sentence(sentence, count_tokens, max_tokens)
+        else:
+            pieces = [(sentence, tokens)]
+        for piece, piece_tokens in pieces:
+            # +1 for the space joining sentences
+            if current and current_tokens + piece_tokens + 1 > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens + (1 if len(current) > 1 else 0)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def _split_long_sentence(sentence: str, count_tokens: Callable[[str], int], max_tokens: int):
+    """Word windows of a run-on sentence (OCR text without punctuation), each within the budget."""
+    words = sentence.split()
+    # Start from the average tokens per word and shrink until a window fits
+    step = max(1, int(len(words) * max_tokens / max(count_tokens(sentence), 1)))
+    pieces, start = [], 0
+    while start < len(words):
+        size = step
+        while True:
+            piece = " ".join(words[start:start + size])
+            tokens = count_tokens(piece)
+            if tokens <= max_tokens or size == 1:
+                break
+            size = max(1, int(size * 0.9))
+        pieces.append((piece, tokens))
+        start += size
+    return pieces
+
+class ChunkSummaryCache:
+    def __init__(self, max_entries: int = 2048):
+        """
+        Args:
+            max_entries (int): Chunk summaries kept before least recently used ones are evicted
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # content key -> summary
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(chunk: str, model_name: str, max_length: int, min_length: int) -> str:
+        normalized = " ".join(chunk.split())
+        return hashlib.sha1(f"{model_name}\x00{max_length}\x00{min_length}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, summary: str):
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+# Global instance
+summary_cache = None
+_summary_cache_lock = threading.Lock()
+
+def get_summary_cache() -> ChunkSummaryCache:
+    """Get or create the global chunk summary cache, sized from SUMMARY_CACHE_MAX_ENTRIES."""
+    global summary_cache
+    with _summary_cache_lock:
+        if summary_cache is None:
+            summary_cache = ChunkSummaryCache(int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', '2048')))
+        return summary_cache
+
+def _summarize_chunks(chunks: List[str], summarize_batch: Callable, model_name: str, max_length: int,
+                      min_length: int, cache: ChunkSummaryCache) -> List[str]:
+    """Summaries of `chunks` in order; only cache misses reach the model, in batches."""
+    keys = [cache.key(chunk, model_name, max_length, min_length) for chunk in chunks]
+    found = {key: cache.get(key) for key in dict.fromkeys(keys)}
+    # Repeated chunks (boilerplate sections) are summarised once
+    missing = [key for key, summary in found.items() if summary is None]
+    chunk_for_key = dict(zip(keys, chunks))
+    for start in range(0, len(missing), SUMMARY_BATCH_SIZE):
+        batch = missing[start:start + SUMMARY_BATCH_SIZE]
+        results = summarize_batch([chunk_for_key[key] for key in batch], max_length, min_length)
+        for key, summary in zip(batch, results):
+            found[key] = summary
+            cache.put(key, summary)
+    return [found[key] for key in keys]
+
+def summarize_long(text: str, summarize_batch: Callable[[List[str], int, int], List[str]],
+                   count_tokens: Callable[[str], int], model_name: str, max_length: int = 250,
+                   min_length: int = 50, max_tokens: int = SUMMARY_CHUNK_TOKENS,
+                   cache: Optional[ChunkSummaryCache] = None) -> str:
+    """
+    Summarises text of any length with a model limited to `max_tokens` of input.
+    Text that fits one window is summarised directly, as before.
+
+    Args:
+        text (str): Document text
+        summarize_batch (callable): (texts, max_length, min_length) -> one summary per text
+        count_tokens (callable): Tokens the model's tokenizer produces for a string
+        model_name (str): Model identifier, part of the cache key
+        max_length (int): Final summary length limit (tokens)
+        min_length (int): Final summary minimum length (tokens)
+        max_tokens (int): Model input window used for chunking
+        cache (ChunkSummaryCache): Chunk summary cache (default: the global one)
+
+    Returns:
+        str: Summary of the whole document (one summary per remaining window, joined in
+        order, if the text still spans several windows after SUMMARY_MAX_LEVELS levels)
+    """
+    cache = cache or get_summary_cache()
+    chunks = chunk_text(text, count_tokens, max_tokens)
+    level = 0
+    while len(chunks) > 1 and level < SUMMARY_MAX_LEVELS:
+        level += 1
+        summaries = _summarize_chunks(chunks, summarize_batch, model_name,
+                                      SUMMARY_CHUNK_MAX_LENGTH, SUMMARY_CHUNK_MIN_LENGTH, cache)
+        logger.info(f"Summarisation level {level}: {len(chunks)} chunks -> {len(summaries)} summaries")
+        chunks = chunk_text(" ".join(summaries), count_tokens, max_tokens)
+    if not chunks:
+        return ""
+    if len(chunks) > 1:
+        # The level cap was reached: every remaining window is summarised and the partial
+        # summaries are returned in document order, so no part of the document is dropped
+        logger.warning(f"Summaries still span {len(chunks)} windows after {level} levels; "
+                       f"returning the concatenated summaries of all windows")
+    return " ".join(_summarize_chunks(chunks, summarize_batch, model_name, max_length, min_length, cache))
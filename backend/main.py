@@ -1,15 +1,18 @@
-from fastapi import FastAPI, UploadFile, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import FileResponse
+from starlette.responses import FileResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import uvicorn
 import os
 import shutil
+import tempfile
 from typing import List, Dict, Optional
 import logging
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import re
+import itertools
 
 # Load environment variables
 load_dotenv()
@@ -19,8 +22,15 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Import custom modules
-from ocr import extract_text_from_image
-from nlp_processing import summarize_document, highlight_key_points, enhance_summary
+from ocr import ocr_document, extract_text_from_pages, expand_pages, page_for_offset, resolve_profile
+from ocr_cache import get_ocr_cache
+from embedding_cache import get_embedding_cache
+from long_summarizer import get_summary_cache
+from llm_cache import get_llm_cache
+from pdf_ingest import PDF_AVAILABLE, is_pdf, pdf_page_count, iter_pdf_pages
+from model_tiers import choose_tier, validate_tier, get_tier_stats
+from nlp_processing import analyze_document_async, enhance_summary, get_summary_batcher
+from model_registry import get_model_registry, warmup_models_from_env
 
 # Data models for document generation
 class DocumentGenerationRequest(BaseModel):
@@ -68,6 +78,51 @@ async def health_check():
         "version": "2.0.0"
     }
 
+@app.on_event("startup")
+async def start_model_warmup():
+    """Load the NLP models in the background so the server starts answering immediately."""
+    warmup_models_from_env()
+    # Expired on-disk LLM responses are purged in the background too (the directory walk can be long)
+    llm_cache = get_llm_cache()
+    if llm_cache:
+        llm_cache.start_purge()
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint, separate from /health: 200 once the warmed-up models are loaded,
+    503 while they are still loading. Reports each model's load state and load time.
+    """
+    registry = get_model_registry()
+    ready = registry.ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": registry.status()}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime counters for the caches in front of the expensive processing steps."""
+    llm_cache = get_llm_cache()
+    return {
+        "ocr_cache": get_ocr_cache().stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "summary_cache": get_summary_cache().stats(),
+        "summary_batcher": get_summary_batcher().stats(),
+        "model_tiers": get_tier_stats().stats(),
+        "models": get_model_registry().memory(),
+        "llm": llm_metrics(),
+        "llm_cache": llm_cache.stats() if llm_cache else None
+    }
+
+def llm_metrics() -> Optional[Dict]:
+    """In-flight and failed Gemini calls; None until the LLM service has been used."""
+    try:
+        import llm_service
+    except ImportError:
+        return None
+    return llm_service.llm_service.stats() if llm_service.llm_service else None
+
 @app.post("/generate_document")
 async def generate_document_endpoint(request: DocumentGenerationRequest):
     """
@@ -91,8 +146,9 @@ async def generate_document_endpoint(request: DocumentGenerationRequest):
         # Generate document using LLM
         llm_service = get_llm_service()
         try:
-            # Use the document generation method for creating complete legal documents
-            generated_content = llm_service.generate_document(generation_prompt, max_tokens=2000)
+            # Use the document generation method for creating complete legal documents;
+            # the async call leaves the event loop free for other requests while Gemini works
+            generated_content = await llm_service.generate_document_async(generation_prompt, max_tokens=2000)
 
             logger.info(f"Successfully generated {request.document_type} document using AI")
 
@@ -456,7 +512,7 @@ RECEIVING PARTY:
 _________________________________ Date: ___________
 {request.form_data.get('party2Name', '[RECEIVING PARTY]')}
 
-⚠️ LEGAL DISCLAIMER: This document is a template for informational purposes only and does not constitute legal advice. This agreement should be reviewed by a qualified attorney before execution to ensure compliance with applicable laws and specific business requirements."""}
+⚠️ LEGAL DISCLAIMER: This document is a template for informational purposes only and does not constitute legal advice. This agreement should be reviewed by a qualified attorney before execution to ensure compliance with applicable laws and specific business requirements.""",
 
         "service": f"""PROFESSIONAL SERVICE AGREEMENT
 
@@ -532,25 +588,47 @@ _________________________________ Date: ___________
         }
     }
 
-@app.post("/process_document")
-async def process_document_endpoint(
-    file: UploadFile,
-    ai_model: str = "gemini"  # Default to Gemini, can be 'gemini' or 'bart'
-):
+# Uploads larger than this are spooled to disk instead of being decoded in memory.
+# Defaults to half the upload limit (MAX_FILE_SIZE_MB), so the largest accepted uploads take the spool path
+_MAX_FILE_SIZE_MB = float(os.getenv('MAX_FILE_SIZE_MB', '5'))
+OCR_SPOOL_THRESHOLD_BYTES = int(float(os.getenv('OCR_SPOOL_THRESHOLD_MB', str(_MAX_FILE_SIZE_MB / 2))) * 1024 * 1024)
+if OCR_SPOOL_THRESHOLD_BYTES >= _MAX_FILE_SIZE_MB * 1024 * 1024:
+    logger.warning(f"OCR_SPOOL_THRESHOLD_MB is not below MAX_FILE_SIZE_MB ({_MAX_FILE_SIZE_MB:g}MB); "
+                   f"uploads will never be spooled to disk")
+
+def upload_size(file: UploadFile) -> int:
+    """Returns the upload size in bytes, measuring the spooled file if the client sent no size."""
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+def spool_upload_to_disk(file: UploadFile) -> str:
     """
-    Processes an uploaded legal document using LLM-powered analysis:
-    1. Extracts text using OCR.
-    2. Summarizes the document using Google Gemini (with local fallback).
-    3. Extracts and highlights crucial points using advanced LLM analysis.
+    Streams a large upload to a private temp file and returns its path.
+    The name is generated by tempfile, so concurrent uploads never collide.
     """
-    logger.info(f"Processing document: {file.filename} using {ai_model.upper()} model")
+    suffix = os.path.splitext(file.filename or "")[1]
+    with tempfile.NamedTemporaryFile(prefix="upload_", suffix=suffix, delete=False) as buffer:
+        shutil.copyfileobj(file.file, buffer)
+        return buffer.name
 
+def validate_upload(file: UploadFile):
+    """Rejects uploads with an unsupported extension or above MAX_FILE_SIZE_MB."""
     # Validate file type
-    allowed_extensions = tuple(os.getenv('ALLOWED_FILE_TYPES', 'png,jpg,jpeg,tiff,bmp').split(','))
+    allowed_extensions = tuple(os.getenv('ALLOWED_FILE_TYPES', 'png,jpg,jpeg,tiff,bmp,pdf').split(','))
     if not file.filename.lower().endswith(allowed_extensions):
         raise HTTPException(
             status_code=400,
-            detail=f"Only image files ({', '.join(allowed_extensions).upper()}) are supported for OCR."
+            detail=f"Only image or PDF files ({', '.join(allowed_extensions).upper()}) are supported."
+        )
+    if file.filename.lower().endswith('.pdf') and not PDF_AVAILABLE:
+        raise HTTPException(
+            status_code=400,
+            detail="PDF upload is not available on this server. Please upload page images instead."
         )
 
     # Validate file size
@@ -561,64 +639,233 @@ async def process_document_endpoint(
             detail=f"File too large. Maximum {max_size // (1024*1024)}MB allowed."
         )
 
-    # Save the uploaded file temporarily
-    file_location = f"temp_{file.filename}"
+def validate_ocr_profile(ocr_profile: Optional[str]) -> str:
+    """Resolves the requested OCR preprocessing profile, rejecting unknown names."""
+    try:
+        return resolve_profile(ocr_profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def validate_model_tier(model_tier: Optional[str]) -> Optional[str]:
+    """Checks the requested local model tier, rejecting unknown names."""
+    if model_tier is None:
+        return None
     try:
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        return validate_tier(model_tier)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def read_upload_source(file: UploadFile, spool_paths: List[str]):
+    """
+    Returns an OCR source for the upload: its bytes, or a spooled file path for very large uploads.
+    Spooled paths are appended to `spool_paths` so the caller can remove them.
+    """
+    # Small uploads are decoded straight from memory; only very large ones are
+    # spooled to a uniquely named temp file so they never sit in RAM twice.
+    # The copy runs in the threadpool so the event loop keeps serving other requests.
+    if upload_size(file) > OCR_SPOOL_THRESHOLD_BYTES:
+        spool_path = await run_in_threadpool(spool_upload_to_disk, file)
+        spool_paths.append(spool_path)
+        return spool_path
+    return await file.read()
+
+def split_pages(source):
+    """
+    Returns (pages, page count) for one upload: a lazy page iterator for PDFs, one TiffFrame
+    per page for multi-page TIFFs, the upload itself otherwise. Parses the file, so callers
+    run it in the threadpool.
+    """
+    if is_pdf(source):
+        return iter_pdf_pages(source), pdf_page_count(source)
+    pages = expand_pages(source)
+    return pages, len(pages)
+
+def remove_spooled_files(spool_paths: List[str]):
+    """Clean up spooled files, if any upload was large enough to need one."""
+    for spool_path in spool_paths:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+async def analyze_extracted_text(extracted_text: str, ai_model: str, model_tier: Optional[str] = None,
+                                 latency_budget_ms: Optional[float] = None):
+    """
+    Runs summarization and crucial point highlighting once over the OCR text, concurrently:
+    Gemini calls are awaited without blocking the event loop (one call for both, see
+    analyze_document_async), local models run in worker threads.
+    Local models run at `model_tier`, or the largest tier expected to fit `latency_budget_ms`.
+    Returns (enhanced summary, key point texts, analysis metadata).
+    """
+    tier = choose_tier(("summarizer", "spacy", "sbert"), model_tier, latency_budget_ms, len(extracted_text))
+
+    # 2. Summarization and 3. crucial points highlighting using the selected AI model
+    # (in Gemini mode one structured call returns both)
+    summary_result, key_points_result = await analyze_document_async(extracted_text, ai_model=ai_model, tier=tier)
+
+    if isinstance(summary_result, Exception):
+        # Fallback to first N words if summarization fails
+        enhanced_summary_en = " ".join(extracted_text.split()[:150]) + "..." # No enhancement if main summary failed
+        print(f"Summarization failed, using fallback: {summary_result}")
+    else:
+        # Enhance summary with legal keywords for visual emphasis in frontend
+        enhanced_summary_en = enhance_summary(summary_result)
+
+    if isinstance(key_points_result, Exception):
+        key_points_text_only = ["Could not extract specific key points."]
+        print(f"Key point extraction failed: {key_points_result}")
+    else:
+        # Send list of strings to frontend for simplicity
+        key_points_text_only = [kp["text"] for kp in key_points_result]
+
+    # Add metadata about the analysis
+    analysis_metadata = {
+        "ai_model_selected": ai_model,
+        "llm_used": bool(os.getenv('GEMINI_API_KEY')) and ai_model == 'gemini',
+        "ocr_success": True,
+        "processing_method": f"Google Gemini API" if ai_model == 'gemini' else "Local BART + BERT",
+        "model_tier": tier
+    }
+
+    return enhanced_summary_en, key_points_text_only, analysis_metadata
+
+@app.post("/process_document")
+async def process_document_endpoint(
+    file: UploadFile,
+    ai_model: str = "gemini",  # Default to Gemini, can be 'gemini' or 'bart'
+    layout: bool = False,  # OCR multi-column pages region by region
+    ocr_profile: Optional[str] = None,  # Preprocessing profile: 'fast', 'balanced' or 'max_quality'
+    adaptive: Optional[bool] = None,  # Fast first pass, full preprocessing only where confidence is low
+    model_tier: Optional[str] = None,  # Local model size: 'small', 'base' or 'large'
+    latency_budget_ms: Optional[float] = None  # Or: the largest local models expected to finish within this
+):
+    """
+    Processes an uploaded legal document using LLM-powered analysis:
+    1. Extracts text using OCR (optionally layout-aware, returning the text regions).
+    2. Summarizes the document using Google Gemini (with local fallback).
+    3. Extracts and highlights crucial points using advanced LLM analysis.
+    """
+    logger.info(f"Processing document: {file.filename} using {ai_model.upper()} model")
+
+    validate_upload(file)
+    ocr_profile = validate_ocr_profile(ocr_profile)
+    model_tier = validate_model_tier(model_tier)
+
+    # A PDF is a multi-page document: text-layer pages skip OCR, scanned pages are OCR'd
+    if file.filename.lower().endswith('.pdf'):
+        return await process_document_pages_endpoint([file], ai_model=ai_model, layout=layout,
+                                                     ocr_profile=ocr_profile, adaptive=adaptive,
+                                                     model_tier=model_tier, latency_budget_ms=latency_budget_ms)
+
+    spool_paths: List[str] = []
+    try:
+        image_source = await read_upload_source(file, spool_paths)
 
         # 1. OCR
         extracted_text = ""
         try:
-            extracted_text = extract_text_from_image(file_location)
+            # OCR runs in the threadpool (as do local models, inside analyze_extracted_text), so
+            # concurrent requests overlap (and their BART calls can be batched together)
+            ocr_result = await run_in_threadpool(ocr_document, image_source, layout=layout,
+                                                 profile=ocr_profile, adaptive=adaptive)
+            extracted_text = ocr_result["text"]
             if not extracted_text.strip():
                 raise ValueError("OCR_FAILED: Could not extract text from the image. Please try a clearer photo.")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"OCR processing failed: {e}")
 
-        # 2. Summarization using selected AI model
-        summary_en = ""
-        try:
-            summary_en = summarize_document(extracted_text, ai_model=ai_model)
-            # Enhance summary with legal keywords for visual emphasis in frontend
-            enhanced_summary_en = enhance_summary(summary_en)
-        except Exception as e:
-            # Fallback to first N words if summarization fails
-            summary_en = " ".join(extracted_text.split()[:150]) + "..."
-            enhanced_summary_en = summary_en # No enhancement if main summary failed
-            print(f"Summarization failed, using fallback: {e}")
+        enhanced_summary_en, key_points_text_only, analysis_metadata = await analyze_extracted_text(
+            extracted_text, ai_model, model_tier, latency_budget_ms
+        )
+        # How the page was preprocessed (profile, per-stage timings, scale, deskew) before recognition
+        analysis_metadata["ocr"] = ocr_result["metadata"]
+
+        logger.info(f"Document processing completed successfully using {analysis_metadata['processing_method']}")
 
+        response = {
+            "summary": enhanced_summary_en,
+            "key_points": key_points_text_only,
+            "metadata": analysis_metadata
+        }
+        if layout:
+            response["regions"] = ocr_result["regions"]
+        return response
+
+    finally:
+        await run_in_threadpool(remove_spooled_files, spool_paths)
+
+# Longest document accepted by /process_document_pages
+MAX_DOCUMENT_PAGES = int(os.getenv('MAX_DOCUMENT_PAGES', '60'))
+
+@app.post("/process_document_pages")
+async def process_document_pages_endpoint(
+    files: List[UploadFile] = File(...),
+    ai_model: str = "gemini",  # Default to Gemini, can be 'gemini' or 'bart'
+    layout: bool = False,  # OCR multi-column pages region by region
+    ocr_profile: Optional[str] = None,  # Preprocessing profile: 'fast', 'balanced' or 'max_quality'
+    adaptive: Optional[bool] = None,  # Fast first pass, full preprocessing only where confidence is low
+    model_tier: Optional[str] = None,  # Local model size: 'small', 'base' or 'large'
+    latency_budget_ms: Optional[float] = None  # Or: the largest local models expected to finish within this
+):
+    """
+    Processes a multi-page legal document sent as several page images, a multi-page TIFF or a PDF:
+    1. Reads PDF text layers directly, OCRs all other pages in parallel and joins the text in page order.
+    2. Summarizes and extracts crucial points once over the combined text.
+    3. Traces each key point back to the page it was found on.
+    """
+    logger.info(f"Processing {len(files)} uploaded file(s) as one document using {ai_model.upper()} model")
 
-        # 3. Crucial Points Highlighting using selected AI model
-        key_points_structured: List[Dict] = []
+    for file in files:
+        validate_upload(file)
+    ocr_profile = validate_ocr_profile(ocr_profile)
+    model_tier = validate_model_tier(model_tier)
+
+    spool_paths: List[str] = []
+    try:
+        # PDFs stay lazy so their pages are rendered one at a time while OCR runs
+        page_sources = []
+        page_count = 0
+        for file in files:
+            source = await read_upload_source(file, spool_paths)
+            pages, count = await run_in_threadpool(split_pages, source)
+            page_count += count
+            page_sources.append(pages)
+
+        if page_count > MAX_DOCUMENT_PAGES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Document too long. Maximum {MAX_DOCUMENT_PAGES} pages allowed."
+            )
+
+        # 1. OCR, pages in parallel
         try:
-            key_points_structured = highlight_key_points(extracted_text, ai_model=ai_model)
-            # Send list of strings to frontend for simplicity
-            key_points_text_only = [kp["text"] for kp in key_points_structured]
+            extracted_text, page_spans = await run_in_threadpool(
+                extract_text_from_pages, itertools.chain.from_iterable(page_sources), layout=layout,
+                profile=ocr_profile, adaptive=adaptive
+            )
+            if not extracted_text.strip():
+                raise ValueError("OCR_FAILED: Could not extract text from any page. Please try clearer photos.")
         except Exception as e:
-            key_points_text_only = ["Could not extract specific key points."]
-            print(f"Key point extraction failed: {e}")
-
-        # Add metadata about the analysis
-        analysis_metadata = {
-            "ai_model_selected": ai_model,
-            "llm_used": bool(os.getenv('GEMINI_API_KEY')) and ai_model == 'gemini',
-            "ocr_success": True,
-            "processing_method": f"Google Gemini API" if ai_model == 'gemini' else "Local BART + BERT"
-        }
+            raise HTTPException(status_code=500, detail=f"OCR processing failed: {e}")
 
-        logger.info(f"Document processing completed successfully using {analysis_metadata['processing_method']}")
+        enhanced_summary_en, key_points_text_only, analysis_metadata = await analyze_extracted_text(
+            extracted_text, ai_model, model_tier, latency_budget_ms
+        )
+
+        # Key points quoted from the text map to a page; paraphrased (LLM) points map to None
+        key_point_pages = [page_for_offset(page_spans, extracted_text.find(point)) for point in key_points_text_only]
+        analysis_metadata["page_count"] = len(page_spans)
+
+        logger.info(f"Processed {len(page_spans)} page(s) using {analysis_metadata['processing_method']}")
 
         return {
             "summary": enhanced_summary_en,
             "key_points": key_points_text_only,
+            "key_point_pages": key_point_pages,
+            "pages": page_spans,
             "metadata": analysis_metadata
         }
 
     finally:
-        # Clean up the temporary file
-        if os.path.exists(file_location):
-            os.remove(file_location)
+        await run_in_threadpool(remove_spooled_files, spool_paths)
 
 # --- Run the FastAPI App ---
 if __name__ == "__main__":
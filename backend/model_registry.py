@@ -0,0 +1,374 @@
+"""
+Lazy Model Registry
+Heavy NLP models (spaCy, BART, Sentence-BERT) are registered here by name with a loader
+and only loaded on first use or by the background warmup started with the server.
+The API process can therefore bind its port immediately, and /ready reports which
+models are warm so orchestrators only route traffic to workers that can serve it.
+
+Model weights are shared process-wide: every module asks for them through shared(),
+keyed by model id and device, so a model used by several pipelines (BART by the
+summarizer, the local analyzer and the Hugging Face LLM provider) is loaded once.
+The memory each shared model takes is recorded, since resident memory per worker
+decides how many workers fit on a node.
+"""
+
+import gc
+import os
+import time
+import itertools
+import threading
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Device the local PyTorch models run on
+MODEL_DEVICE = os.getenv('MODEL_DEVICE', 'cpu')
+
+# Load states reported per model
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+EVICTED = "evicted"
+
+def shared_key(model_id: str, device: str) -> str:
+    """Registry name of a shared model, e.g. 'facebook/bart-large-cnn@cpu'."""
+    return f"{model_id}@{device}"
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident memory of this process (Linux /proc; None elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def model_memory_bytes(model) -> Optional[int]:
+    """
+    Memory held by a loaded model: parameters and buffers of PyTorch modules, the vectors
+    table of spaCy pipelines, the graph files of ONNX Runtime models. None if unknown.
+    """
+    module = getattr(model, "model", model)
+    if hasattr(module, "parameters") and hasattr(module, "buffers"):
+        return sum(tensor.numel() * tensor.element_size()
+                   for tensor in itertools.chain(module.parameters(), module.buffers()))
+    vocab = getattr(model, "vocab", None)
+    if vocab is not None and hasattr(vocab, "vectors"):
+        # Static vectors plus the weights of each component's thinc model
+        total = int(vocab.vectors.data.nbytes)
+        for _, component in getattr(model, "pipeline", []):
+            for node in getattr(getattr(component, "model", None), "walk", lambda: [])():
+                total += sum(node.get_param(param).nbytes for param in node.param_names if node.has_param(param))
+        return total
+    model_paths = [getattr(model, name, None) for name in ("model_path", "encoder_model_path", "decoder_model_path",
+                                                           "decoder_with_past_model_path")]
+    sizes = [os.path.getsize(path) for path in model_paths if path and os.path.exists(path)]
+    return sum(sizes) if sizes else None
+
+class ModelRegistry:
+    def __init__(self, memory_budget_bytes: int = 0, idle_ttl_seconds: float = 0):
+        """
+        Args:
+            memory_budget_bytes (int): Memory the shared models may hold together; least recently
+                used ones are evicted beyond it (0 = unlimited)
+            idle_ttl_seconds (float): Shared models unused for this long are evicted (0 = never)
+        """
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._loaders: Dict[str, Callable] = {}
+        self._models: Dict[str, object] = {}
+        self._status: Dict[str, Dict] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._warmup_models: List[str] = []
+        self._warmup_default: List[str] = []
+        self._warmup_thread: Optional[threading.Thread] = None
+        # Models each entry fetched while loading, and the reverse; evicting a model evicts
+        # everything built on it (pipelines, indexes), so no stale reference keeps it alive
+        self._dependencies: Dict[str, Set[str]] = {}
+        self._dependents: Dict[str, Set[str]] = {}
+        self._last_used: Dict[str, float] = {}
+        self._loading = threading.local()
+        self._reaper: Optional[threading.Thread] = None
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = {"budget": 0, "idle": 0}
+
+    def register(self, name: str, loader: Callable[[], object], warmup: bool = True):
+        """
+        Register a zero-argument loader for `name`. Nothing is loaded until the model is needed.
+        Models registered with warmup=False (e.g. non-default tiers) are left out of the default warmup.
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            if warmup and name not in self._warmup_default:
+                self._warmup_default.append(name)
+            self._locks.setdefault(name, threading.Lock())
+            self._status.setdefault(name, {"state": PENDING, "load_seconds": None, "error": None,
+                                           "loads": 0, "evictions": 0})
+
+    def shared(self, model_id: str, loader: Callable[[], object], device: str = MODEL_DEVICE):
+        """
+        The process-wide instance of `model_id` on `device`, loaded by `loader` the first time
+        any caller asks for it; every caller gets the same reference. Its memory is recorded
+        and counts against the memory budget.
+        """
+        key = shared_key(model_id, device)
+        if key not in self._models:
+            with self._lock:
+                if key not in self._loaders:
+                    self._loaders[key] = loader
+                    self._locks[key] = threading.Lock()
+                    self._status[key] = {"state": PENDING, "load_seconds": None, "error": None,
+                                         "loads": 0, "evictions": 0,
+                                         "model_id": model_id, "device": device, "memory_bytes": None}
+        return self.get(key)
+
+    def get(self, name: str):
+        """
+        Return the model, loading it on first use (or again after it was evicted).
+        Concurrent callers wait for a single load. Raises the loader's exception if
+        loading fails; the next call retries.
+        """
+        self._record_dependency(name)
+        model = self._models.get(name)
+        if model is not None:
+            self._touch(name)
+            return model
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model '{name}'. Registered: {', '.join(self._loaders)}")
+
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is not None:
+                self._touch(name)
+                return model
+            reload = self._status[name]["state"] == EVICTED
+            self._set_status(name, state=LOADING, error=None)
+            logger.info(f"{'Reloading' if reload else 'Loading'} model '{name}'...")
+            start = time.perf_counter()
+            stack = self._loading_stack()
+            stack.append(name)
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                self._set_status(name, state=FAILED, error=f"{type(e).__name__}: {e}")
+                logger.error(f"Loading model '{name}' failed: {e}")
+                raise
+            finally:
+                stack.pop()
+            load_seconds = round(time.perf_counter() - start, 3)
+            with self._lock:
+                self._models[name] = model
+                self._last_used[name] = time.monotonic()
+                status = self._status[name]
+                status.update(state=READY, load_seconds=load_seconds, loads=status["loads"] + 1)
+                self.loads += 1
+                self.reloads += int(reload)
+            if "memory_bytes" in self._status[name]:
+                self._set_status(name, memory_bytes=self._own_memory_bytes(name, model))
+            logger.info(f"Model '{name}' loaded in {load_seconds}s")
+        self._enforce_budget(keep=name)
+        self._start_reaper()
+        return model
+
+    # --- Dependency tracking and eviction ---
+
+    def _loading_stack(self) -> List[str]:
+        if not hasattr(self._loading, "stack"):
+            self._loading.stack = []
+        return self._loading.stack
+
+    def _record_dependency(self, name: str):
+        stack = self._loading_stack()
+        if stack and stack[-1] != name:
+            with self._lock:
+                self._dependencies.setdefault(stack[-1], set()).add(name)
+                self._dependents.setdefault(name, set()).add(stack[-1])
+
+    def _touch(self, name: str):
+        # Using a pipeline or index also uses the models it was built on
+        now = time.monotonic()
+        with self._lock:
+            pending = [name]
+            while pending:
+                current = pending.pop()
+                if self._last_used.get(current) != now:
+                    self._last_used[current] = now
+                    pending.extend(self._dependencies.get(current, ()))
+
+    def _own_memory_bytes(self, name: str, model) -> Optional[int]:
+        """Memory of `model` not already counted for the shared models it was built on."""
+        memory = model_memory_bytes(model)
+        if memory is None:
+            return None
+        with self._lock:
+            counted = sum(self._status[dependency].get("memory_bytes") or 0
+                          for dependency in self._dependencies.get(name, ()) if dependency in self._models)
+        return max(memory - counted, 0)
+
+    def _evict(self, name: str, reason: str) -> List[str]:
+        """Drops `name` and everything built on it; they reload on next use. Caller holds self._lock."""
+        evicted, pending = [], [name]
+        while pending:
+            current = pending.pop()
+            if current in self._models:
+                del self._models[current]
+                self._last_used.pop(current, None)
+                status = self._status[current]
+                status.update(state=EVICTED, evictions=status["evictions"] + 1)
+                evicted.append(current)
+            pending.extend(self._dependents.get(current, ()))
+        if evicted:
+            self.evictions[reason] += 1
+            logger.info(f"Evicted model(s) {', '.join(evicted)} ({reason})")
+        return evicted
+
+    def _dependency_closure(self, names: List[str]) -> Set[str]:
+        """`names` and every model they were built on, transitively. Caller holds self._lock."""
+        closure, pending = set(), list(names)
+        while pending:
+            current = pending.pop()
+            if current not in closure:
+                closure.add(current)
+                pending.extend(self._dependencies.get(current, ()))
+        return closure
+
+    def _resident_bytes(self) -> int:
+        return sum(self._status[name].get("memory_bytes") or 0 for name in self._models)
+
+    def _enforce_budget(self, keep: str = None):
+        """Evicts least recently used shared models until the loaded ones fit the memory budget."""
+        if not self.memory_budget_bytes:
+            return
+        evicted = []
+        with self._lock:
+            # Never the model just loaded, or anything it or a load in progress is built on
+            in_use = [name for name, status in self._status.items() if status["state"] == LOADING]
+            protected = self._dependency_closure(in_use + ([keep] if keep else []))
+            while self._resident_bytes() > self.memory_budget_bytes:
+                candidates = [name for name in self._models
+                              if self._status[name].get("memory_bytes") and name not in protected]
+                if not candidates:
+                    logger.warning(f"Loaded models ({self._resident_bytes() // (1024 * 1024)}MB) exceed the "
+                                   f"{self.memory_budget_bytes // (1024 * 1024)}MB budget but none can be evicted")
+                    break
+                evicted += self._evict(min(candidates, key=lambda name: self._last_used.get(name, 0)), "budget")
+        if evicted:
+            gc.collect()
+
+    def evict_idle(self) -> List[str]:
+        """Evicts shared models unused for idle_ttl_seconds (run periodically by the reaper thread)."""
+        if not self.idle_ttl_seconds:
+            return []
+        evicted = []
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        with self._lock:
+            for name in [name for name in self._models if "memory_bytes" in self._status[name]]:
+                if name in self._models and self._last_used.get(name, 0) < cutoff:
+                    evicted += self._evict(name, "idle")
+        if evicted:
+            gc.collect()
+        return evicted
+
+    def _start_reaper(self):
+        if not self.idle_ttl_seconds or (self._reaper is not None and self._reaper.is_alive()):
+            return
+        interval = min(max(self.idle_ttl_seconds / 4, 1.0), 60.0)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.evict_idle()
+
+        with self._lock:
+            if self._reaper is None or not self._reaper.is_alive():
+                self._reaper = threading.Thread(target=run, name="model-reaper", daemon=True)
+                self._reaper.start()
+
+    def _set_status(self, name: str, **fields):
+        with self._lock:
+            self._status[name].update(fields)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Load `names` (default: every model registered for warmup) one after another on a background thread."""
+        names = list(self._warmup_default) if names is None else list(names)
+        unknown = [name for name in names if name not in self._loaders]
+        if unknown:
+            logger.warning(f"Skipping warmup of unknown model(s): {', '.join(unknown)}")
+            names = [name for name in names if name in self._loaders]
+        self._warmup_models = names
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    # Already recorded as failed; keep warming the others
+                    pass
+            logger.info("Model warmup finished")
+
+        self._warmup_thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def status(self) -> Dict[str, Dict]:
+        """Per-model load state ("pending", "loading", "ready", "evicted", "failed"), load time, counters and last error."""
+        with self._lock:
+            return {name: dict(status) for name, status in self._status.items()}
+
+    def memory(self) -> Dict:
+        """Memory per loaded shared model, their total against the budget, load and eviction counters."""
+        with self._lock:
+            models = {
+                name: {"model_id": status["model_id"], "device": status["device"], "memory_bytes": status["memory_bytes"],
+                       "idle_seconds": round(time.monotonic() - self._last_used.get(name, time.monotonic()), 1)}
+                for name, status in self._status.items() if "memory_bytes" in status and name in self._models
+            }
+            return {
+                "models": models,
+                "total_bytes": self._resident_bytes(),
+                "budget_bytes": self.memory_budget_bytes or None,
+                "idle_ttl_seconds": self.idle_ttl_seconds or None,
+                "loads": self.loads,
+                "reloads": self.reloads,
+                "evictions": dict(self.evictions),
+                "process_rss_bytes": process_rss_bytes()
+            }
+
+    def ready(self) -> bool:
+        """
+        True once every model named in the warmup has loaded (always true when there is no warmup).
+        Models evicted since still count: they reload transparently on next use.
+        """
+        return all(self.is_loaded(name) or self._status[name]["state"] == EVICTED for name in self._warmup_models)
+
+# Global instance
+model_registry = None
+_model_registry_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """Get or create the global model registry."""
+    global model_registry
+    with _model_registry_lock:
+        if model_registry is None:
+            model_registry = ModelRegistry(
+                memory_budget_bytes=int(float(os.getenv('MODEL_MEMORY_BUDGET_MB', '0')) * 1024 * 1024),
+                idle_ttl_seconds=float(os.getenv('MODEL_IDLE_TTL_SECONDS', '0'))
+            )
+    return model_registry
+
+def warmup_models_from_env() -> Optional[threading.Thread]:
+    """
+    Start the background warmup configured by MODEL_WARMUP (default true) and
+    MODEL_WARMUP_MODELS (comma-separated names, default: all models registered for warmup).
+    """
+    if os.getenv('MODEL_WARMUP', 'true').lower() != 'true':
+        logger.info("Model warmup disabled; models load on first use")
+        return None
+    names = [name.strip() for name in os.getenv('MODEL_WARMUP_MODELS', '').split(',') if name.strip()]
+    return get_model_registry().warmup(names or None)
@@ -0,0 +1,152 @@
+"""
+Model Tiers and Latency-Budget Routing
+Each local NLP task (summarisation, sentence embeddings, parsing) has a small, base and
+large model. A request can name a tier, or give a latency budget and get the largest tier
+whose measured latency fits it: interactive mobile clients take the fast path, batch jobs
+the large models. Latency is tracked per task and tier, per 1000 characters of input,
+from the requests the server actually handles.
+"""
+
+import os
+import threading
+import logging
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TIER_ORDER = ["small", "base", "large"]
+
+# Model per task and tier
+MODEL_TIERS = {
+    "summarizer": {
+        "small": "sshleifer/distilbart-cnn-6-6",
+        "base": "sshleifer/distilbart-cnn-12-6",
+        "large": "facebook/bart-large-cnn",
+    },
+    "sbert": {
+        "small": "all-MiniLM-L6-v2",
+        "base": "all-MiniLM-L12-v2",
+        "large": "all-mpnet-base-v2",
+    },
+    "spacy": {
+        "small": "en_core_web_sm",
+        "base": "en_core_web_md",
+        "large": "en_core_web_lg",
+    },
+}
+
+# Tier used when a request asks for neither a tier nor a latency budget
+DEFAULT_MODEL_TIER = os.getenv('MODEL_TIER', 'large')
+# Relative cost of the tiers, used to estimate a tier that has not been measured yet from one that has
+TIER_COST_PRIOR = {"small": 0.25, "base": 0.5, "large": 1.0}
+# Recent samples kept per task and tier, and the percentile a budget is checked against
+LATENCY_WINDOW = int(os.getenv('TIER_LATENCY_WINDOW', '100'))
+LATENCY_PERCENTILE = float(os.getenv('TIER_LATENCY_PERCENTILE', '90'))
+
+def validate_tier(tier: str) -> str:
+    if tier not in TIER_ORDER:
+        raise ValueError(f"Unknown model tier '{tier}'. Available: {', '.join(TIER_ORDER)}")
+    return tier
+
+def tier_model_name(task: str, tier: str) -> str:
+    """Model id serving `task` at `tier`."""
+    return MODEL_TIERS[task][validate_tier(tier)]
+
+def registry_name(task: str, tier: str) -> str:
+    """Name of a task's tier in the model registry, e.g. 'summarizer:small'."""
+    return f"{task}:{validate_tier(tier)}"
+
+def _kchars(text_length: int) -> float:
+    # Fixed per-call costs dominate short inputs, so anything under 1000 characters counts as 1000
+    return max(text_length / 1000.0, 1.0)
+
+class TierLatencyStats:
+    def __init__(self, window: int = LATENCY_WINDOW, percentile: float = LATENCY_PERCENTILE):
+        """
+        Args:
+            window (int): Recent samples kept per task and tier
+            percentile (float): Percentile of seconds per 1000 characters used for estimates
+        """
+        self.window = window
+        self.percentile = percentile
+        self._samples: Dict[tuple, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, task: str, tier: str, seconds: float, text_length: int):
+        """Adds one measured call of `task` at `tier` over `text_length` characters."""
+        with self._lock:
+            samples = self._samples.setdefault((task, tier), deque(maxlen=self.window))
+            samples.append(seconds / _kchars(text_length))
+
+    def _per_kchar(self, task: str, tier: str) -> Optional[float]:
+        samples = self._samples.get((task, tier))
+        if samples:
+            return float(np.percentile(samples, self.percentile))
+        # Scale from the nearest measured tier by the prior cost ratio
+        for other in sorted(TIER_ORDER, key=lambda name: abs(TIER_ORDER.index(name) - TIER_ORDER.index(tier))):
+            samples = self._samples.get((task, other))
+            if samples:
+                return float(np.percentile(samples, self.percentile)) * TIER_COST_PRIOR[tier] / TIER_COST_PRIOR[other]
+        return None
+
+    def estimate(self, task: str, tier: str, text_length: int) -> Optional[float]:
+        """Expected seconds for `task` at `tier` over `text_length` characters; None before any measurement."""
+        with self._lock:
+            per_kchar = self._per_kchar(task, tier)
+        return None if per_kchar is None else per_kchar * _kchars(text_length)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                f"{task}:{tier}": {
+                    "samples": len(samples),
+                    f"p{self.percentile:g}_seconds_per_1k_chars": round(float(np.percentile(samples, self.percentile)), 4),
+                    "mean_seconds_per_1k_chars": round(float(np.mean(samples)), 4)
+                }
+                for (task, tier), samples in sorted(self._samples.items()) if samples
+            }
+
+# Global instance
+tier_stats = None
+_tier_stats_lock = threading.Lock()
+
+def get_tier_stats() -> TierLatencyStats:
+    """Get or create the global per-tier latency statistics."""
+    global tier_stats
+    with _tier_stats_lock:
+        if tier_stats is None:
+            tier_stats = TierLatencyStats()
+        return tier_stats
+
+def choose_tier(tasks: Iterable[str], tier: Optional[str] = None, latency_budget_ms: Optional[float] = None,
+                text_length: int = 0) -> str:
+    """
+    Picks the model tier for a request.
+
+    Args:
+        tasks (Iterable[str]): Tasks the request will run (keys of MODEL_TIERS)
+        tier (str): Tier asked for explicitly; wins over the budget
+        latency_budget_ms (float): Time the tasks together may take
+        text_length (int): Characters of input, to scale the latency estimates
+
+    Returns:
+        str: An explicit tier, else the largest tier whose estimated latency for all tasks fits
+        the budget (the smallest if none fits or nothing has been measured yet), else the default
+    """
+    if tier:
+        return validate_tier(tier)
+    if latency_budget_ms is None:
+        return validate_tier(DEFAULT_MODEL_TIER)
+    tasks = list(tasks)
+    stats = get_tier_stats()
+    budget = latency_budget_ms / 1000.0
+    for candidate in reversed(TIER_ORDER):
+        estimates = [stats.estimate(task, candidate, text_length) for task in tasks]
+        if None in estimates:
+            continue
+        if sum(estimates) <= budget:
+            return candidate
+    return TIER_ORDER[0]
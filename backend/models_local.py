@@ -5,19 +5,16 @@ Optimized for detecting critical legal details like dates, amounts, deadlines
 """
 
 import torch
-from transformers import (
-    BartForConditionalGeneration, 
-    BartTokenizer,
-    AutoTokenizer, 
-    AutoModelForTokenClassification,
-    pipeline
-)
 import re
 from datetime import datetime, timedelta
-import spacy
 from typing import List, Dict, Tuple
 import logging
 
+from nlp_pipelines import parse, load_spacy_model
+from long_summarizer import summarize_long, SUMMARY_CHUNK_TOKENS
+from onnx_backend import load_seq2seq_model, load_ner_pipeline, load_tokenizer, model_variant
+from model_tiers import DEFAULT_MODEL_TIER, tier_model_name
+
 logger = logging.getLogger(__name__)
 
 class LocalLegalAnalyzer:
@@ -25,25 +22,23 @@ class LocalLegalAnalyzer:
         """Initialize BART + BERT models for legal analysis"""
         logger.info("Loading local AI models (BART + BERT)...")
         
-        # BART Large CNN for summarization
+        # BART Large CNN for summarization, BERT for Named Entity Recognition (dates, amounts, etc.)
+        # and spaCy for additional legal entity extraction. The models are shared process-wide
+        # through the model registry (one copy of BART for this analyzer and the summarizer;
+        # the same spaCy pipeline as key point extraction) and fetched from it on each use.
         self.bart_model_name = "facebook/bart-large-cnn"
-        self.bart_tokenizer = BartTokenizer.from_pretrained(self.bart_model_name)
-        self.bart_model = BartForConditionalGeneration.from_pretrained(self.bart_model_name)
-        
-        # BERT for Named Entity Recognition (dates, amounts, etc.)
-        self.ner_pipeline = pipeline(
-            "ner", 
-            model="dslim/bert-base-NER",
-            tokenizer="dslim/bert-base-NER",
-            aggregation_strategy="simple"
-        )
-        
-        # spaCy for additional legal entity extraction
+        self.ner_model_name = "dslim/bert-base-NER"
+        self.spacy_model_name = tier_model_name("spacy", DEFAULT_MODEL_TIER)
+        self.legal_prefix = "Legal document summary: "
+        self._prefix_tokens = len(self.bart_tokenizer.encode(self.legal_prefix, add_special_tokens=False))
+        # Load now so a missing model fails here, as before
+        self.bart_model
+        self.ner_pipeline
         try:
-            self.nlp = spacy.load("en_core_web_sm")
+            self.nlp
         except OSError:
-            logger.warning("spaCy model not found. Install with: python -m spacy download en_core_web_sm")
-            self.nlp = None
+            logger.warning(f"spaCy model not found. Install with: python -m spacy download {self.spacy_model_name}")
+            self.spacy_model_name = None
         
         # Legal keywords for critical point detection
         self.critical_patterns = {
@@ -72,38 +67,70 @@ class LocalLegalAnalyzer:
         
         logger.info("Local AI models loaded successfully")
 
+    @property
+    def bart_tokenizer(self):
+        return load_tokenizer(self.bart_model_name)
+
+    @property
+    def bart_model(self):
+        # PyTorch or ONNX Runtime, per INFERENCE_BACKEND (see onnx_backend.py)
+        return load_seq2seq_model(self.bart_model_name)
+
+    @property
+    def ner_pipeline(self):
+        return load_ner_pipeline(self.ner_model_name, aggregation_strategy="simple")
+
+    @property
+    def nlp(self):
+        return load_spacy_model(self.spacy_model_name) if self.spacy_model_name else None
+
     def summarize_with_bart(self, text: str, max_length: int = 200) -> str:
-        """Generate summary using BART Large CNN"""
+        """Generate summary using BART Large CNN (long documents are summarised chunk by chunk)"""
         try:
-            # Prepare text for BART (legal document focus)
-            legal_prefix = "Legal document summary: "
-            input_text = legal_prefix + text[:1024]  # BART has token limits
-            
-            inputs = self.bart_tokenizer.encode(
-                input_text, 
-                return_tensors="pt", 
-                max_length=1024, 
-                truncation=True
+            return summarize_long(
+                text,
+                self._bart_generate_batch,
+                self._count_bart_tokens,
+                model_variant(self.bart_model_name),
+                max_length=max_length,
+                min_length=50,
+                max_tokens=SUMMARY_CHUNK_TOKENS - self._prefix_tokens
             )
             
-            # Generate summary
-            with torch.no_grad():
-                summary_ids = self.bart_model.generate(
-                    inputs,
-                    max_length=max_length,
-                    min_length=50,
-                    length_penalty=2.0,
-                    num_beams=4,
-                    early_stopping=True
-                )
-            
-            summary = self.bart_tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-            return summary
-            
         except Exception as e:
             logger.error(f"BART summarization failed: {e}")
             return f"Error in summarization: {str(e)}"
 
+    def _count_bart_tokens(self, text: str) -> int:
+        return len(self.bart_tokenizer.encode(text, add_special_tokens=False))
+
+    def _bart_generate_batch(self, texts: List[str], max_length: int, min_length: int) -> List[str]:
+        """Summarise several chunks in one padded generate call"""
+        # Prepare text for BART (legal document focus)
+        inputs = self.bart_tokenizer(
+            [self.legal_prefix + text for text in texts],
+            return_tensors="pt", 
+            max_length=1024, 
+            truncation=True,
+            padding=True
+        )
+        
+        # Generate summaries
+        bart_model = self.bart_model
+        inputs = inputs.to(bart_model.device)
+        with torch.no_grad():
+            summary_ids = bart_model.generate(
+                inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                max_length=max_length,
+                min_length=min_length,
+                length_penalty=2.0,
+                num_beams=4,
+                early_stopping=True
+            )
+        
+        return self.bart_tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+
     def extract_critical_points_with_bert(self, text: str) -> List[Dict]:
         """Extract critical legal points using BERT + pattern matching"""
         critical_points = []
@@ -131,7 +158,8 @@ class LocalLegalAnalyzer:
             
             # 3. Use spaCy for additional entity extraction
             if self.nlp:
-                doc = self.nlp(text)
+                # NER plus the parser for sentence context; tagger and lemmatizer are not needed
+                doc = parse(self.nlp, text, task="entities")
                 for ent in doc.ents:
                     if ent.label_ in ['DATE', 'MONEY', 'PERCENT', 'TIME']:
                         critical_points.append({
@@ -0,0 +1,71 @@
+"""
+Task-Specific spaCy Pipelines
+Each task runs only the spaCy components it reads from. Key point extraction needs sentence
+boundaries and dependency labels (tok2vec + parser); entity extraction also needs NER.
+The tagger, attribute ruler and lemmatizer feed nothing we use, so they are skipped.
+Components are disabled per call, so one loaded pipeline serves every task and thread.
+"""
+
+import os
+from typing import Iterable, Iterator, List
+
+from model_registry import get_model_registry
+
+# Components each task switches off; names a pipeline does not have are ignored
+SPACY_PIPELINE_PROFILES = {
+    "key_points": ["tagger", "attribute_ruler", "lemmatizer", "ner"],
+    "entities": ["tagger", "attribute_ruler", "lemmatizer"],
+    "full": [],
+}
+
+# nlp.pipe settings for multi-document workloads
+SPACY_BATCH_SIZE = int(os.getenv('SPACY_BATCH_SIZE', '16'))
+SPACY_N_PROCESS = int(os.getenv('SPACY_N_PROCESS', '1'))
+
+def load_spacy_model(model_name: str):
+    """
+    The process-wide spaCy pipeline `model_name` (shared through the model registry, so the
+    key point extractor and the local analyzer use one copy). Downloads it if it is missing
+    and MODEL_AUTO_DOWNLOAD is true (the default).
+    """
+    def load():
+        import spacy
+        try:
+            return spacy.load(model_name)
+        except OSError:
+            if os.getenv('MODEL_AUTO_DOWNLOAD', 'true').lower() != 'true':
+                raise
+            print(f"Downloading {model_name} model for SpaCy...")
+            spacy.cli.download(model_name)
+            return spacy.load(model_name)
+    # spaCy runs on the CPU here
+    return get_model_registry().shared(model_name, load, device="cpu")
+
+def disabled_components(nlp, task: str) -> List[str]:
+    """Components of `nlp` the task does not need."""
+    if task not in SPACY_PIPELINE_PROFILES:
+        raise ValueError(f"Unknown spaCy pipeline profile '{task}'. Available: {', '.join(SPACY_PIPELINE_PROFILES)}")
+    return [name for name in SPACY_PIPELINE_PROFILES[task] if name in nlp.pipe_names]
+
+def parse(nlp, text: str, task: str = "full"):
+    """Runs `nlp` on one text with only the components `task` needs."""
+    return nlp(text, disable=disabled_components(nlp, task))
+
+def parse_batch(nlp, texts: Iterable[str], task: str = "full", batch_size: int = None,
+                n_process: int = None) -> Iterator:
+    """
+    Streams Docs for many texts through nlp.pipe, in input order.
+
+    Args:
+        nlp: Loaded spaCy pipeline
+        texts (Iterable[str]): Documents to parse
+        task (str): Pipeline profile (see SPACY_PIPELINE_PROFILES)
+        batch_size (int): Texts per batch (default SPACY_BATCH_SIZE)
+        n_process (int): Worker processes (default SPACY_N_PROCESS); >1 pays off for large batches
+    """
+    return nlp.pipe(
+        texts,
+        disable=disabled_components(nlp, task),
+        batch_size=batch_size or SPACY_BATCH_SIZE,
+        n_process=n_process or SPACY_N_PROCESS
+    )
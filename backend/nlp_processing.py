@@ -1,98 +1,104 @@
-from typing import List, Dict
-import spacy
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
+from typing import List, Dict, Tuple
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from functools import lru_cache
 import os
+import asyncio
+import time
+import threading
+from functools import partial
+
+from model_registry import get_model_registry
+from embedding_cache import encode_with_cache
+from clause_taxonomy import DEFAULT_TAXONOMY_PATH, load_concept_index
+from nlp_pipelines import parse, parse_batch, load_spacy_model
+from long_summarizer import summarize_long
+from onnx_backend import load_summarization_pipeline, load_sentence_encoder, model_variant
+from model_tiers import TIER_ORDER, DEFAULT_MODEL_TIER, tier_model_name, registry_name, get_tier_stats
+from inference_batcher import MicroBatcher, BATCHING_ENABLED, length_bucket
 
 # Import LLM service for cloud-based analysis
 try:
-    from llm_service import get_llm_service
+    from llm_service import get_llm_service, LLM_FUSED_ANALYSIS
     LLM_AVAILABLE = True
 except ImportError:
     LLM_AVAILABLE = False
+    LLM_FUSED_ANALYSIS = False
 
 # --- Constants ---
 # Words indicating legal actions/obligations/rights
 LEGAL_ACTION_WORDS = {"shall", "must", "will", "may", "agrees", "obligated", "undertakes", "covenants"}
 # Words indicating conditions
 CONDITIONAL_WORDS = {"if", "unless", "provided that", "in the event", "upon condition that", "subject to"}
-
-# Predefined legal phrases for semantic matching (expand this list significantly!)
-# These are conceptual categories or specific phrases you want to detect.
-TARGET_PHRASES = [
-    "indemnify the other party",
-    "hold harmless from any losses",
-    "liable for damages",
-    "terminate the agreement",
-    "expiration of this contract",
-    "governing law",
-    "dispute resolution mechanism",
-    "confidential information",
-    "force majeure event",
-    "breach of contract",
-    "assignment of rights",
-    "intellectual property ownership",
-    "warranties and representations",
-    "effective date of this agreement",
-    "notice period for termination",
-    "payment schedule",
-    "delivery terms",
-    "default interest rate",
-    "severability clause",
-    "entire agreement clause",
-    "amendment procedure",
-    "jurisdiction of courts",
-    "arbitration clause",
-    "non-disclosure obligation",
-    "limitation of liability",
-    "representation and warranty",
-    "due diligence",
-    "escrow account",
-    "lien on property",
-    "guarantee of performance"
-]
-
-# --- Model Loading (Singleton Pattern) ---
-# These models are loaded once when the module is first imported.
-# This avoids reloading them for every API request.
-
-# SpaCy model for dependency parsing and sentence tokenization
-# 'en_core_web_lg' is recommended for better parsing than 'sm'
-try:
-    nlp = spacy.load("en_core_web_lg")
-except OSError:
-    print("Downloading en_core_web_lg model for SpaCy...")
-    spacy.cli.download("en_core_web_lg")
-    nlp = spacy.load("en_core_web_lg")
-
-# HuggingFace Transformers pipeline for summarization
-# 'facebook/bart-large-cnn' is a good general choice.
-# For production, consider 'sshleifer/distilbart-cnn-12-6' for smaller size, or legal-specific models.
-summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-
-# Sentence-BERT model for semantic similarity
-# 'all-mpnet-base-v2' is a good general-purpose model for sentence embeddings.
-sbert_model = SentenceTransformer('all-mpnet-base-v2')
-
-# Precompute embeddings for target phrases (done once at startup)
-# This makes semantic similarity checks very fast during runtime.
-target_phrase_embeddings = sbert_model.encode(TARGET_PHRASES)
+# Dependency labels an action word needs to count as a clause's main verb or its auxiliary
+ACTION_DEPENDENCIES = {"ROOT", "aux", "auxpass"}
+# Confidence given to sentences found by the rule-based clause matcher, per clause type
+RULE_CLAUSE_CONFIDENCE = {
+    "obligation/right": 0.95, # High confidence for direct matches
+    "condition": 0.85 # Good confidence
+}
+
+# Clause concepts for semantic matching are loaded from a versioned taxonomy file
+# (data/clause_taxonomy.json), with embeddings prebuilt by clause_taxonomy.py.
+
+# Models per task come in small / base / large tiers (see model_tiers.py); these are the
+# default tier's. 'en_core_web_lg', 'all-mpnet-base-v2' and 'facebook/bart-large-cnn' are large.
+SBERT_MODEL_NAME = tier_model_name("sbert", DEFAULT_MODEL_TIER)
+SUMMARIZER_MODEL_NAME = tier_model_name("summarizer", DEFAULT_MODEL_TIER)
+# Concepts reported per semantically matched sentence
+SEMANTIC_TOP_K = int(os.getenv('SEMANTIC_TOP_K', '3'))
+
+# --- Model Loading (Lazy Registry) ---
+# Models are registered here and loaded on first use, or ahead of time by the warmup
+# the server starts in the background, so importing this module stays cheap.
+# Every tier is registered as "<task>:<tier>"; only the default tier is warmed up.
+
+def _load_spacy(model_name: str):
+    # SpaCy model for dependency parsing and sentence tokenization
+    # 'en_core_web_lg' parses better than 'sm', which is much faster
+    return load_spacy_model(model_name)
+
+def _load_summarizer(model_name: str):
+    # HuggingFace Transformers pipeline for summarization
+    # INFERENCE_BACKEND=onnx runs it on ONNX Runtime instead of PyTorch (see onnx_backend.py)
+    return load_summarization_pipeline(model_name)
+
+def _load_sbert(model_name: str):
+    return load_sentence_encoder(model_name)
+
+def _load_concept_index(tier: str):
+    # Memory-map the prebuilt taxonomy embeddings, so semantic similarity checks
+    # are very fast during runtime and workers share one copy.
+    # Concept embeddings must come from the same Sentence-BERT model as the sentences; it is
+    # loaded first so the artifact check sees the weights revision actually in use.
+    sbert = models.get(registry_name("sbert", tier))
+    return load_concept_index(DEFAULT_TAXONOMY_PATH, tier_model_name("sbert", tier), sbert.encode)
+
+def _load_clause_matcher(tier: str):
+    # Compiled once against the spaCy vocabulary (see _build_clause_matcher)
+    nlp = models.get(registry_name("spacy", tier))
+    return _build_clause_matcher(nlp.vocab, nlp.make_doc)
+
+models = get_model_registry()
+for _tier in TIER_ORDER:
+    _warmup = _tier == DEFAULT_MODEL_TIER
+    models.register(registry_name("spacy", _tier), partial(_load_spacy, tier_model_name("spacy", _tier)), warmup=_warmup)
+    models.register(registry_name("summarizer", _tier), partial(_load_summarizer, tier_model_name("summarizer", _tier)), warmup=_warmup)
+    models.register(registry_name("sbert", _tier), partial(_load_sbert, tier_model_name("sbert", _tier)), warmup=_warmup)
+    models.register(registry_name("concept_index", _tier), partial(_load_concept_index, _tier), warmup=_warmup)
+    models.register(registry_name("clause_matcher", _tier), partial(_load_clause_matcher, _tier), warmup=_warmup)
 
 # --- Core NLP Functions ---
 
-def summarize_document(text: str, ai_model: str = "gemini") -> str:
+def summarize_document(text: str, ai_model: str = "gemini", tier: str = None) -> str:
     """
     Generates an abstractive summary of the given English text.
     Uses selected AI model: 'gemini' for LLM or 'bart' for local BART+BERT.
+    `tier` picks the local summarizer size ('small', 'base', 'large'; default MODEL_TIER).
     """
     if len(text.split()) < 50:
         return "Document too short to generate a meaningful summary."
 
     # Use Gemini API if selected and available
-    if ai_model == "gemini" and LLM_AVAILABLE and os.getenv('GEMINI_API_KEY'):
+    if _use_llm(ai_model):
         try:
             llm_service = get_llm_service()
             return llm_service.summarize_document(text)
@@ -103,9 +109,13 @@ def summarize_document(text: str, ai_model: str = "gemini") -> str:
     # Use local BART model if selected or as fallback
     if ai_model == "bart":
         try:
-            # Try local BART model
-            summary = summarizer(text, max_length=250, min_length=50, do_sample=False)
-            return summary[0]['summary_text']
+            # Try local BART model; long documents are summarised chunk by chunk (map-reduce)
+            tier = tier or DEFAULT_MODEL_TIER
+            summarizer = models.get(registry_name("summarizer", tier))
+            start = time.perf_counter()
+            summary = _summarize_with_pipeline(summarizer, text, max_length=250, min_length=50, tier=tier)
+            get_tier_stats().record("summarizer", tier, time.perf_counter() - start, len(text))
+            return summary
         except Exception as e:
             print(f"BART model unavailable, using enhanced fallback: {e}")
             # Enhanced fallback with better legal document analysis
@@ -115,116 +125,256 @@ def summarize_document(text: str, ai_model: str = "gemini") -> str:
     return _create_enhanced_summary(text)
 
 
-def highlight_key_points(text: str, ai_model: str = "gemini") -> List[Dict]:
+def _run_summarizer_batch(texts: List[str], group) -> List[str]:
+    # Every text in the batch shares the model tier, generation settings and a length bucket
+    tier, max_length, min_length, _ = group
+    results = models.get(registry_name("summarizer", tier))(texts, max_length=max_length, min_length=min_length,
+                                       do_sample=False, truncation=True, batch_size=len(texts))
+    return [result['summary_text'] for result in results]
+
+# Global instance
+summary_batcher = None
+_summary_batcher_lock = threading.Lock()
+
+def get_summary_batcher() -> MicroBatcher:
+    """Get or create the scheduler that batches BART summarization across concurrent requests."""
+    global summary_batcher
+    with _summary_batcher_lock:
+        if summary_batcher is None:
+            summary_batcher = MicroBatcher(_run_summarizer_batch, name="bart")
+        return summary_batcher
+
+def _summarize_with_pipeline(summarizer, text: str, max_length: int, min_length: int,
+                             tier: str = DEFAULT_MODEL_TIER) -> str:
+    """Hierarchical summary of `text` with a HuggingFace summarization pipeline."""
+    tokenizer = summarizer.tokenizer
+
+    def count_tokens(piece: str) -> int:
+        return len(tokenizer.encode(piece, add_special_tokens=False))
+
+    def summarize_batch(texts: List[str], batch_max_length: int, batch_min_length: int) -> List[str]:
+        if not BATCHING_ENABLED:
+            return _run_summarizer_batch(texts, (tier, batch_max_length, batch_min_length, None))
+        # Chunks from this and other concurrent requests are batched together by length
+        batcher = get_summary_batcher()
+        futures = [
+            batcher.submit(chunk, (tier, batch_max_length, batch_min_length, length_bucket(count_tokens(chunk))))
+            for chunk in texts
+        ]
+        return [future.result() for future in futures]
+
+    return summarize_long(text, summarize_batch, count_tokens, model_variant(tier_model_name("summarizer", tier)),
+                          max_length=max_length, min_length=min_length)
+
+def highlight_key_points(text: str, ai_model: str = "gemini", tier: str = None) -> List[Dict]:
     """
     Extracts crucial legal clauses and key points.
     Uses selected AI model: 'gemini' for LLM or 'bart' for local BART+BERT analysis.
+    `tier` picks the local spaCy and Sentence-BERT sizes ('small', 'base', 'large'; default MODEL_TIER).
     Returns a list of dictionaries, each containing the clause text, type, and confidence.
     """
 
     # Use Gemini API if selected and available
-    if ai_model == "gemini" and LLM_AVAILABLE and os.getenv('GEMINI_API_KEY'):
+    if _use_llm(ai_model):
         try:
             llm_service = get_llm_service()
             key_points_text = llm_service.extract_key_points(text)
-
-            # Convert to the expected format for compatibility
-            return [
-                {
-                    "text": point,
-                    "type": "gemini_extracted",
-                    "confidence": 0.95
-                }
-                for point in key_points_text
-            ]
+            return _gemini_key_points(key_points_text)
         except Exception as e:
             print(f"Gemini key point extraction failed, using local fallback: {e}")
             ai_model = "bart"  # Fallback to local processing
 
     # Use local BART+BERT processing if selected or as fallback
     if ai_model == "bart":
-        doc = nlp(text)
-        all_clauses = []
+        tier = tier or DEFAULT_MODEL_TIER
+        # Only the parser is needed (sentences and dependency labels)
+        start = time.perf_counter()
+        doc = parse(models.get(registry_name("spacy", tier)), text, task="key_points")
+        get_tier_stats().record("spacy", tier, time.perf_counter() - start, len(text))
+        return _local_key_points(doc, text, tier, record_latency=True)
+
+    # Default fallback
+    return [{"text": "Could not extract key points with the selected model.", "type": "error", "confidence": 0.1}]
 
-        # Step 1: Rule-based extraction (high precision for direct matches)
-        all_clauses.extend(_extract_legal_actions(doc))
-        all_clauses.extend(_extract_conditional_clauses(doc))
+def _use_llm(ai_model: str) -> bool:
+    return ai_model == "gemini" and LLM_AVAILABLE and bool(os.getenv('GEMINI_API_KEY'))
+
+def _gemini_key_points(key_points_text: List[str]) -> List[Dict]:
+    # Convert to the expected format for compatibility
+    return [
+        {
+            "text": point,
+            "type": "gemini_extracted",
+            "confidence": 0.95
+        }
+        for point in key_points_text
+    ]
 
-        # Step 2: Semantic similarity (catch paraphrases and broader concepts)
-        all_clauses.extend(_find_semantic_matches(doc))
+# --- Async variants ---
+# Gemini calls are awaited on the event loop (LLMService.*_async), so many can be in flight
+# at once; local models, and the local fallback, run in a worker thread.
 
-        # Step 3: Deduplicate and rank by confidence
-        return _rank_and_deduplicate(all_clauses)
+async def summarize_document_async(text: str, ai_model: str = "gemini", tier: str = None) -> str:
+    """summarize_document without blocking the event loop."""
+    if _use_llm(ai_model) and len(text.split()) >= 50:
+        try:
+            return await get_llm_service().summarize_document_async(text)
+        except Exception as e:
+            print(f"Gemini summarization failed, using local fallback: {e}")
+            ai_model = "bart"  # Fallback to BART
+    return await asyncio.to_thread(summarize_document, text, ai_model, tier)
 
-    # Default fallback
-    return [{"text": "Could not extract key points with the selected model.", "type": "error", "confidence": 0.1}]
+async def highlight_key_points_async(text: str, ai_model: str = "gemini", tier: str = None) -> List[Dict]:
+    """highlight_key_points without blocking the event loop."""
+    if _use_llm(ai_model):
+        try:
+            return _gemini_key_points(await get_llm_service().extract_key_points_async(text))
+        except Exception as e:
+            print(f"Gemini key point extraction failed, using local fallback: {e}")
+            ai_model = "bart"  # Fallback to local processing
+    return await asyncio.to_thread(highlight_key_points, text, ai_model, tier)
+
+async def analyze_document_async(text: str, ai_model: str = "gemini", tier: str = None) -> Tuple:
+    """
+    Summary and key points for one document. In Gemini mode (with LLM_FUSED_ANALYSIS) the
+    document is sent once and both come back from a single structured call; otherwise
+    summarize_document_async and highlight_key_points_async run together. If the single call
+    fails, Gemini mode stays on Gemini: the two separate calls are made (and return the LLM
+    service's failure messages if Gemini is down) rather than loading the local models.
+
+    Returns:
+        Tuple: (summary, key points); either may be the exception its step raised
+    """
+    if _use_llm(ai_model) and LLM_FUSED_ANALYSIS and len(text.split()) >= 50:
+        try:
+            analysis = await get_llm_service().analyze_document_fused_async(text)
+            return analysis["summary"], _gemini_key_points(analysis["key_points"])
+        except Exception as e:
+            print(f"Gemini single-call analysis failed, using separate summary and key point calls: {e!r}")
+    return tuple(await asyncio.gather(
+        summarize_document_async(text, ai_model=ai_model, tier=tier),
+        highlight_key_points_async(text, ai_model=ai_model, tier=tier),
+        return_exceptions=True
+    ))
+
+def highlight_key_points_batch(texts: List[str], batch_size: int = None, n_process: int = None,
+                               tier: str = None) -> List[List[Dict]]:
+    """
+    Local (BART+BERT mode) key point extraction for many documents at once.
+    Documents are parsed in batches through nlp.pipe (see nlp_pipelines.parse_batch);
+    returns one list of key points per input text, in order.
+    """
+    tier = tier or DEFAULT_MODEL_TIER
+    docs = parse_batch(models.get(registry_name("spacy", tier)), texts, task="key_points",
+                       batch_size=batch_size, n_process=n_process)
+    return [_local_key_points(doc, text, tier) for doc, text in zip(docs, texts)]
+
+def _local_key_points(doc, text: str, tier: str = DEFAULT_MODEL_TIER, record_latency: bool = False) -> List[Dict]:
+    all_clauses = []
+
+    # Step 1: Rule-based extraction (high precision for direct matches)
+    all_clauses.extend(_extract_rule_based_clauses(doc, text, tier))
+
+    # Step 2: Semantic similarity (catch paraphrases and broader concepts)
+    start = time.perf_counter()
+    all_clauses.extend(_find_semantic_matches(doc, tier=tier))
+    if record_latency:
+        get_tier_stats().record("sbert", tier, time.perf_counter() - start, len(text))
+
+    # Step 3: Deduplicate and rank by confidence
+    return _rank_and_deduplicate(all_clauses)
 
 # --- Helper Functions for Key Point Extraction ---
 
-def _extract_legal_actions(doc) -> List[Dict]:
+def _build_clause_matcher(vocab, make_doc):
+    """
+    One spaCy PhraseMatcher (case-insensitive) holding every action and condition term, so a
+    single hashed pass over the document finds both clause types, including multi-word
+    terms like "provided that" that a token-by-token comparison can never match.
+    """
+    from spacy.matcher import PhraseMatcher
+    matcher = PhraseMatcher(vocab, attr="LOWER")
+    matcher.add("obligation/right", [make_doc(term) for term in LEGAL_ACTION_WORDS])
+    matcher.add("condition", [make_doc(term) for term in CONDITIONAL_WORDS])
+    return matcher
+
+def _match_clauses(doc, matcher, text: str = None) -> List[Dict]:
     """
-    Extracts sentences containing explicit legal action/obligation verbs
-    and their associated subjects/objects using dependency parsing.
+    Runs the clause matcher once and maps each match to its sentence. Action terms only count
+    as the clause's main verb or its auxiliary (dependency ROOT, aux or auxpass). Each sentence
+    is reported at most once per clause type, with its character span in the document.
+    Pass the `text` the doc was parsed from to skip rebuilding it from the tokens.
     """
-    actions = []
-    for sent in doc.sents:
-        for token in sent:
-            # Check if the token is an action word and an auxiliary verb or root of a clause
-            if token.text.lower() in LEGAL_ACTION_WORDS and token.dep_ in ("ROOT", "aux", "auxpass"):
-                # Attempt to get the full clause/sentence subtree
-                # A more robust approach might build the clause from head to children
-                clause_text = sent.text.strip()
-                actions.append({
-                    "text": clause_text,
-                    "type": "obligation/right",
-                    "confidence": 0.95 # High confidence for direct matches
-                })
-                break # Move to next sentence after finding one match in it
-    return actions
-
-def _extract_conditional_clauses(doc) -> List[Dict]:
+    from spacy.attrs import SENT_START
+    matches = matcher(doc)
+    if not matches:
+        return []
+    # Sentence boundaries as token indices, looked up for all matches at once
+    sentence_starts = np.union1d([0], np.flatnonzero(doc.to_array(SENT_START) == 1))
+    sentence_index = np.searchsorted(sentence_starts, [start for _, start, _ in matches], side="right") - 1
+    text = doc.text if text is None else text
+
+    clauses = {label: [] for label in RULE_CLAUSE_CONFIDENCE}
+    seen = set()
+    for (match_id, start, end), index in zip(matches, sentence_index):
+        label = doc.vocab.strings[match_id]
+        if (label, index) in seen:
+            continue # Move to next sentence after finding one match in it
+        if label == "obligation/right" and not any(doc[i].dep_ in ACTION_DEPENDENCIES for i in range(start, end)):
+            continue
+        seen.add((label, index))
+        last = doc[int(sentence_starts[index + 1]) - 1 if index + 1 < len(sentence_starts) else len(doc) - 1]
+        start_char, end_char = doc[int(sentence_starts[index])].idx, last.idx + len(last)
+        clauses[label].append({
+            "text": text[start_char:end_char].strip(),
+            "type": label,
+            "confidence": RULE_CLAUSE_CONFIDENCE[label],
+            "start": start_char,
+            "end": end_char
+        })
+    return [clause for label in RULE_CLAUSE_CONFIDENCE for clause in clauses[label]]
+
+def _extract_rule_based_clauses(doc, text: str = None, tier: str = DEFAULT_MODEL_TIER) -> List[Dict]:
     """
-    Extracts sentences that express conditions (e.g., "If X, then Y").
+    Extracts sentences containing explicit legal action/obligation verbs (checked with the
+    dependency parse) and sentences that express conditions (e.g., "If X, then Y").
     """
-    conditions = []
-    for sent in doc.sents:
-        for token in sent:
-            if token.text.lower() in CONDITIONAL_WORDS:
-                conditions.append({
-                    "text": sent.text.strip(),
-                    "type": "condition",
-                    "confidence": 0.85 # Good confidence
-                })
-                break # Move to next sentence
-    return conditions
-
-@lru_cache(maxsize=1000) # Cache embeddings for repeated sentences to save computation
-def _find_semantic_matches(doc, threshold: float = 0.7) -> List[Dict]:
+    return _match_clauses(doc, models.get(registry_name("clause_matcher", tier)), text)
+
+def _find_semantic_matches(doc, threshold: float = 0.7, top_k: int = None, tier: str = DEFAULT_MODEL_TIER) -> List[Dict]:
     """
-    Compares each sentence in the document to a list of predefined legal phrases
+    Compares each sentence in the document to the clause concept taxonomy
     using Sentence-BERT to find semantically similar matches.
+    Sentence embeddings come from the content-addressed embedding cache, so sentences
+    seen in earlier documents are not encoded again. All sentences are scored against
+    the taxonomy at once (see semantic_index.ConceptIndex); each match lists up to
+    `top_k` concepts above the threshold, best first.
     """
     matches = []
     sentences = [sent.text.strip() for sent in doc.sents if sent.text.strip()] # Get all non-empty sentences
     if not sentences:
         return []
 
-    # Encode all sentences in the document at once for efficiency
-    sentence_embeddings = sbert_model.encode(sentences)
+    # Encode all uncached sentences in the document at once for efficiency
+    sentence_embeddings = encode_with_cache(models.get(registry_name("sbert", tier)), sentences,
+                                            model_variant(tier_model_name("sbert", tier)))
+    concept_index = models.get(registry_name("concept_index", tier))
+    scores, concept_ids = concept_index.search(sentence_embeddings, k=top_k or SEMANTIC_TOP_K)
 
-    # Compare each sentence's embedding to the precomputed target phrase embeddings
-    for i, (sent, embedding) in enumerate(zip(sentences, sentence_embeddings)):
-        # Calculate cosine similarity between the current sentence and all target phrases
-        similarities = cosine_similarity([embedding], target_phrase_embeddings)[0]
-        max_similarity_idx = np.argmax(similarities)
-        
+    for sent, sentence_scores, sentence_concepts in zip(sentences, scores, concept_ids):
         # If the highest similarity is above the threshold, consider it a match
-        if similarities[max_similarity_idx] >= threshold:
+        if sentence_scores[0] >= threshold:
             matches.append({
                 "text": sent,
                 "type": "semantic_match",
-                "matched_concept": TARGET_PHRASES[max_similarity_idx], # What it semantically matched
-                "confidence": float(similarities[max_similarity_idx])
+                "matched_concept": concept_index.concepts[sentence_concepts[0]], # What it semantically matched
+                "matched_category": concept_index.categories[sentence_concepts[0]],
+                "matched_concepts": [
+                    {"concept": concept_index.concepts[concept], "category": concept_index.categories[concept],
+                     "similarity": float(score)}
+                    for score, concept in zip(sentence_scores, sentence_concepts) if score >= threshold
+                ],
+                "confidence": float(sentence_scores[0])
             })
     return matches
 
@@ -3,63 +3,640 @@ import numpy as np
 import pytesseract
 from PIL import Image
 import os
+import io
+import bisect
+import json
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from ocr_pool import get_ocr_pool, pytesseract_words
+from ocr_layout import find_text_regions
+from ocr_cache import get_ocr_cache, content_hash, settings_key
 
 # Set the path to the Tesseract executable if it's not in your PATH
 # pytesseract.pytesseract.tesseract_cmd = r'/usr/local/bin/tesseract' # Example for macOS/Linux
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe' # Example for Windows
 
-def preprocess_image(image_path_or_array):
+# Keep one warm Tesseract engine per core instead of forking tesseract for every page
+OCR_POOL_ENABLED = os.getenv('OCR_WORKER_POOL', 'true').lower() == 'true'
+
+# Skip OCR entirely for pages that were already read (matched by exact content hash)
+OCR_CACHE_ENABLED = os.getenv('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+
+# Pages of one document OCR'd concurrently (defaults to the CPU count)
+OCR_PAGE_CONCURRENCY = int(os.getenv('OCR_PAGE_CONCURRENCY', '0')) or os.cpu_count() or 1
+
+# Deskew is estimated on a copy no larger than this on its long side, within +/- DESKEW_MAX_ANGLE degrees
+DESKEW_MAX_SIDE = int(os.getenv('OCR_DESKEW_MAX_SIDE', '1000'))
+DESKEW_MAX_ANGLE = float(os.getenv('OCR_DESKEW_MAX_ANGLE', '15'))
+
+# Resolution normalisation: scale pages so the median character is about
+# OCR_TARGET_TEXT_HEIGHT pixels tall (roughly 10-12pt text at 300 DPI), and let the
+# JPEG decoder skip detail we would discard anyway, but never below OCR_DECODE_MIN_SIDE.
+OCR_NORMALIZE_RESOLUTION = os.getenv('OCR_NORMALIZE_RESOLUTION', 'true').lower() == 'true'
+OCR_TARGET_TEXT_HEIGHT = float(os.getenv('OCR_TARGET_TEXT_HEIGHT', '28'))
+OCR_DECODE_MIN_SIDE = int(os.getenv('OCR_DECODE_MIN_SIDE', '2000'))
+MIN_NORMALIZE_SCALE = 0.25
+MAX_NORMALIZE_SCALE = 2.0
+
+# JPEG DCT scaling factors OpenCV can decode at directly
+_REDUCED_DECODE_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+# Layout mode: each region is read as one uniform text block, with a small white margin
+LAYOUT_REGION_PSM = 6
+LAYOUT_REGION_PADDING = 6
+
+# Adaptive mode: a cheap first pass on a grayscale copy no larger than OCR_FAST_PASS_MAX_SIDE.
+# When its mean word confidence is below OCR_CONFIDENCE_THRESHOLD, only the lines it read
+# with low confidence are re-read at full resolution through the preprocessing profile.
+OCR_ADAPTIVE = os.getenv('OCR_ADAPTIVE', 'false').lower() == 'true'
+OCR_FAST_PASS_MAX_SIDE = int(os.getenv('OCR_FAST_PASS_MAX_SIDE', '1600'))
+OCR_CONFIDENCE_THRESHOLD = float(os.getenv('OCR_CONFIDENCE_THRESHOLD', '80'))
+
+# Pages are joined with a blank line so page breaks stay paragraph breaks for the NLP step
+PAGE_SEPARATOR = "\n\n"
+
+# One frame of a multi-page TIFF; decoded only when its page is OCR'd
+TiffFrame = namedtuple("TiffFrame", ["source", "index"])
+
+# A page whose text is already known (e.g. a PDF text layer) and needs no OCR
+TextLayerPage = namedtuple("TextLayerPage", ["text"])
+
+def decode_image_bytes(data, flags=cv2.IMREAD_COLOR):
     """
-    Applies image pre-processing techniques to enhance OCR accuracy.
-    Handles both file paths and numpy arrays (from in-memory processing).
+    Decodes an encoded image (PNG, JPEG, TIFF, BMP) held in memory into a BGR array.
+    The bytes are wrapped without copying, so an upload is only ever buffered once.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    img = cv2.imdecode(buffer, flags)
+    if img is None:
+        raise ValueError("Image could not be decoded from the uploaded bytes")
+    return img
+
+def _decode_reduction(image_source) -> int:
+    """
+    Largest JPEG DCT reduction (1, 2, 4 or 8) that keeps the long side at or above
+    OCR_DECODE_MIN_SIDE. Only the header is read; other formats always decode at full size.
+    """
+    if not OCR_NORMALIZE_RESOLUTION:
+        return 1
+    try:
+        with _open_pil(image_source) as probe:
+            if probe.format != "JPEG":
+                return 1
+            long_side = max(probe.size)
+    except Exception:
+        return 1
+    for factor in (8, 4, 2):
+        if long_side / factor >= OCR_DECODE_MIN_SIDE:
+            return factor
+    return 1
+
+def _is_tiff(image_source) -> bool:
+    if isinstance(image_source, str):
+        with open(image_source, "rb") as f:
+            header = f.read(4)
+    else:
+        header = bytes(image_source[:4])
+    return header in (b"II*\x00", b"MM\x00*")
+
+def _is_encoded(image_source) -> bool:
+    """True for sources load_image can decode again (at another reduction), not decoded arrays."""
+    return isinstance(image_source, (str, bytes, bytearray, memoryview, TiffFrame))
+
+def _open_pil(image_source):
+    return Image.open(image_source if isinstance(image_source, str) else io.BytesIO(image_source))
+
+def _decode_tiff_frame(frame: TiffFrame):
+    with _open_pil(frame.source) as tiff:
+        tiff.seek(frame.index)
+        return cv2.cvtColor(np.array(tiff.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+def expand_pages(image_source):
+    """
+    Splits a multi-page TIFF (path or bytes) into one lazy TiffFrame per page.
+    Any other image is returned as a single page.
+    """
+    if isinstance(image_source, (str, bytes, bytearray, memoryview)) and _is_tiff(image_source):
+        with _open_pil(image_source) as tiff:
+            frame_count = getattr(tiff, "n_frames", 1)
+        if frame_count > 1:
+            return [TiffFrame(image_source, index) for index in range(frame_count)]
+    return [image_source]
+
+def load_image(image_source, metadata=None, reduction=None):
     """
-    if isinstance(image_path_or_array, str):
-        img = cv2.imread(image_path_or_array)
+    Returns a BGR numpy array for a file path, raw encoded bytes, a TiffFrame or an already decoded array.
+    Large JPEGs are decoded at a reduced size (chosen automatically unless `reduction` is given);
+    the resulting scale is recorded in `metadata["decode_scale"]`.
+    """
+    decode_scale = 1.0
+    if isinstance(image_source, TiffFrame):
+        img = _decode_tiff_frame(image_source)
+    elif isinstance(image_source, str):
+        reduction = _decode_reduction(image_source) if reduction is None else reduction
+        img = cv2.imread(image_source, _REDUCED_DECODE_FLAGS.get(reduction, cv2.IMREAD_COLOR))
         if img is None:
-            raise ValueError(f"Image not found or could not be read: {image_path_or_array}")
-    else: # Assume it's a numpy array (e.g., from BytesIO)
-        img = image_path_or_array
-
-    # Convert to grayscale
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
-    # Deskew (tilt correction) - Basic implementation
-    # This is a simplified deskew. More advanced methods exist for complex documents.
-    coords = np.column_stack(np.where(gray > 0))
-    if coords.shape[0] > 0: # Ensure there are points to calculate angle
-        angle = cv2.minAreaRect(coords)[-1]
-        if angle < -45:
-            angle = -(90 + angle)
-        else:
-            angle = -angle
-        (h, w) = img.shape[:2]
-        center = (w // 2, h // 2)
-        M = cv2.getRotationMatrix2D(center, angle, 1.0)
-        rotated = cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+            raise ValueError(f"Image not found or could not be read: {image_source}")
+        decode_scale = 1.0 / reduction
+    elif isinstance(image_source, (bytes, bytearray, memoryview)):
+        reduction = _decode_reduction(image_source) if reduction is None else reduction
+        img = decode_image_bytes(image_source, _REDUCED_DECODE_FLAGS.get(reduction, cv2.IMREAD_COLOR))
+        decode_scale = 1.0 / reduction
     else:
-        rotated = img # No text found, no rotation needed
+        # Assume it's a numpy array that has already been decoded
+        img = image_source
+    if metadata is not None:
+        metadata["decode_scale"] = decode_scale
+    return img
+
+def estimate_text_height(gray):
+    """
+    Estimates the median character height in pixels from connected components of the
+    binarised page. Returns None when there are too few character-like blobs to judge.
+    """
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:count, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:count, cv2.CC_STAT_WIDTH]
+    # Keep blobs shaped like glyphs: not specks, not rules or images, not absurdly wide
+    glyphs = (heights >= 4) & (heights <= gray.shape[0] // 10) & (widths <= heights * 5)
+    if np.count_nonzero(glyphs) < 20:
+        return None
+    return float(np.median(heights[glyphs]))
+
+def normalize_resolution(gray, metadata=None, text_height=None):
+    """
+    Rescales a grayscale page so its text is about OCR_TARGET_TEXT_HEIGHT pixels tall.
+    The scale applied (including any decode-time reduction) is recorded in `metadata`.
+    """
+    scale = 1.0
+    if text_height is None and OCR_NORMALIZE_RESOLUTION:
+        text_height = estimate_text_height(gray)
+    if text_height:
+        scale = min(MAX_NORMALIZE_SCALE, max(MIN_NORMALIZE_SCALE, OCR_TARGET_TEXT_HEIGHT / text_height))
+        # Small corrections are not worth a resample
+        if abs(scale - 1.0) < 0.15:
+            scale = 1.0
+    if scale != 1.0:
+        (h, w) = gray.shape[:2]
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+        gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=interpolation)
+    if metadata is not None:
+        metadata["text_height_px"] = text_height
+        metadata["scale_factor"] = round(metadata.get("decode_scale", 1.0) * scale, 4)
+    return gray
+
+def estimate_skew_angle(gray, max_side=None, max_angle=None):
+    """
+    Estimates page tilt in degrees with a projection profile on a small binarised copy.
+    Text lines give the sharpest row-sum profile when they are horizontal, so the rotation
+    that maximises the profile's row-to-row variation is the one that straightens the page.
+    The returned angle can be passed straight to cv2.getRotationMatrix2D.
+    """
+    max_side = max_side or DESKEW_MAX_SIDE
+    max_angle = DESKEW_MAX_ANGLE if max_angle is None else max_angle
+
+    (h, w) = gray.shape[:2]
+    scale = min(1.0, max_side / max(h, w))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
 
+    # Otsu, inverted so ink is 1 and paper is 0
+    _, binary = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    (sh, sw) = binary.shape
+    center = (sw / 2, sh / 2)
+
+    def profile_score(angle):
+        M = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(binary, M, (sw, sh), flags=cv2.INTER_NEAREST, borderValue=0)
+        rows = cv2.reduce(rotated, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel().astype(np.int64)
+        return int(np.sum(np.diff(rows) ** 2))
+
+    # Coarse search in 1 degree steps, then refine to 0.1 degree around the best
+    coarse = np.arange(-max_angle, max_angle + 0.5, 1.0)
+    best = max(coarse, key=profile_score)
+    fine = np.arange(best - 1.0, best + 1.05, 0.1)
+    return float(round(max(fine, key=profile_score), 2)) + 0.0
+
+# --- Preprocessing Pipeline ---
+# Each stage takes the current image and a context {"source", "metadata"} and returns
+# the next image. Profiles are ordered lists of stage names, so throughput can be traded
+# against accuracy per document source without code changes.
+
+def _stage_grayscale(img, context):
+    # Convert to grayscale once; every later step works on the single channel
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+def _stage_normalize_resolution(gray, context):
+    metadata = context["metadata"]
+    text_height = estimate_text_height(gray) if OCR_NORMALIZE_RESOLUTION else None
+    reduction = round(1 / metadata.get("decode_scale", 1.0))
+    if (text_height and reduction > 1 and OCR_TARGET_TEXT_HEIGHT / text_height >= 1.15
+            and _is_encoded(context["source"])):
+        # The decoder dropped detail this page's small text needs: decode again less reduced
+        wanted = reduction * text_height / OCR_TARGET_TEXT_HEIGHT
+        smaller = max(factor for factor in (1, 2, 4, 8) if factor <= max(wanted, 1))
+        gray = _stage_grayscale(load_image(context["source"], metadata, reduction=smaller), context)
+        text_height = text_height * reduction / smaller
+
+    # Bring text to the size Tesseract reads best before the full-resolution steps
+    return normalize_resolution(gray, metadata, text_height)
+
+def _stage_deskew(gray, context):
+    # Deskew (tilt correction), estimated on a downscaled copy and applied to the grayscale page
+    angle = estimate_skew_angle(gray)
+    context["metadata"]["deskew_angle"] = angle
+    if abs(angle) < 0.1:
+        return gray
+    (h, w) = gray.shape[:2]
+    center = (w // 2, h // 2)
+    M = cv2.getRotationMatrix2D(center, angle, 1.0)
+    return cv2.warpAffine(gray, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+def _stage_adaptive_threshold(gray, context):
     # Binarization (adaptive thresholding) - good for varying lighting
-    processed = cv2.adaptiveThreshold(
-        cv2.cvtColor(rotated, cv2.COLOR_BGR2GRAY),
+    return cv2.adaptiveThreshold(
+        gray,
         255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
         cv2.THRESH_BINARY, 11, 2 # Block size 11, C value 2
     )
 
-    # Optional: Noise reduction (e.g., median blur) - uncomment if needed
-    # processed = cv2.medianBlur(processed, 3)
+def _stage_otsu_threshold(gray, context):
+    # Single global threshold: much cheaper, fine for evenly lit scans
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+def _stage_denoise(img, context):
+    # Noise reduction: removes salt-and-pepper specks left by binarization
+    return cv2.medianBlur(img, 3)
+
+PREPROCESSING_STAGES = {
+    "grayscale": _stage_grayscale,
+    "normalize_resolution": _stage_normalize_resolution,
+    "deskew": _stage_deskew,
+    "adaptive_threshold": _stage_adaptive_threshold,
+    "otsu_threshold": _stage_otsu_threshold,
+    "denoise": _stage_denoise,
+}
+
+PREPROCESSING_PROFILES = {
+    "fast": ["grayscale", "normalize_resolution", "otsu_threshold"],
+    "balanced": ["grayscale", "normalize_resolution", "deskew", "adaptive_threshold"],
+    "max_quality": ["grayscale", "normalize_resolution", "deskew", "adaptive_threshold", "denoise"],
+}
+# Extra or overridden profiles, e.g. OCR_PROFILES='{"receipts": ["grayscale", "otsu_threshold"]}'
+PREPROCESSING_PROFILES.update(json.loads(os.getenv('OCR_PROFILES', '{}')))
+for _profile_name, _stages in PREPROCESSING_PROFILES.items():
+    _unknown = [stage for stage in _stages if stage not in PREPROCESSING_STAGES]
+    if _unknown or not _stages or _stages[0] != "grayscale":
+        raise ValueError(f"Invalid OCR profile '{_profile_name}': must start with 'grayscale' and use only {sorted(PREPROCESSING_STAGES)}")
+
+DEFAULT_OCR_PROFILE = os.getenv('OCR_PROFILE', 'balanced')
 
-    return processed
+def resolve_profile(profile=None):
+    """Returns the profile name to use, raising ValueError for unknown names."""
+    profile = profile or DEFAULT_OCR_PROFILE
+    if profile not in PREPROCESSING_PROFILES:
+        raise ValueError(f"Unknown OCR profile '{profile}'. Available: {', '.join(PREPROCESSING_PROFILES)}")
+    return profile
 
-def extract_text_from_image(image_path):
+def preprocess_image(image_path_or_array, metadata=None, decoded=None, profile=None):
     """
-    Extracts text from an image file using Tesseract OCR after pre-processing.
+    Applies image pre-processing techniques to enhance OCR accuracy.
+    Handles file paths, encoded bytes (from in-memory uploads) and numpy arrays.
+    Runs the stages of `profile` (default: OCR_PROFILE, 'balanced') and records each
+    stage's wall time in `metadata["stage_timings_ms"]`, alongside the chosen scale
+    factor and deskew angle. Pass `decoded` if load_image already ran on the source
+    with that same metadata dict.
+    """
+    metadata = {} if metadata is None else metadata
+    timings = metadata.setdefault("stage_timings_ms", {})
+    profile = resolve_profile(profile)
+    metadata["profile"] = profile
+
+    if decoded is None:
+        start = time.perf_counter()
+        decoded = load_image(image_path_or_array, metadata)
+        timings["decode"] = round((time.perf_counter() - start) * 1000, 2)
+
+    context = {"source": image_path_or_array, "metadata": metadata}
+    img = decoded
+    for stage in PREPROCESSING_PROFILES[profile]:
+        start = time.perf_counter()
+        img = PREPROCESSING_STAGES[stage](img, context)
+        timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+    return img
+
+def _ocr_settings(layout, profile, adaptive=False):
+    """Everything besides the image that changes the OCR output, used in the cache key."""
+    settings = {
+        "lang": os.getenv('OCR_LANG', 'eng'),
+        "layout": layout,
+        "stages": PREPROCESSING_PROFILES[profile],
+        "normalize_resolution": OCR_NORMALIZE_RESOLUTION,
+        "target_text_height": OCR_TARGET_TEXT_HEIGHT,
+        "decode_min_side": OCR_DECODE_MIN_SIDE
+    }
+    if adaptive:
+        settings["adaptive"] = {"fast_pass_max_side": OCR_FAST_PASS_MAX_SIDE,
+                                "confidence_threshold": OCR_CONFIDENCE_THRESHOLD}
+    return settings
+
+def recognize_text(processed_image, timeout=None, psm=None):
+    """
+    Runs Tesseract on an already pre-processed image.
+    Uses the warm worker pool when enabled, otherwise forks tesseract via pytesseract.
+    `psm` overrides Tesseract's page segmentation mode (e.g. 6 for a single text block).
     """
-    processed_image = preprocess_image(image_path)
+    if OCR_POOL_ENABLED:
+        return get_ocr_pool(pytesseract.pytesseract.tesseract_cmd).image_to_string(processed_image, psm=psm, timeout=timeout)
+    config = f"--psm {psm}" if psm is not None else ""
     # Use PIL Image to pass to pytesseract
-    text = pytesseract.image_to_string(Image.fromarray(processed_image), lang='eng') # 'eng' for English
+    return pytesseract.image_to_string(Image.fromarray(processed_image), lang='eng', config=config, timeout=timeout or 0) # 'eng' for English
+
+def recognize_words(image, timeout=None, psm=None):
+    """
+    Runs Tesseract and returns per-word results as a dict of parallel lists
+    ("text", "conf", "left", "top", "width", "height", "block_num", "par_num", "line_num").
+    """
+    if OCR_POOL_ENABLED:
+        return get_ocr_pool(pytesseract.pytesseract.tesseract_cmd).image_to_data(image, psm=psm, timeout=timeout)
+    config = f"--psm {psm}" if psm is not None else ""
+    raw = pytesseract.image_to_data(Image.fromarray(image), lang='eng', config=config,
+                                    timeout=timeout or 0, output_type=pytesseract.Output.DICT)
+    return pytesseract_words(raw)
+
+def _group_lines(words):
+    """Groups recognize_words output into text lines, in Tesseract's reading order."""
+    lines = {}
+    for index, text in enumerate(words["text"]):
+        key = (words["block_num"][index], words["par_num"][index], words["line_num"][index])
+        line = lines.setdefault(key, {"key": key, "words": [], "confs": [], "box": None})
+        (x, y) = (words["left"][index], words["top"][index])
+        (x2, y2) = (x + words["width"][index], y + words["height"][index])
+        line["words"].append(text.strip())
+        if words["conf"][index] >= 0:
+            line["confs"].append(words["conf"][index])
+        box = line["box"]
+        line["box"] = [x, y, x2, y2] if box is None else [min(box[0], x), min(box[1], y), max(box[2], x2), max(box[3], y2)]
+    return list(lines.values())
+
+def _join_lines(lines):
+    """Lines of a paragraph joined by newlines, paragraphs by a blank line."""
+    text = ""
+    previous = None
+    for line in lines:
+        if previous is not None:
+            text += "\n" if line["key"][:2] == previous else "\n\n"
+        text += line["text"]
+        previous = line["key"][:2]
     return text
 
-# For multi-column texts, you'd typically use pytesseract.image_to_data()
-# to get bounding box information and then sort/group text by columns.
-# This is more advanced and beyond a basic starter.
\ No newline at end of file
+def recognize_adaptive(img, metadata, timeout=None, profile=None, image_source=None):
+    """
+    Two-tier OCR. A fast pass reads a downscaled grayscale copy with no other preprocessing.
+    If its mean word confidence reaches OCR_CONFIDENCE_THRESHOLD that text is returned as is;
+    otherwise each paragraph containing low-confidence lines is cropped from the full-resolution
+    page, run through the preprocessing profile and re-read, and replaces those lines.
+    `img` is the page as decoded by load_image into `metadata`; pass the `image_source` it was
+    decoded from so a reduced JPEG decode can be decoded again at full size where needed.
+    Records "ocr_tier" ("fast", "selective" or "full"), "fast_pass_confidence" and
+    "regions_reprocessed" in `metadata`.
+    """
+    timings = metadata.setdefault("stage_timings_ms", {})
+    start = time.perf_counter()
+    gray = _stage_grayscale(img, None)
+    (h, w) = gray.shape[:2]
+    scale = min(1.0, OCR_FAST_PASS_MAX_SIDE / max(h, w))
+    small = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    lines = _group_lines(recognize_words(small, timeout=timeout))
+    timings["fast_pass"] = round((time.perf_counter() - start) * 1000, 2)
+
+    confidences = [conf for line in lines for conf in line["confs"]]
+    mean_confidence = float(np.mean(confidences)) if confidences else 0.0
+    metadata["fast_pass_confidence"] = round(mean_confidence, 2)
+    for line in lines:
+        line["text"] = " ".join(line["words"])
+        line["low"] = not line["confs"] or float(np.mean(line["confs"])) < OCR_CONFIDENCE_THRESHOLD
+
+    if lines and mean_confidence >= OCR_CONFIDENCE_THRESHOLD:
+        metadata["ocr_tier"] = "fast"
+        metadata["regions_reprocessed"] = 0
+        return _join_lines(lines)
+
+    if not lines:
+        # Nothing legible at low resolution: run the full pipeline over the whole page
+        metadata["ocr_tier"] = "full"
+        metadata["regions_reprocessed"] = 1
+        processed = preprocess_image(img if image_source is None else image_source, metadata,
+                                     decoded=img, profile=profile)
+        start = time.perf_counter()
+        text = recognize_text(processed, timeout=timeout)
+        timings["recognize_full"] = round((time.perf_counter() - start) * 1000, 2)
+        return text
+
+    # Merge the low-confidence lines of each paragraph into one region of the full-resolution page
+    regions = {}
+    for line in lines:
+        if line["low"]:
+            box = regions.get(line["key"][:2])
+            regions[line["key"][:2]] = line["box"] if box is None else [
+                min(box[0], line["box"][0]), min(box[1], line["box"][1]),
+                max(box[2], line["box"][2]), max(box[3], line["box"][3])]
+
+    # Regions are cropped from the page at full size, decoded again if the JPEG decode was reduced
+    page, to_page = img, 1.0 / scale
+    reduction = round(1 / metadata.get("decode_scale", 1.0))
+    if reduction > 1 and image_source is not None and _is_encoded(image_source):
+        page = load_image(image_source, reduction=1)
+        to_page *= reduction
+    (full_h, full_w) = page.shape[:2]
+    def reread_region(box):
+        pad = LAYOUT_REGION_PADDING * to_page
+        (x1, y1) = (max(0, int(box[0] * to_page - pad)), max(0, int(box[1] * to_page - pad)))
+        (x2, y2) = (min(full_w, int(np.ceil(box[2] * to_page + pad))), min(full_h, int(np.ceil(box[3] * to_page + pad))))
+        processed = preprocess_image(page[y1:y2, x1:x2], {}, profile=profile)
+        return recognize_text(processed, timeout=timeout, psm=LAYOUT_REGION_PSM).strip()
+
+    start = time.perf_counter()
+    workers = min(OCR_PAGE_CONCURRENCY, len(regions))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        reread = dict(zip(regions, executor.map(reread_region, regions.values())))
+    timings["selective_pass"] = round((time.perf_counter() - start) * 1000, 2)
+    metadata["ocr_tier"] = "selective"
+    metadata["regions_reprocessed"] = len(regions)
+
+    # Each re-read region takes the place of the first low-confidence line of its paragraph
+    merged = []
+    for line in lines:
+        paragraph = line["key"][:2]
+        if not line["low"]:
+            merged.append(line)
+        elif paragraph in reread:
+            merged.append({**line, "text": reread.pop(paragraph)})
+    return _join_lines(line for line in merged if line["text"])
+
+def recognize_layout(processed_image, metadata, timeout=None):
+    """
+    Detects text blocks and columns, OCRs each region concurrently and joins them in reading order.
+
+    Returns:
+        tuple: (text, list of {"bbox": [x, y, w, h], "text": str} regions in reading order,
+                with boxes in the coordinates of the original upload)
+    """
+    regions = find_text_regions(processed_image, estimate_text_height(processed_image))
+    if not regions:
+        return recognize_text(processed_image, timeout=timeout), []
+
+    (h, w) = processed_image.shape[:2]
+    def recognize_region(box):
+        (x, y, bw, bh) = box
+        # A little white margin helps Tesseract with glyphs touching the crop edge
+        crop = processed_image[max(0, y - LAYOUT_REGION_PADDING):min(h, y + bh + LAYOUT_REGION_PADDING),
+                               max(0, x - LAYOUT_REGION_PADDING):min(w, x + bw + LAYOUT_REGION_PADDING)]
+        return recognize_text(crop, timeout=timeout, psm=LAYOUT_REGION_PSM).strip()
+
+    workers = min(OCR_PAGE_CONCURRENCY, len(regions))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        region_texts = list(executor.map(recognize_region, regions))
+
+    to_original = 1.0 / metadata.get("scale_factor", 1.0)
+    region_results = [
+        {"bbox": [int(round(value * to_original)) for value in box], "text": text}
+        for box, text in zip(regions, region_texts) if text
+    ]
+    return "\n\n".join(region["text"] for region in region_results), region_results
+
+def ocr_document(image_source, timeout=None, layout=False, profile=None, adaptive=None):
+    """
+    OCRs one page and reports how it was processed.
+    With `layout=True` the page is split into text regions (columns, blocks) that are
+    recognised concurrently and returned alongside the text. `profile` names the
+    preprocessing profile (see PREPROCESSING_PROFILES). With `adaptive=True` (default:
+    OCR_ADAPTIVE) the page is read by recognize_adaptive, and the profile only runs on the
+    regions the fast pass could not read confidently; layout mode ignores it.
+
+    Returns:
+        dict: {"text": str, "metadata": {"profile", "stage_timings_ms", "decode_scale", "scale_factor",
+               "text_height_px", "deskew_angle", "cache_hit", plus "ocr_tier", "fast_pass_confidence"
+               and "regions_reprocessed" in adaptive mode}, "regions": [...] (layout mode only)}
+    """
+    profile = resolve_profile(profile)
+    adaptive = (OCR_ADAPTIVE if adaptive is None else adaptive) and not layout
+    metadata = {"profile": profile}
+    timings = metadata["stage_timings_ms"] = {}
+
+    start = time.perf_counter()
+    img = load_image(image_source, metadata)
+    timings["decode"] = round((time.perf_counter() - start) * 1000, 2)
+
+    # Re-uploads of the same page are answered from the cache without any OCR work
+    if OCR_CACHE_ENABLED:
+        start = time.perf_counter()
+        cache = get_ocr_cache()
+        image_hash = content_hash(img)
+        settings = settings_key(_ocr_settings(layout, profile, adaptive))
+        cached = cache.get(image_hash, settings)
+        timings["cache_lookup"] = round((time.perf_counter() - start) * 1000, 2)
+        if cached is not None:
+            return {**cached, "metadata": {**cached["metadata"], "cache_hit": True,
+                                           "stage_timings_ms": dict(timings)}}
+
+    if adaptive:
+        # Timings for the fast and selective passes are recorded by recognize_adaptive
+        result = {"text": recognize_adaptive(img, metadata, timeout=timeout, profile=profile,
+                                             image_source=image_source), "metadata": metadata}
+    else:
+        processed_image = preprocess_image(image_source, metadata, decoded=img, profile=profile)
+
+        start = time.perf_counter()
+        if layout:
+            text, regions = recognize_layout(processed_image, metadata, timeout=timeout)
+            result = {"text": text, "metadata": metadata, "regions": regions}
+        else:
+            result = {"text": recognize_text(processed_image, timeout=timeout), "metadata": metadata}
+        timings["recognize"] = round((time.perf_counter() - start) * 1000, 2)
+
+    if OCR_CACHE_ENABLED:
+        cache.put(image_hash, settings, result)
+        result = {**result, "metadata": {**metadata, "cache_hit": False}}
+    return result
+
+def extract_text_from_image(image_path, timeout=None):
+    """
+    Extracts text from an image using Tesseract OCR after pre-processing.
+    Accepts a file path, the raw bytes of an uploaded image, or a decoded numpy array.
+    """
+    return ocr_document(image_path, timeout=timeout)["text"]
+
+def extract_text_from_pages(page_sources, timeout=None, layout=False, profile=None, adaptive=None):
+    """
+    OCRs the pages of one document concurrently and joins the text in page order.
+    `page_sources` may be a lazy iterable (e.g. PDF pages rendered one at a time); at most
+    twice OCR_PAGE_CONCURRENCY pages are held in memory waiting for OCR. TextLayerPage
+    entries already carry their text and are not OCR'd.
+
+    Args:
+        page_sources (iterable): Pages, in order (paths, bytes, TiffFrames, arrays or TextLayerPages)
+        timeout (float): Per-page OCR timeout in seconds
+        layout (bool): Recognise each page region by region (see recognize_layout)
+        profile (str): Preprocessing profile applied to every page
+        adaptive (bool): Read pages with the two-tier confidence-driven mode (see recognize_adaptive)
+
+    Returns:
+        tuple: (combined text, list of {"page", "start", "end", "source", "ocr"} entries, with
+                character spans into the combined text, whether the text came from a
+                "text_layer" or "ocr", and each OCR'd page's metadata; in layout mode each
+                entry also carries the page's "regions")
+    """
+    in_flight = threading.BoundedSemaphore(OCR_PAGE_CONCURRENCY * 2)
+
+    def run_page(page):
+        try:
+            return ocr_document(page, timeout=timeout, layout=layout, profile=profile, adaptive=adaptive)
+        finally:
+            in_flight.release()
+
+    pending = []
+    with ThreadPoolExecutor(max_workers=OCR_PAGE_CONCURRENCY) as executor:
+        for page in page_sources:
+            if isinstance(page, TextLayerPage):
+                pending.append(page)
+                continue
+            in_flight.acquire()
+            pending.append(executor.submit(run_page, page))
+        page_results = [
+            {"text": item.text, "metadata": None, "regions": []} if isinstance(item, TextLayerPage) else item.result()
+            for item in pending
+        ]
+
+    page_texts = []
+    page_spans = []
+    offset = 0
+    for number, result in enumerate(page_results, start=1):
+        page_text = result["text"].strip()
+        if number > 1:
+            offset += len(PAGE_SEPARATOR)
+        page_span = {
+            "page": number,
+            "start": offset,
+            "end": offset + len(page_text),
+            "source": "ocr" if result["metadata"] is not None else "text_layer",
+            "ocr": result["metadata"]
+        }
+        if layout:
+            page_span["regions"] = result["regions"]
+        page_spans.append(page_span)
+        page_texts.append(page_text)
+        offset += len(page_text)
+    return PAGE_SEPARATOR.join(page_texts), page_spans
+
+def page_for_offset(page_spans, offset):
+    """Returns the page number containing a character offset of the combined text, or None."""
+    starts = [span["start"] for span in page_spans]
+    index = bisect.bisect_right(starts, offset) - 1
+    if index >= 0 and offset <= page_spans[index]["end"]:
+        return page_spans[index]["page"]
+    return None
@@ -0,0 +1,107 @@
+"""
+Content-Hash OCR Result Cache
+Re-uploads of the same page (retries, the same scan sent twice) are matched by a SHA-256
+of the decoded pixels, so they skip preprocessing and Tesseract. Only exact matches are
+reused: pages rendered from one template differ in a few glyphs (a name, an amount), which
+no perceptual hash or downscaled comparison separates reliably from recompression noise,
+and serving one tenant's text for another's page is not an acceptable miss.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def content_hash(img: np.ndarray) -> str:
+    """SHA-256 of a decoded page: its shape, dtype and pixels, so the same image in another container still matches."""
+    digest = hashlib.sha256(f"{img.shape}|{img.dtype}|".encode("utf-8"))
+    digest.update(np.ascontiguousarray(img).data)
+    return digest.hexdigest()
+
+def settings_key(settings: Dict) -> str:
+    """Stable key for the OCR settings a result depends on."""
+    return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class OCRResultCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_bytes (int): Total size of cached results before least recently used ones are evicted
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (settings key, content hash) -> (result, size in bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_size(result: Dict) -> int:
+        # Approximate footprint: the serialised result plus a fixed per-entry overhead
+        return len(json.dumps(result, default=str).encode("utf-8")) + 200
+
+    def get(self, image_hash: str, settings: str) -> Optional[Dict]:
+        """Return the cached result for this exact page (content_hash) and settings, or None."""
+        with self._lock:
+            key = (settings, image_hash)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, image_hash: str, settings: str, result: Dict):
+        size = self._entry_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            key = (settings, image_hash)
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+# Global instance
+ocr_cache = None
+
+def get_ocr_cache() -> OCRResultCache:
+    """Get or create the global OCR result cache, sized from OCR_CACHE_MAX_MB."""
+    global ocr_cache
+    if ocr_cache is None:
+        ocr_cache = OCRResultCache(
+            max_bytes=int(float(os.getenv('OCR_CACHE_MAX_MB', '64')) * 1024 * 1024)
+        )
+        logger.info(f"OCR result cache enabled ({ocr_cache.max_bytes // (1024 * 1024)}MB)")
+    return ocr_cache
@@ -0,0 +1,116 @@
+"""
+Page Layout Analysis for OCR
+Finds text blocks and columns on a binarised page with a recursive XY-cut and
+returns them in reading order: columns left to right, blocks top to bottom.
+Multi-column statutes and forms can then be recognised region by region.
+"""
+
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+Box = Tuple[int, int, int, int]  # x, y, width, height
+
+# Layout is analysed on a copy no larger than this on its long side
+LAYOUT_MAX_SIDE = 1200
+# Recursion guard for pathological pages
+MAX_CUT_DEPTH = 12
+
+def _internal_gaps(occupied: np.ndarray, min_gap: int) -> List[Tuple[int, int]]:
+    """Runs of empty positions at least `min_gap` long, ignoring leading and trailing margins."""
+    filled = np.flatnonzero(occupied)
+    if filled.size == 0:
+        return []
+    steps = np.diff(filled)
+    gaps = []
+    for index in np.flatnonzero(steps > min_gap):
+        gaps.append((int(filled[index]) + 1, int(filled[index + 1])))
+    return gaps
+
+def _column_gaps(ink: np.ndarray, min_col_gap: int) -> List[Tuple[int, int]]:
+    return _internal_gaps(ink.any(axis=0), min_col_gap)
+
+def _shares_gutter(upper: np.ndarray, lower: np.ndarray, min_col_gap: int) -> bool:
+    """True when two horizontal bands have a column gutter at overlapping x positions."""
+    for start_a, end_a in _column_gaps(upper, min_col_gap):
+        for start_b, end_b in _column_gaps(lower, min_col_gap):
+            if min(end_a, end_b) - max(start_a, start_b) >= min_col_gap:
+                return True
+    return False
+
+def _xy_cut(ink: np.ndarray, x: int, y: int, min_col_gap: int, min_row_gap: int,
+            regions: List[Box], depth: int = 0):
+    # Trim the region to its ink bounding box
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0:
+        return
+    top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    ink = ink[top:bottom, left:right]
+    x, y = x + int(left), y + int(top)
+
+    if depth < MAX_CUT_DEPTH:
+        # Columns first: a gutter running the full height of the region splits it left to right
+        column_gaps = _column_gaps(ink, min_col_gap)
+        if column_gaps:
+            edges = [0] + [edge for gap in column_gaps for edge in gap] + [ink.shape[1]]
+            for start, end in zip(edges[0::2], edges[1::2]):
+                _xy_cut(ink[:, start:end], x + start, y, min_col_gap, min_row_gap, regions, depth + 1)
+            return
+
+        # Otherwise split into blocks top to bottom, re-joining consecutive bands that share
+        # a gutter so aligned paragraph breaks in two columns don't interleave the columns
+        row_gaps = _internal_gaps(ink.any(axis=1), min_row_gap)
+        if row_gaps:
+            edges = [0] + [edge for gap in row_gaps for edge in gap] + [ink.shape[0]]
+            bands = [[start, end] for start, end in zip(edges[0::2], edges[1::2])]
+            merged = [bands[0]]
+            for band in bands[1:]:
+                previous = merged[-1]
+                if _shares_gutter(ink[previous[0]:previous[1]], ink[band[0]:band[1]], min_col_gap):
+                    previous[1] = band[1]
+                else:
+                    merged.append(band)
+            if len(merged) > 1:
+                for start, end in merged:
+                    _xy_cut(ink[start:end], x, y + start, min_col_gap, min_row_gap, regions, depth + 1)
+                return
+
+    regions.append((x, y, int(ink.shape[1]), int(ink.shape[0])))
+
+def find_text_regions(binary: np.ndarray, text_height: Optional[float] = None) -> List[Box]:
+    """
+    Splits a binarised page (dark text on white) into text regions in reading order.
+
+    Args:
+        binary (np.ndarray): Preprocessed single-channel page
+        text_height (float): Median character height in pixels, if already known
+
+    Returns:
+        List[Box]: (x, y, width, height) boxes in `binary` coordinates, in reading order
+    """
+    (h, w) = binary.shape[:2]
+    scale = min(1.0, LAYOUT_MAX_SIDE / max(h, w))
+    small = cv2.resize(binary, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA) if scale < 1.0 else binary
+    ink = small < 128
+
+    glyph_height = (text_height or 20.0) * scale
+    # Smear characters into words and lines so letter and word spacing never looks like a gutter
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(1, int(glyph_height * 0.6)), max(1, int(glyph_height * 0.3))))
+    ink = cv2.dilate(ink.astype(np.uint8), kernel) > 0
+    # Remove specks smaller than a fraction of a character
+    ink = cv2.morphologyEx(ink.astype(np.uint8), cv2.MORPH_OPEN, np.ones((2, 2), np.uint8)) > 0
+
+    min_col_gap = max(2, int(glyph_height * 1.2))
+    min_row_gap = max(2, int(glyph_height * 1.5))
+    regions: List[Box] = []
+    _xy_cut(ink, 0, 0, min_col_gap, min_row_gap, regions)
+
+    # Back to full-resolution coordinates, dropping fragments smaller than one character
+    boxes = []
+    min_side = glyph_height * 0.5
+    for (rx, ry, rw, rh) in regions:
+        if rw < min_side or rh < min_side:
+            continue
+        boxes.append((int(rx / scale), int(ry / scale), int(np.ceil(rw / scale)), int(np.ceil(rh / scale))))
+    return boxes
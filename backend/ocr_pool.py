@@ -0,0 +1,292 @@
+"""
+Persistent OCR Worker Pool
+Keeps one warm Tesseract engine per CPU core so each page skips process startup
+and traineddata loading. Jobs that hang are killed and their worker is replaced.
+"""
+
+import os
+import queue
+import threading
+import atexit
+import logging
+import multiprocessing as mp
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class OCRTimeoutError(TimeoutError):
+    """Raised when a worker does not finish a page within the job timeout."""
+
+class OCRWorkerError(RuntimeError):
+    """Raised when a worker fails a job or dies while processing it."""
+
+# Word-level results share pytesseract's image_to_data layout, limited to these keys
+WORD_DATA_KEYS = ("text", "conf", "left", "top", "width", "height", "block_num", "par_num", "line_num")
+
+def pytesseract_words(raw: dict) -> dict:
+    """Keeps only the recognised words from a pytesseract image_to_data DICT result."""
+    words = {key: [] for key in WORD_DATA_KEYS}
+    for index, level in enumerate(raw["level"]):
+        if level != 5 or not str(raw["text"][index]).strip():
+            continue
+        for key in WORD_DATA_KEYS:
+            words[key].append(raw[key][index])
+    words["conf"] = [float(conf) for conf in words["conf"]]
+    return words
+
+# --- Engines (run inside the worker processes) ---
+
+class _TesserocrEngine:
+    """Holds a single initialised Tesseract API for the lifetime of the worker."""
+    name = "tesserocr"
+
+    def __init__(self, lang: str):
+        import tesserocr
+        self._api = tesserocr.PyTessBaseAPI(lang=lang)
+
+    def _set_page_seg_mode(self, psm: Optional[int]):
+        # The API keeps its mode between jobs, so every job sets one: a region job's
+        # single-block mode must not carry over to the next whole page
+        from tesserocr import PSM
+        self._api.SetPageSegMode(PSM.AUTO if psm is None else psm)
+
+    def image_to_string(self, image, psm: Optional[int] = None) -> str:
+        from PIL import Image
+        self._set_page_seg_mode(psm)
+        self._api.SetImage(Image.fromarray(image))
+        return self._api.GetUTF8Text()
+
+    def image_to_data(self, image, psm: Optional[int] = None) -> dict:
+        from PIL import Image
+        from tesserocr import RIL, iterate_level
+        self._set_page_seg_mode(psm)
+        self._api.SetImage(Image.fromarray(image))
+        self._api.Recognize()
+        words = {key: [] for key in WORD_DATA_KEYS}
+        block = paragraph = line = 0
+        for word in iterate_level(self._api.GetIterator(), RIL.WORD):
+            # Number blocks, paragraphs and lines the way Tesseract's TSV output does
+            if word.IsAtBeginningOf(RIL.BLOCK):
+                block, paragraph, line = block + 1, 0, 0
+            if word.IsAtBeginningOf(RIL.PARA):
+                paragraph, line = paragraph + 1, 0
+            if word.IsAtBeginningOf(RIL.TEXTLINE):
+                line += 1
+            text = word.GetUTF8Text(RIL.WORD)
+            box = word.BoundingBox(RIL.WORD)
+            if not text or not text.strip() or box is None:
+                continue
+            (x1, y1, x2, y2) = box
+            for key, value in zip(WORD_DATA_KEYS, (text, float(word.Confidence(RIL.WORD)), x1, y1,
+                                                   x2 - x1, y2 - y1, block, paragraph, line)):
+                words[key].append(value)
+        return words
+
+class _PytesseractEngine:
+    """Fallback when tesserocr is not installed: still one process per core, but forks tesseract per job."""
+    name = "pytesseract"
+
+    def __init__(self, lang: str, tesseract_cmd: Optional[str] = None):
+        import pytesseract
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        self._pytesseract = pytesseract
+        self._lang = lang
+
+    def image_to_string(self, image, psm: Optional[int] = None) -> str:
+        from PIL import Image
+        config = f"--psm {psm}" if psm is not None else ""
+        return self._pytesseract.image_to_string(Image.fromarray(image), lang=self._lang, config=config)
+
+    def image_to_data(self, image, psm: Optional[int] = None) -> dict:
+        from PIL import Image
+        config = f"--psm {psm}" if psm is not None else ""
+        raw = self._pytesseract.image_to_data(Image.fromarray(image), lang=self._lang, config=config,
+                                              output_type=self._pytesseract.Output.DICT)
+        return pytesseract_words(raw)
+
+def _create_engine(lang: str, tesseract_cmd: Optional[str]):
+    try:
+        return _TesserocrEngine(lang)
+    except (ImportError, RuntimeError):
+        # tesserocr missing, or it could not find tessdata for `lang`
+        return _PytesseractEngine(lang, tesseract_cmd)
+
+def _worker_main(conn, lang: str, tesseract_cmd: Optional[str]):
+    """Worker loop: load the engine once, then serve jobs until told to stop."""
+    # One process per core already saturates the CPU; stop Tesseract's OpenMP
+    # threads from oversubscribing it.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    engine = _create_engine(lang, tesseract_cmd)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+        kind, image, options = job
+        try:
+            handler = getattr(engine, kind)
+            conn.send(("ok", handler(image, **options)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+# --- Pool (runs in the API process) ---
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+class OCRWorkerPool:
+    def __init__(self, size: Optional[int] = None, lang: str = 'eng',
+                 job_timeout: float = 60.0, tesseract_cmd: Optional[str] = None, wait_timeout: float = 120.0):
+        """
+        Start `size` worker processes (default: one per CPU core), each holding a loaded engine.
+
+        Args:
+            size (int): Number of worker processes
+            lang (str): Tesseract language every worker loads
+            job_timeout (float): Seconds a single job may run before its worker is killed
+            tesseract_cmd (str): Tesseract executable for the pytesseract fallback engine
+            wait_timeout (float): Seconds a job may wait for a free worker before it fails
+        """
+        self.size = size or os.cpu_count() or 1
+        self.lang = lang
+        self.job_timeout = job_timeout
+        self.tesseract_cmd = tesseract_cmd
+        self.wait_timeout = wait_timeout
+        # spawn keeps workers free of the parent's threads and loaded models
+        self._context = mp.get_context("spawn")
+        # Idle workers, and None for a slot whose worker could not be restarted (started on next use)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        logger.info(f"OCR worker pool started with {self.size} worker(s)")
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.lang, self.tesseract_cmd),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _discard(self, worker: _Worker):
+        with self._lock:
+            self._workers.discard(worker)
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=5)
+        worker.conn.close()
+
+    def _replace(self, worker: _Worker):
+        """Kill a hung or crashed worker and put a fresh one back in rotation."""
+        self._discard(worker)
+        if self._closed:
+            return
+        try:
+            self._idle.put(self._spawn())
+        except Exception as e:
+            # Keep the slot: the next job to take it tries to start a worker again
+            logger.error(f"Could not start a replacement OCR worker: {e}")
+            self._idle.put(None)
+
+    def _acquire(self) -> _Worker:
+        """Waits up to wait_timeout for an idle worker, starting one for a slot left empty by a failed restart."""
+        try:
+            worker = self._idle.get(timeout=self.wait_timeout)
+        except queue.Empty:
+            raise OCRTimeoutError(f"No OCR worker became free within {self.wait_timeout} seconds")
+        if worker is not None:
+            return worker
+        if self._closed:
+            self._idle.put(None)
+            raise OCRWorkerError("OCR worker pool is closed")
+        try:
+            return self._spawn()
+        except Exception as e:
+            self._idle.put(None)
+            logger.error(f"Could not start an OCR worker: {e}")
+            raise OCRWorkerError(f"Could not start an OCR worker: {e}")
+
+    def _run(self, kind: str, image, options: dict, timeout: Optional[float]):
+        if self._closed:
+            raise OCRWorkerError("OCR worker pool is closed")
+        timeout = self.job_timeout if timeout is None else timeout
+        worker = self._acquire()
+        sent = received = False
+        try:
+            try:
+                worker.conn.send((kind, image, options))
+                sent = True
+                finished = worker.conn.poll(timeout)
+                if finished:
+                    status, payload = worker.conn.recv()
+                    received = True
+            except (EOFError, OSError) as e:
+                logger.error(f"OCR worker pid={worker.process.pid} died: {e}")
+                raise OCRWorkerError(f"OCR worker died while processing the page: {e}")
+            if not finished:
+                logger.warning(f"OCR job exceeded {timeout}s, replacing worker pid={worker.process.pid}")
+                raise OCRTimeoutError(f"OCR job exceeded {timeout} seconds")
+        finally:
+            # Whatever went wrong (including errors such as an unpicklable image), the worker
+            # goes back: as is if it is alive with no unanswered job in its pipe, else replaced
+            if (received or not sent) and worker.process.is_alive():
+                self._idle.put(worker)
+            else:
+                self._replace(worker)
+        if status == "error":
+            raise OCRWorkerError(payload)
+        return payload
+
+    def image_to_string(self, image, psm: Optional[int] = None, timeout: Optional[float] = None) -> str:
+        """Recognise a preprocessed image (numpy array) on a warm worker."""
+        return self._run("image_to_string", image, {"psm": psm}, timeout)
+
+    def image_to_data(self, image, psm: Optional[int] = None, timeout: Optional[float] = None) -> dict:
+        """Recognise a preprocessed image and return per-word text, confidence and boxes."""
+        return self._run("image_to_data", image, {"psm": psm}, timeout)
+
+    def close(self):
+        """Stop all workers."""
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=2)
+            self._discard(worker)
+
+# Global instance
+ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def get_ocr_pool(tesseract_cmd: Optional[str] = None) -> OCRWorkerPool:
+    """Get or create the global OCR worker pool, sized from OCR_WORKERS (default: CPU count)."""
+    global ocr_pool
+    with _ocr_pool_lock:
+        if ocr_pool is None:
+            ocr_pool = OCRWorkerPool(
+                size=int(os.getenv('OCR_WORKERS', '0')) or None,
+                lang=os.getenv('OCR_LANG', 'eng'),
+                job_timeout=float(os.getenv('OCR_JOB_TIMEOUT_SECONDS', '60')),
+                tesseract_cmd=tesseract_cmd,
+                wait_timeout=float(os.getenv('OCR_WORKER_WAIT_SECONDS', '120'))
+            )
+            atexit.register(ocr_pool.close)
+    return ocr_pool
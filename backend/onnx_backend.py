@@ -0,0 +1,316 @@
+"""
+Selectable Inference Backend for the Local Models
+By default the local models run in eager PyTorch. With INFERENCE_BACKEND=onnx, the BART
+summarizer, the BERT NER model and Sentence-BERT are exported to ONNX once (cached under
+ONNX_MODEL_DIR), optionally int8 dynamically quantised (ONNX_QUANTIZE=true), and run
+through ONNX Runtime on CPU. The loaders return objects with the same interface as the
+PyTorch ones (transformers pipelines, a generate()-capable seq2seq model, an .encode()
+sentence encoder), so callers do not change. Check output parity with test_onnx_parity.py.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from model_registry import MODEL_DEVICE, get_model_registry
+
+logger = logging.getLogger(__name__)
+
+# optimum[onnxruntime] is optional; without it every model runs in PyTorch
+try:
+    from optimum.onnxruntime import (
+        ORTModelForSeq2SeqLM,
+        ORTModelForTokenClassification,
+        ORTModelForFeatureExtraction,
+        ORTQuantizer,
+    )
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'pytorch').lower()
+ONNX_QUANTIZE = os.getenv('ONNX_QUANTIZE', 'false').lower() == 'true'
+ONNX_MODEL_DIR = os.getenv(
+    'ONNX_MODEL_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'onnx')
+)
+
+_fallback_logged = False
+
+def use_onnx(backend: str = None) -> bool:
+    """Whether the local models should run on ONNX Runtime (falls back to PyTorch if it is not installed)."""
+    backend = (backend or INFERENCE_BACKEND).lower()
+    if backend not in ("pytorch", "onnx"):
+        raise ValueError(f"Unknown inference backend '{backend}'. Available: pytorch, onnx")
+    if backend == "onnx" and not ONNX_AVAILABLE:
+        global _fallback_logged
+        if not _fallback_logged:
+            logger.warning("INFERENCE_BACKEND=onnx but optimum[onnxruntime] is not installed; using PyTorch")
+            _fallback_logged = True
+        return False
+    return backend == "onnx"
+
+def model_variant(model_id: str, backend: str = None) -> str:
+    """
+    Identifier for cached model outputs. int8 models produce slightly different outputs,
+    so their results are cached apart from the PyTorch / fp32 ONNX ones.
+    """
+    return f"{model_id}@onnx-int8" if ONNX_QUANTIZE and use_onnx(backend) else model_id
+
+def encoder_backend(backend: str = None) -> str:
+    """Name of the backend the local models run on: 'pytorch', 'onnx' or 'onnx-int8'."""
+    if not use_onnx(backend):
+        return "pytorch"
+    return "onnx-int8" if ONNX_QUANTIZE else "onnx"
+
+_WEIGHT_SUFFIXES = (".safetensors", ".bin", ".onnx", ".pt", ".h5", ".msgpack")
+
+def model_revision(model_id: str) -> Optional[str]:
+    """
+    Identity of the weights behind `model_id`, so results derived from a model can tell when
+    new weights were published under the same name: the Hugging Face commit of the locally
+    cached snapshot, or for a local model directory a SHA-256 of its weight files.
+    None if the model is not available locally (e.g. before its first download).
+    """
+    if os.path.isdir(model_id):
+        digest = hashlib.sha256()
+        for root, _, files in sorted(os.walk(model_id)):
+            for file_name in sorted(files):
+                if file_name.endswith(_WEIGHT_SUFFIXES):
+                    digest.update(file_name.encode("utf-8"))
+                    with open(os.path.join(root, file_name), "rb") as f:
+                        for block in iter(lambda: f.read(1024 * 1024), b""):
+                            digest.update(block)
+        return f"sha256:{digest.hexdigest()}"
+    repo_id = model_id if "/" in model_id else f"sentence-transformers/{model_id}"
+    try:
+        from huggingface_hub import snapshot_download
+        # Snapshot folders are named after the commit they hold
+        return os.path.basename(snapshot_download(repo_id, local_files_only=True))
+    except Exception:
+        return None
+
+def export_dir(model_id: str, quantize: bool) -> str:
+    safe_id = re.sub(r"[^A-Za-z0-9_.-]+", "--", model_id)
+    return os.path.join(ONNX_MODEL_DIR, safe_id, "int8" if quantize else "fp32")
+
+def _quantize(model_dir: str, target_dir: str):
+    """int8 dynamic quantisation of every ONNX graph in model_dir (seq2seq models have several)."""
+    config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    for file_name in sorted(os.listdir(model_dir)):
+        if file_name.endswith(".onnx"):
+            quantizer = ORTQuantizer.from_pretrained(model_dir, file_name=file_name)
+            quantizer.quantize(save_dir=target_dir, quantization_config=config)
+    # Quantised graphs are written as <name>_quantized.onnx; give them the names the loader expects
+    for file_name in os.listdir(target_dir):
+        if file_name.endswith("_quantized.onnx"):
+            os.replace(os.path.join(target_dir, file_name),
+                       os.path.join(target_dir, file_name.replace("_quantized.onnx", ".onnx")))
+
+def load_ort_model(model_class, model_id: str, quantize: bool = None):
+    """
+    ONNX Runtime model for `model_id`, exported (and quantised) on first use and reused afterwards.
+
+    Args:
+        model_class: optimum ORTModel class for the task
+        model_id (str): HuggingFace model id
+        quantize (bool): int8 dynamic quantisation (default ONNX_QUANTIZE)
+    """
+    quantize = ONNX_QUANTIZE if quantize is None else quantize
+    fp32_dir = export_dir(model_id, quantize=False)
+    if not os.path.exists(os.path.join(fp32_dir, "config.json")):
+        logger.info(f"Exporting {model_id} to ONNX -> {fp32_dir}")
+        model_class.from_pretrained(model_id, export=True).save_pretrained(fp32_dir)
+    if not quantize:
+        return model_class.from_pretrained(fp32_dir)
+
+    int8_dir = export_dir(model_id, quantize=True)
+    if not os.path.exists(os.path.join(int8_dir, "config.json")):
+        logger.info(f"Quantising {model_id} to int8 -> {int8_dir}")
+        os.makedirs(int8_dir, exist_ok=True)
+        _quantize(fp32_dir, int8_dir)
+        # Configs, tokenizer files and generation settings are unchanged by quantisation
+        for file_name in os.listdir(fp32_dir):
+            if not file_name.endswith(".onnx") and not os.path.exists(os.path.join(int8_dir, file_name)):
+                with open(os.path.join(fp32_dir, file_name), "rb") as src, open(os.path.join(int8_dir, file_name), "wb") as dst:
+                    dst.write(src.read())
+    return model_class.from_pretrained(int8_dir)
+
+# --- Loaders used by the local models ---
+# Models are shared process-wide through the model registry, keyed by model id and device
+# (the execution backend), so pipelines built on the same weights reuse one copy.
+
+def backend_device(backend: str = None) -> str:
+    """Registry device of the selected backend: MODEL_DEVICE for PyTorch, 'onnxruntime-cpu[-int8]' for ONNX."""
+    if use_onnx(backend):
+        return "onnxruntime-cpu-int8" if ONNX_QUANTIZE else "onnxruntime-cpu"
+    return MODEL_DEVICE
+
+def _shared(model_id: str, loader, backend: str = None):
+    return get_model_registry().shared(model_id, loader, device=backend_device(backend))
+
+def load_tokenizer(model_id: str):
+    """Tokenizer for `model_id`, shared by every pipeline using the model (tokenizers run on the CPU)."""
+    from transformers import AutoTokenizer
+    return get_model_registry().shared(f"{model_id}#tokenizer", lambda: AutoTokenizer.from_pretrained(model_id), device="cpu")
+
+def load_seq2seq_model(model_id: str, backend: str = None):
+    """BART (or other seq2seq) model with generate(), on the selected backend."""
+    def load():
+        if use_onnx(backend):
+            return load_ort_model(ORTModelForSeq2SeqLM, model_id)
+        from transformers import AutoModelForSeq2SeqLM
+        return AutoModelForSeq2SeqLM.from_pretrained(model_id).to(MODEL_DEVICE).eval()
+    return _shared(model_id, load, backend)
+
+def load_token_classification_model(model_id: str, backend: str = None):
+    """Token-classification (NER) model on the selected backend."""
+    def load():
+        if use_onnx(backend):
+            return load_ort_model(ORTModelForTokenClassification, model_id)
+        from transformers import AutoModelForTokenClassification
+        return AutoModelForTokenClassification.from_pretrained(model_id).to(MODEL_DEVICE).eval()
+    return _shared(model_id, load, backend)
+
+def _shared_pipeline(task: str, model_id: str, load_model, backend: str = None, **kwargs):
+    """
+    Pipeline wrapper for `task`, itself a registry entry built on the shared model and
+    tokenizer, so evicting the model drops the wrapper too.
+    """
+    from transformers import pipeline
+
+    def load():
+        return pipeline(task, model=load_model(model_id, backend), tokenizer=load_tokenizer(model_id),
+                        **_pipeline_device(backend), **kwargs)
+    return _shared(f"{model_id}#{task}", load, backend)
+
+def load_summarization_pipeline(model_id: str, backend: str = None):
+    """transformers summarization pipeline around the shared model and tokenizer."""
+    return _shared_pipeline("summarization", model_id, load_seq2seq_model, backend)
+
+def load_ner_pipeline(model_id: str, backend: str = None, aggregation_strategy: str = "simple"):
+    """transformers token-classification (NER) pipeline around the shared model and tokenizer."""
+    return _shared_pipeline("ner", model_id, load_token_classification_model, backend,
+                            aggregation_strategy=aggregation_strategy)
+
+def _pipeline_device(backend: str = None):
+    # PyTorch pipelines run where their model is; ONNX Runtime models pick their own provider
+    return {} if use_onnx(backend) else {"device": MODEL_DEVICE}
+
+# Pooling modes of a sentence-transformers Pooling module, in the order it concatenates them
+_POOLING_MODES = ("cls_token", "max_tokens", "mean_tokens", "mean_sqrt_len_tokens")
+
+def _read_model_json(model_id: str, file_name: str) -> Optional[dict]:
+    """A JSON file from a local model directory or the model's Hugging Face repo; None if it has none."""
+    if os.path.isdir(model_id):
+        path = os.path.join(model_id, file_name)
+    else:
+        try:
+            from huggingface_hub import hf_hub_download
+            path = hf_hub_download(model_id, file_name)
+        except Exception:
+            return None
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def sentence_transformers_config(model_id: str) -> dict:
+    """
+    The settings a sentence-transformers model applies around its transformer, read from its
+    own files: max_seq_length and do_lower_case (sentence_bert_config.json), the pooling modes
+    (the Pooling module's config.json, located through modules.json) and whether a Normalize
+    module follows. Models without these files get mean pooling and no normalisation.
+    """
+    sbert_config = _read_model_json(model_id, "sentence_bert_config.json") or {}
+    modules = _read_model_json(model_id, "modules.json") or []
+    pooling_path = next((module.get("path") for module in modules if module.get("type", "").endswith(".Pooling")), None)
+    pooling_config = (_read_model_json(model_id, f"{pooling_path}/config.json") if pooling_path else None) or {}
+    pooling = [mode for mode in _POOLING_MODES if pooling_config.get(f"pooling_mode_{mode}")]
+    unsupported = [key for key, value in pooling_config.items()
+                   if key.startswith("pooling_mode_") and value and key[len("pooling_mode_"):] not in _POOLING_MODES]
+    if unsupported:
+        raise ValueError(f"{model_id} uses pooling {unsupported}, which the ONNX encoder does not implement")
+    return {
+        "max_seq_length": sbert_config.get("max_seq_length"),
+        "do_lower_case": bool(sbert_config.get("do_lower_case", False)),
+        "pooling": pooling or ["mean_tokens"],
+        "normalize": any(module.get("type", "").endswith(".Normalize") for module in modules)
+    }
+
+class OnnxSentenceEncoder:
+    def __init__(self, model_id: str, max_seq_length: int = None, normalize: bool = None):
+        """
+        Sentence-Transformers compatible encoder on ONNX Runtime: the transformer runs in ONNX,
+        followed by the same truncation, pooling and (if the model has it) L2 normalisation
+        the sentence-transformers model applies, read from the model's own config files.
+
+        Args:
+            model_id (str): Model id, e.g. 'all-mpnet-base-v2' or 'sentence-transformers/all-mpnet-base-v2'
+            max_seq_length (int): Token limit per sentence (default: the model's sentence_bert_config.json,
+                e.g. 384 for all-mpnet-base-v2, 256 for all-MiniLM-L6-v2, 128 for all-MiniLM-L12-v2)
+            normalize (bool): L2-normalise embeddings (default: whether the model has a Normalize module)
+        """
+        if "/" not in model_id and not os.path.isdir(model_id):
+            model_id = f"sentence-transformers/{model_id}"
+        self.model_id = model_id
+        config = sentence_transformers_config(model_id)
+        self.tokenizer = load_tokenizer(model_id)
+        self.model = load_ort_model(ORTModelForFeatureExtraction, model_id)
+        # Without a sentence_bert_config.json, sentence-transformers uses the model's own limit
+        self.max_seq_length = max_seq_length or config["max_seq_length"] or min(
+            self.tokenizer.model_max_length, getattr(self.model.config, "max_position_embeddings", 512))
+        self.do_lower_case = config["do_lower_case"]
+        self.pooling = config["pooling"]
+        self.normalize = config["normalize"] if normalize is None else normalize
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.config.hidden_size * len(self.pooling)
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        pooled = []
+        for mode in self.pooling:
+            if mode == "cls_token":
+                pooled.append(hidden[:, 0])
+            elif mode == "max_tokens":
+                pooled.append(np.where(mask > 0, hidden, -1e9).max(axis=1))
+            else:
+                summed = (hidden * mask).sum(axis=1)
+                counts = np.maximum(mask.sum(axis=1), 1e-9)
+                pooled.append(summed / (counts if mode == "mean_tokens" else np.sqrt(counts)))
+        return np.concatenate(pooled, axis=1)
+
+    def encode(self, sentences: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if self.do_lower_case:
+            sentences = [sentence.lower() for sentence in sentences]
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors="np")
+            hidden = self.model(**inputs).last_hidden_state
+            hidden = hidden.numpy() if hasattr(hidden, "numpy") else np.asarray(hidden)
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = self._pool(hidden, mask)
+            if self.normalize:
+                pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            batches.append(pooled.astype(np.float32))
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 0), np.float32)
+        return embeddings[0] if single else embeddings
+
+def load_sentence_encoder(model_id: str, backend: str = None):
+    """Sentence-BERT encoder with .encode() on the selected backend."""
+    def load():
+        if use_onnx(backend):
+            return OnnxSentenceEncoder(model_id)
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_id, device=MODEL_DEVICE)
+    return _shared(model_id, load, backend)
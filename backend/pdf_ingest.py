@@ -0,0 +1,67 @@
+"""
+PDF Ingestion for Legal Documents
+Streams a PDF page by page: pages with an embedded text layer are read directly,
+and only scanned pages are rasterised and handed to the OCR path in ocr.py.
+"""
+
+import os
+import logging
+from typing import Iterator
+
+import numpy as np
+
+from ocr import TextLayerPage
+
+logger = logging.getLogger(__name__)
+
+# PyMuPDF is optional; without it PDF uploads are rejected
+try:
+    import pymupdf
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+# Pages whose text layer has fewer characters than this are treated as scanned
+PDF_MIN_TEXT_CHARS = int(os.getenv('PDF_MIN_TEXT_CHARS', '50'))
+# Resolution scanned pages are rendered at before OCR
+PDF_RASTER_DPI = int(os.getenv('PDF_RASTER_DPI', '300'))
+
+def is_pdf(image_source) -> bool:
+    """True when a path or byte buffer holds a PDF."""
+    if isinstance(image_source, str):
+        with open(image_source, "rb") as f:
+            header = f.read(5)
+    else:
+        header = bytes(image_source[:5])
+    return header == b"%PDF-"
+
+def _open_pdf(source):
+    if not PDF_AVAILABLE:
+        raise ValueError("PDF support requires PyMuPDF (pip install PyMuPDF)")
+    if isinstance(source, str):
+        return pymupdf.open(source)
+    return pymupdf.open(stream=bytes(source), filetype="pdf")
+
+def pdf_page_count(source) -> int:
+    """Number of pages, read from the PDF's page tree without rendering anything."""
+    with _open_pdf(source) as document:
+        return document.page_count
+
+def iter_pdf_pages(source) -> Iterator:
+    """
+    Yields the pages of a PDF in order, one at a time.
+    Pages with a usable text layer come out as TextLayerPage; scanned pages are rendered
+    at PDF_RASTER_DPI and come out as grayscale numpy arrays for the OCR pipeline.
+    """
+    with _open_pdf(source) as document:
+        scanned = 0
+        for page in document:
+            text = page.get_text("text")
+            if len(text.strip()) >= PDF_MIN_TEXT_CHARS:
+                yield TextLayerPage(text)
+                continue
+            scanned += 1
+            pixmap = page.get_pixmap(dpi=PDF_RASTER_DPI, colorspace=pymupdf.csGRAY, alpha=False)
+            # Copy out of the pixmap's buffer, which is freed with the page
+            yield np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.stride)[:, :pixmap.width].copy()
+        logger.info(f"PDF ingested: {document.page_count} page(s), {scanned} rasterised for OCR")
@@ -0,0 +1,108 @@
+"""
+Clause Concept Index for Semantic Matching
+Finds the taxonomy concepts closest to each document sentence. Small taxonomies are
+searched exactly with one normalised matrix product; large ones (tens of thousands of
+clause concepts) through an HNSW approximate nearest-neighbour index built once per
+process, so matching cost stays flat as the taxonomy grows.
+"""
+
+import os
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# hnswlib is optional; without it every taxonomy is searched exactly
+try:
+    import hnswlib
+    HNSW_AVAILABLE = True
+except ImportError:
+    HNSW_AVAILABLE = False
+
+# Taxonomies with at least this many concepts use the ANN index (when hnswlib is installed)
+ANN_MIN_CONCEPTS = int(os.getenv('SEMANTIC_ANN_MIN_CONCEPTS', '50000'))
+# HNSW graph degree, build-time and query-time candidate list sizes
+HNSW_M = int(os.getenv('SEMANTIC_HNSW_M', '16'))
+HNSW_EF_CONSTRUCTION = int(os.getenv('SEMANTIC_HNSW_EF_CONSTRUCTION', '200'))
+HNSW_EF_SEARCH = int(os.getenv('SEMANTIC_HNSW_EF_SEARCH', '64'))
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scales each row to unit length, so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def top_k_exact(queries: np.ndarray, concepts: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k cosine matches of every query row against every concept row, from one matrix product.
+    Both inputs must already be unit length.
+
+    Returns:
+        tuple: (scores, indices), each of shape (len(queries), k), best match first
+    """
+    k = min(k, concepts.shape[0])
+    similarities = queries @ concepts.T
+    if k < concepts.shape[0]:
+        candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(k), similarities.shape).copy()
+    candidate_scores = np.take_along_axis(similarities, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    return np.take_along_axis(candidate_scores, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+
+class ConceptIndex:
+    def __init__(self, concepts: List[str], embeddings: np.ndarray, use_ann: bool = None,
+                 categories: Optional[List[str]] = None, normalized: bool = False):
+        """
+        Args:
+            concepts (List[str]): Concept labels, one per embedding row
+            embeddings (np.ndarray): Concept embeddings (normalised here unless `normalized`)
+            use_ann (bool): Force the HNSW index on or off (default: on from ANN_MIN_CONCEPTS concepts)
+            categories (List[str]): Category of each concept, if the taxonomy has them
+            normalized (bool): Rows are already unit-length float32; used as given, so a
+                memory-mapped matrix stays mapped instead of being copied
+        """
+        if len(concepts) != len(embeddings):
+            raise ValueError(f"{len(concepts)} concepts but {len(embeddings)} embeddings")
+        self.concepts = list(concepts)
+        self.categories = list(categories) if categories is not None else [None] * len(self.concepts)
+        self.embeddings = embeddings if normalized else normalize_rows(embeddings)
+        if use_ann is None:
+            use_ann = len(self.concepts) >= ANN_MIN_CONCEPTS
+        if use_ann and not HNSW_AVAILABLE:
+            logger.warning("hnswlib is not installed; searching the concept taxonomy exactly")
+        self.use_ann = use_ann and HNSW_AVAILABLE
+        self._ann = self._build_ann() if self.use_ann else None
+
+    def _build_ann(self):
+        (count, dim) = self.embeddings.shape
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.init_index(max_elements=count, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        index.add_items(self.embeddings, np.arange(count))
+        index.set_ef(HNSW_EF_SEARCH)
+        logger.info(f"Built HNSW index over {count} clause concepts")
+        return index
+
+    def __len__(self):
+        return len(self.concepts)
+
+    def search(self, queries: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k concepts for each query embedding.
+
+        Returns:
+            tuple: (cosine scores, concept indices), each of shape (len(queries), k), best first
+        """
+        queries = normalize_rows(queries)
+        k = min(k, len(self.concepts))
+        if queries.shape[0] == 0 or k == 0:
+            return np.zeros((queries.shape[0], k), np.float32), np.zeros((queries.shape[0], k), np.int64)
+        if self._ann is None:
+            return top_k_exact(queries, self.embeddings, k)
+        # The candidate list must be at least k long
+        self._ann.set_ef(max(HNSW_EF_SEARCH, k))
+        labels, distances = self._ann.knn_query(queries, k=k)
+        # hnswlib's inner-product distance is 1 - dot product
+        return (1.0 - distances).astype(np.float32), labels.astype(np.int64)
@@ -0,0 +1,90 @@
+"""
+Resolution checks for adaptive OCR on a large JPEG with small text, which is decoded reduced
+and has to be decoded again at full size: the full tier must hand Tesseract the same image
+size as the non-adaptive path, and selective re-reads must crop the full-size page.
+Tesseract is not needed: the recognition calls are replaced by recorders of the image they
+would read, and the fast pass "reads" what each check needs.
+Run from the backend directory: python test_adaptive_ocr.py
+"""
+
+import sys
+
+import cv2
+import numpy as np
+
+import ocr
+from ocr_pool import WORD_DATA_KEYS
+
+def check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+def small_text_jpeg() -> bytes:
+    """A 4800x3600 page whose text is about 10 pixels tall at full size."""
+    page = np.full((3600, 4800, 3), 255, np.uint8)
+    for index in range(60):
+        cv2.putText(page, f"Clause {index}: the tenant shall pay rent on the first day of each month.",
+                    (200, 200 + index * 50), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 1)
+    return cv2.imencode(".jpg", page, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+
+class Recorder:
+    """Stands in for recognize_words / recognize_text, keeping the images Tesseract would get."""
+    def __init__(self, words=None):
+        self.words = words or {key: [] for key in WORD_DATA_KEYS}
+        self.images = []
+
+    def recognize_words(self, image, timeout=None, psm=None):
+        return self.words
+
+    def recognize_text(self, image, timeout=None, psm=None):
+        self.images.append(image)
+        return "text"
+
+def run(source: bytes, adaptive: bool, recorder: Recorder) -> dict:
+    ocr.recognize_words, ocr.recognize_text = recorder.recognize_words, recorder.recognize_text
+    return ocr.ocr_document(source, adaptive=adaptive)["metadata"]
+
+def run_tests() -> bool:
+    ocr.OCR_CACHE_ENABLED = False
+    source = small_text_jpeg()
+    results = []
+
+    plain = Recorder()
+    plain_metadata = run(source, False, plain)
+    full = Recorder()  # The fast pass reads nothing, so the whole page goes through the full tier
+    full_metadata = run(source, True, full)
+    expected, actual = plain.images[0].shape, full.images[0].shape
+    results.append(check("small text makes the non-adaptive path decode the JPEG again at full size",
+                         ocr._decode_reduction(source) > 1 and plain_metadata["decode_scale"] == 1.0,
+                         f"first decode reduced {ocr._decode_reduction(source)}x"))
+    results.append(check("the full tier processes the page at the non-adaptive size", actual == expected,
+                         f"{actual} vs {expected}"))
+    results.append(check("the full tier reports the non-adaptive scale",
+                         full_metadata["ocr_tier"] == "full"
+                         and full_metadata["decode_scale"] == plain_metadata["decode_scale"]
+                         and full_metadata["scale_factor"] == plain_metadata["scale_factor"],
+                         f"decode_scale {full_metadata['decode_scale']}, scale_factor {full_metadata['scale_factor']}"))
+
+    # One low-confidence line in fast-pass coordinates (the page downscaled to 1600 pixels wide)
+    fast_scale = ocr.OCR_FAST_PASS_MAX_SIDE / 4800
+    box = (190, 180, 1500, 215)
+    words = {"text": ["Clause"], "conf": [20], "left": [int(box[0] * fast_scale)], "top": [int(box[1] * fast_scale)],
+             "width": [int((box[2] - box[0]) * fast_scale)], "height": [int((box[3] - box[1]) * fast_scale)],
+             "block_num": [1], "par_num": [1], "line_num": [1]}
+    selective = Recorder(words)
+    selective_metadata = run(source, True, selective)
+    region_height = selective.images[0].shape[0]
+    # Cropped at full size, the region's 10-pixel text is scaled up 2x before it is read
+    full_size_height = (box[3] - box[1]) * ocr.MAX_NORMALIZE_SCALE
+    results.append(check("selective re-reads crop the full-size page",
+                         selective_metadata["ocr_tier"] == "selective" and region_height >= 0.9 * full_size_height,
+                         f"region {selective.images[0].shape}, expected height about {full_size_height:.0f}"))
+    return all(results)
+
+if __name__ == "__main__":
+    print("🔍 Adaptive OCR resolution")
+    print("=" * 60)
+    passed = run_tests()
+    print("=" * 60)
+    print("✅ All checks passed" if passed else "❌ Some checks failed")
+    sys.exit(0 if passed else 1)
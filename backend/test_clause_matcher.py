@@ -0,0 +1,82 @@
+"""
+Correctness checks for the rule-based clause matcher. Documents are built from hand-annotated
+parses on a blank English pipeline, so no spaCy model is needed: multi-word condition terms
+such as "provided that" match (case-insensitively), action words only count as a clause's
+main verb or auxiliary, and each sentence is reported once per clause type with its span.
+Run from the backend directory: python test_clause_matcher.py
+"""
+
+import sys
+
+import spacy
+from spacy.tokens import Doc
+
+from nlp_processing import _build_clause_matcher, _match_clauses
+
+def check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+def parsed(nlp, sentences) -> Doc:
+    """
+    A Doc from annotated sentences: each sentence is a list of (word, dependency, head), with
+    the head as an index within the sentence. Punctuation attaches to the preceding word.
+    """
+    words, deps, heads, sent_starts, spaces = [], [], [], [], []
+    for sentence in sentences:
+        offset = len(words)
+        for index, (word, dep, head) in enumerate(sentence):
+            words.append(word)
+            deps.append(dep)
+            heads.append(offset + head)
+            sent_starts.append(index == 0)
+            following = sentence[index + 1][0] if index + 1 < len(sentence) else None
+            spaces.append(following not in (".", ","))
+    return Doc(nlp.vocab, words=words, spaces=spaces, heads=heads, deps=deps, sent_starts=sent_starts)
+
+PROVIDED_THAT = [("Rent", "nsubj", 1), ("is", "ROOT", 1), ("due", "acomp", 1), ("monthly", "advmod", 1), (",", "punct", 1),
+                 ("provided", "mark", 9), ("that", "mark", 9), ("notice", "nsubjpass", 9), ("is", "auxpass", 9),
+                 ("given", "advcl", 1), (".", "punct", 1)]
+IN_THE_EVENT = [("In", "prep", 6), ("the", "det", 2), ("event", "pobj", 0), ("of", "prep", 2), ("default", "pobj", 3),
+                (",", "punct", 6), ("Landlord", "nsubj", 7), ("terminates", "ROOT", 7), (".", "punct", 7)]
+SHALL = [("The", "det", 1), ("Tenant", "nsubj", 3), ("shall", "aux", 3), ("pay", "ROOT", 3), ("rent", "dobj", 3),
+         ("if", "mark", 6), ("invoiced", "advcl", 3), ("unless", "mark", 8), ("waived", "conj", 6), (".", "punct", 3)]
+WILL_AS_NOUN = [("His", "poss", 1), ("will", "nsubj", 2), ("names", "ROOT", 2), ("heirs", "dobj", 2), (".", "punct", 2)]
+
+def run_tests() -> bool:
+    nlp = spacy.blank("en")
+    matcher = _build_clause_matcher(nlp.vocab, nlp.make_doc)
+    results = []
+
+    doc = parsed(nlp, [PROVIDED_THAT, IN_THE_EVENT, SHALL, WILL_AS_NOUN])
+    clauses = _match_clauses(doc, matcher)
+    by_type = {}
+    for clause in clauses:
+        by_type.setdefault(clause["type"], []).append(clause["text"])
+
+    results.append(check("multi-word condition terms match",
+                         "Rent is due monthly, provided that notice is given." in by_type.get("condition", [])
+                         and "In the event of default, Landlord terminates." in by_type.get("condition", []),
+                         str(by_type.get("condition"))))
+    results.append(check("action words count as auxiliary or main verb",
+                         by_type.get("obligation/right") == ["The Tenant shall pay rent if invoiced unless waived."],
+                         str(by_type.get("obligation/right"))))
+    results.append(check("a sentence is reported once per clause type",
+                         by_type.get("condition", []).count("The Tenant shall pay rent if invoiced unless waived.") == 1))
+    results.append(check("spans point at the sentence text",
+                         all(doc.text[clause["start"]:clause["end"]] == clause["text"] for clause in clauses)))
+
+    upper = parsed(nlp, [[(word.upper(), dep, head) for word, dep, head in PROVIDED_THAT]])
+    results.append(check("matching is case-insensitive",
+                         [clause["type"] for clause in _match_clauses(upper, matcher)] == ["condition"]))
+    results.append(check("\"will\" as a noun is not an obligation",
+                         _match_clauses(parsed(nlp, [WILL_AS_NOUN]), matcher) == []))
+    return all(results)
+
+if __name__ == "__main__":
+    print("🔍 Clause matcher")
+    print("=" * 60)
+    passed = run_tests()
+    print("=" * 60)
+    print("✅ All checks passed" if passed else "❌ Some checks failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,150 @@
+"""
+Correctness checks for the sentence embedding cache with a stand-in encoder (vectors derived
+from the sentence text), so no model is needed: cached and freshly encoded vectors are
+identical, only unseen sentences reach the encoder, the memory tier stays within its bound
+and the memory-mapped tier is shared by processes pointing at the same directory.
+Run from the backend directory: python test_embedding_cache.py
+"""
+
+import os
+import sys
+import hashlib
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+from embedding_cache import SentenceEmbeddingCache, encode_with_cache, sentence_key
+
+DIM = 16
+
+def check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+class FakeEncoder:
+    """SentenceTransformer stand-in: a fixed random vector per sentence, recording what it encoded."""
+    def __init__(self):
+        self.encoded = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return DIM
+
+    def encode(self, sentences):
+        self.encoded.extend(sentences)
+        return np.stack([self._vector(sentence) for sentence in sentences])
+
+    @staticmethod
+    def _vector(sentence: str, dim: int = DIM) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha1(" ".join(sentence.split()).encode()).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+SENTENCES = ["The tenant shall pay rent monthly.", "The landlord shall maintain the premises.",
+             "This agreement is governed by the laws of the State."]
+
+def test_memory_tier() -> list:
+    cache = SentenceEmbeddingCache()
+    encoder = FakeEncoder()
+    fresh = encode_with_cache(encoder, SENTENCES + [SENTENCES[0]], "test", cache)
+    encoded_first = len(encoder.encoded)
+    cached = encode_with_cache(encoder, ["The  tenant shall\npay rent monthly."] + SENTENCES[1:], "test", cache)
+    return [
+        check("repeated sentences in a batch are encoded once", encoded_first == 3 and np.array_equal(fresh[0], fresh[3])),
+        check("cached vectors equal freshly encoded ones", np.array_equal(fresh[:3], cached)
+              and len(encoder.encoded) == 3, f"{len(encoder.encoded)} sentences encoded"),
+        check("float32 rows in input order", cached.dtype == np.float32 and cached.shape == (3, DIM)),
+        check("another model gets another key", sentence_key(SENTENCES[0], "a") != sentence_key(SENTENCES[0], "b")),
+    ]
+
+def test_memory_bound() -> list:
+    cache = SentenceEmbeddingCache(max_bytes=10 * DIM * 2)
+    encoder = FakeEncoder()
+    sentences = [f"Clause {index} applies." for index in range(30)]
+    encode_with_cache(encoder, sentences, "test", cache)
+    stats = cache.stats()
+    return [check("memory tier stays within max_bytes", stats["bytes"] <= 10 * DIM * 2 and stats["entries"] == 10,
+                  str(stats))]
+
+def encode_in_process(directory: str, sentences: list) -> int:
+    """Encodes `sentences` in a fresh process through a disk-backed cache; returns how many reached the encoder."""
+    cache = SentenceEmbeddingCache(disk_dir=directory)
+    encoder = FakeEncoder()
+    encode_with_cache(encoder, sentences, "test", cache)
+    cache.flush()
+    return len(encoder.encoded)
+
+def hammer_slot(directory: str, sentences: list, rounds: int) -> int:
+    """Writes and reads `sentences` in a one-slot table; returns how many hits had another sentence's vector."""
+    # Large vectors, so one write takes long enough for another process's write to overlap it
+    dim = 16384
+    cache = SentenceEmbeddingCache(max_bytes=0, disk_dir=directory, disk_slots=1)
+    vectors = {sentence: FakeEncoder._vector(sentence, dim).astype(np.float16) for sentence in sentences}
+    wrong = 0
+    for _ in range(rounds):
+        for sentence in sentences:
+            key = sentence_key(sentence, "test")
+            cache.put_many([key], vectors[sentence][None, :])
+            vector = cache.get_many([key], dim)[0]
+            expected = vectors[sentence]
+            wrong += int(vector is not None and not np.array_equal(vector, expected))
+    return wrong
+
+def test_disk_tier() -> list:
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        # Several processes creating and filling the same table at once
+        with context.Pool(4) as pool:
+            pool.starmap(encode_in_process, [(directory, SENTENCES)] * 4)
+        with context.Pool(1) as pool:
+            encoded_later = pool.starmap(encode_in_process, [(directory, SENTENCES)])[0]
+
+        cache = SentenceEmbeddingCache(disk_dir=directory)
+        encoder = FakeEncoder()
+        from_disk = encode_with_cache(encoder, SENTENCES, "test", cache)
+        expected = encode_with_cache(FakeEncoder(), SENTENCES, "test", SentenceEmbeddingCache())
+        results = [
+            check("another process is served from the disk tier", encoded_later == 0),
+            check("disk vectors equal freshly encoded ones",
+                  np.array_equal(from_disk, expected) and not encoder.encoded and cache.stats()["disk_hits"] == 3),
+        ]
+
+        # A worker configured with another table size gets its own table; the mapped one stays valid
+        resized = SentenceEmbeddingCache(disk_dir=directory, disk_slots=500)
+        encode_with_cache(FakeEncoder(), SENTENCES, "test", resized)
+        cache.clear()
+        still_mapped = encode_with_cache(encoder, SENTENCES, "test", cache)
+        results.append(check("a table size change leaves mapped tables readable",
+                             np.array_equal(still_mapped, expected) and not encoder.encoded,
+                             str(sorted(os.listdir(os.path.join(directory, f"dim{DIM}"))))))
+
+        # Processes overwriting the same slot with different sentences at once
+        writers = [(directory, [f"Writer {index} sentence {n}." for n in range(4)], 300) for index in range(4)]
+        with context.Pool(4) as pool:
+            wrong = sum(pool.starmap(hammer_slot, writers))
+        results.append(check("concurrent writers to one slot never pair a key with another vector", wrong == 0,
+                             f"{wrong} mismatched hits"))
+        return results
+
+def test_slot_collision() -> list:
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SentenceEmbeddingCache(max_bytes=0, disk_dir=directory, disk_slots=1)
+        encoder = FakeEncoder()
+        first = encode_with_cache(encoder, SENTENCES[:1], "test", cache)
+        encode_with_cache(encoder, SENTENCES[1:2], "test", cache)  # same slot, overwrites
+        again = encode_with_cache(encoder, SENTENCES[:1], "test", cache)
+        return [check("an overwritten slot misses instead of returning another sentence's vector",
+                      np.array_equal(first, again) and len(encoder.encoded) == 3)]
+
+def run_tests() -> bool:
+    results = []
+    for test in (test_memory_tier, test_memory_bound, test_disk_tier, test_slot_collision):
+        results.extend(test())
+    return all(results)
+
+if __name__ == "__main__":
+    print("🔍 Sentence embedding cache")
+    print("=" * 60)
+    passed = run_tests()
+    print("=" * 60)
+    print("✅ All checks passed" if passed else "❌ Some checks failed")
+    sys.exit(0 if passed else 1)
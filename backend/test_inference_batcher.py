@@ -0,0 +1,91 @@
+"""
+Correctness checks for the micro-batching scheduler: concurrent requests are grouped by their
+group key, batches never exceed max_batch_size, every caller gets its own result back and a
+failing batch fails only its own requests.
+Run from the backend directory: python test_inference_batcher.py
+"""
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from inference_batcher import MicroBatcher, length_bucket
+
+def check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+def test_grouping() -> list:
+    batches = []
+    lock = threading.Lock()
+
+    def run_batch(payloads, group):
+        with lock:
+            batches.append((group, list(payloads)))
+        return [f"{group}:{payload}" for payload in payloads]
+
+    batcher = MicroBatcher(run_batch, max_batch_size=4, max_wait_ms=50, name="test")
+    requests = [(index, ("short" if index % 2 else "long", 150)) for index in range(24)]
+    with ThreadPoolExecutor(max_workers=24) as pool:
+        futures = [pool.submit(lambda request: batcher.submit(*request).result(timeout=5), request)
+                   for request in requests]
+        results = [future.result() for future in futures]
+
+    expected = [f"{group}:{index}" for index, group in requests]
+    batched = [payload for _, payloads in batches for payload in payloads]
+    homogeneous = all(all(requests[payload][1] == group for payload in payloads) for group, payloads in batches)
+    return [
+        check("every caller gets the result for its own input", results == expected),
+        check("every input runs exactly once", sorted(batched) == list(range(24))),
+        check("a batch only holds one group", homogeneous),
+        check("batches respect max_batch_size", all(len(payloads) <= 4 for _, payloads in batches),
+              str([len(payloads) for _, payloads in batches])),
+        check("concurrent requests are batched together", len(batches) < len(requests),
+              f"{len(batches)} batches for {len(requests)} requests"),
+    ]
+
+def test_errors() -> list:
+    def run_batch(payloads, group):
+        if group == "broken":
+            raise ValueError("model failed")
+        if group == "short-results":
+            return payloads[:-1]
+        return payloads
+
+    batcher = MicroBatcher(run_batch, max_batch_size=8, max_wait_ms=20, name="test-errors")
+    broken = batcher.submit("a", "broken")
+    short = batcher.submit("b", "short-results")
+    healthy = batcher.submit("c", "ok")
+
+    def raises(future, error_type) -> bool:
+        try:
+            future.result(timeout=5)
+        except error_type:
+            return True
+        return False
+
+    return [
+        check("a failing batch raises its error to its callers", raises(broken, ValueError)),
+        check("a batch returning too few results is an error", raises(short, RuntimeError)),
+        check("other groups are unaffected", healthy.result(timeout=5) == "c"),
+        check("run() returns results in order", batcher.run(["x", "y", "z"], "ok", timeout=5) == ["x", "y", "z"]),
+    ]
+
+def test_length_bucket() -> list:
+    return [check("length buckets are powers of two with a floor of 64 tokens",
+                  length_bucket(1) == length_bucket(64) == 6 and length_bucket(65) == length_bucket(128) == 7
+                  and length_bucket(129) == 8)]
+
+def run_tests() -> bool:
+    results = []
+    for test in (test_grouping, test_errors, test_length_bucket):
+        results.extend(test())
+    return all(results)
+
+if __name__ == "__main__":
+    print("🔍 Micro-batching scheduler")
+    print("=" * 60)
+    passed = run_tests()
+    print("=" * 60)
+    print("✅ All checks passed" if passed else "❌ Some checks failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,144 @@
+"""
+Correctness checks for the LLM response cache: keys, TTL expiry, stale-while-revalidate,
+the accept filter, the on-disk tier shared between instances and the async path.
+Run from the backend directory: python test_llm_cache.py
+"""
+
+import sys
+import time
+import asyncio
+import tempfile
+
+from llm_cache import LLMResponseCache, llm_cache_key
+
+def check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+class Counter:
+    """compute() stand-in that returns a new response on every call."""
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"summary": f"response {self.calls}"}
+
+    async def compute_async(self):
+        return self()
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+def test_keys() -> list:
+    key = llm_cache_key("Summarise:\n\n  the lease", "gemini-1.5-flash", {"temperature": 0})
+    return [
+        check("whitespace-only prompt differences share a key",
+              key == llm_cache_key("Summarise: the lease", "gemini-1.5-flash", {"temperature": 0})),
+        check("another model gets another key",
+              key != llm_cache_key("Summarise: the lease", "gemini-1.5-pro", {"temperature": 0})),
+        check("another generation config gets another key",
+              key != llm_cache_key("Summarise: the lease", "gemini-1.5-flash", {"temperature": 0.7})),
+    ]
+
+def test_ttl() -> list:
+    cache = LLMResponseCache(ttl_seconds=0.2)
+    compute = Counter()
+    first = cache.get_or_compute("k", compute)
+    second = cache.get_or_compute("k", compute)
+    calls_while_fresh = compute.calls
+    time.sleep(0.3)
+    third = cache.get_or_compute("k", compute)
+    return [
+        check("fresh entry is served without a call", first == second and calls_while_fresh == 1),
+        check("entry past the TTL is recomputed", third == {"summary": "response 2"} and compute.calls == 2),
+    ]
+
+def test_stale_while_revalidate() -> list:
+    cache = LLMResponseCache(ttl_seconds=0.2, stale_seconds=5)
+    compute = Counter()
+    cache.get_or_compute("k", compute)
+    time.sleep(0.3)
+    stale = cache.get_or_compute("k", compute)
+    refreshed = wait_for(lambda: cache.lookup("k")[0] == {"summary": "response 2"})
+    return [
+        check("stale entry is served immediately", stale == {"summary": "response 1"}),
+        check("stale entry is refreshed in the background", refreshed and compute.calls == 2,
+              str(cache.stats())),
+        check("stale hit is counted", cache.stats()["stale_hits"] == 1),
+    ]
+
+def test_accept() -> list:
+    cache = LLMResponseCache()
+    compute = Counter()
+    reject = lambda value: False
+    cache.get_or_compute("k", compute, accept=reject)
+    cache.get_or_compute("k", compute, accept=reject)
+    return [check("rejected responses are not cached", compute.calls == 2)]
+
+def test_memory_bound() -> list:
+    cache = LLMResponseCache(max_bytes=2000)
+    for index in range(20):
+        cache.put(f"k{index}", {"summary": "x" * 300})
+    stats = cache.stats()
+    return [check("LRU keeps within max_bytes",
+                  stats["bytes"] <= 2000 and cache.lookup("k0") == (None, None)
+                  and cache.lookup("k19")[1] == "fresh", str(stats))]
+
+def test_disk_tier() -> list:
+    with tempfile.TemporaryDirectory() as directory:
+        writer = LLMResponseCache(disk_dir=directory, ttl_seconds=0.2)
+        writer.put("k", {"summary": "from disk"}, model="gemini")
+        reader = LLMResponseCache(disk_dir=directory, ttl_seconds=0.2)
+        value, state = reader.lookup("k")
+        results = [check("another instance reads the disk tier",
+                         value == {"summary": "from disk"} and state == "fresh"
+                         and reader.stats()["disk_hits"] == 1)]
+        time.sleep(0.3)
+        results.append(check("expired disk entries are purged", writer.purge_expired() == 1
+                             and LLMResponseCache(disk_dir=directory).lookup("k") == (None, None)))
+        return results
+
+def test_async() -> list:
+    async def scenario():
+        with tempfile.TemporaryDirectory() as directory:
+            cache = LLMResponseCache(disk_dir=directory, ttl_seconds=0.2, stale_seconds=5)
+            compute = Counter()
+            first = await cache.get_or_compute_async("k", compute.compute_async)
+            second = await cache.get_or_compute_async("k", compute.compute_async)
+            await asyncio.sleep(0.3)
+            stale = await cache.get_or_compute_async("k", compute.compute_async)
+            for _ in range(100):
+                if (await cache.lookup_async("k"))[0] == {"summary": "response 2"}:
+                    break
+                await asyncio.sleep(0.01)
+            on_disk = LLMResponseCache(disk_dir=directory).lookup("k")[0]
+            return first, second, stale, on_disk, compute.calls
+
+    first, second, stale, on_disk, calls = asyncio.run(scenario())
+    return [
+        check("async path serves fresh entries without a call", first == second),
+        check("async path serves stale entries and refreshes them",
+              stale == {"summary": "response 1"} and on_disk == {"summary": "response 2"} and calls == 2,
+              f"calls={calls}"),
+    ]
+
+def run_tests() -> bool:
+    results = []
+    for test in (test_keys, test_ttl, test_stale_while_revalidate, test_accept, test_memory_bound,
+                 test_disk_tier, test_async):
+        results.extend(test())
+    return all(results)
+
+if __name__ == "__main__":
+    print("🔍 LLM response cache")
+    print("=" * 60)
+    passed = run_tests()
+    print("=" * 60)
+    print("✅ All checks passed" if passed else "❌ Some checks failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,106 @@
+"""
+Correctness checks for hierarchical long-document summarisation, with a stand-in summariser
+(first words of each input) and word counts as tokens, so no model is needed: chunks cover
+the whole text within the budget, no chunk is dropped (also at the level cap), batches
+respect SUMMARY_BATCH_SIZE and cached chunk summaries are reused.
+Run from the backend directory: python test_long_summarizer.py
+"""
+
+import sys
+
+import long_summarizer
+from long_summarizer import ChunkSummaryCache, chunk_text, summarize_long
+
+def check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+def count_tokens(text: str) -> int:
+    return len(text.split())
+
+class Summariser:
+    """Keeps the first `words` words of every input and records the batch sizes it was called with."""
+    def __init__(self, words: int = 10):
+        self.words = words
+        self.batches = []
+
+    def __call__(self, texts, max_length, min_length):
+        self.batches.append(len(texts))
+        return [" ".join(text.split()[:self.words]) for text in texts]
+
+def lease(clauses: int, changed: int = -1) -> str:
+    return "\n\n".join(f"{index}. The tenant shall pay {'late fees' if index == changed else 'rent'} "
+                       f"number {index} on the first day of every month." for index in range(clauses))
+
+def test_chunking() -> list:
+    text = lease(100)
+    chunks = chunk_text(text, count_tokens, max_tokens=50)
+    run_on = " ".join(["word"] * 500)
+    run_on_chunks = chunk_text(run_on, count_tokens, max_tokens=50)
+    return [
+        check("chunks cover the whole text in order", " ".join(chunks).split() == text.split()),
+        check("chunks stay within the token budget", all(count_tokens(chunk) <= 50 for chunk in chunks),
+              f"max {max(count_tokens(chunk) for chunk in chunks)}"),
+        check("a sentence longer than the window is split on words",
+              " ".join(run_on_chunks).split() == run_on.split()
+              and all(count_tokens(chunk) <= 50 for chunk in run_on_chunks)),
+    ]
+
+def test_short_text() -> list:
+    summariser = Summariser()
+    summary = summarize_long("The tenant shall pay rent.", summariser, count_tokens, "test",
+                             cache=ChunkSummaryCache())
+    return [check("text within one window is summarised in one call",
+                  summariser.batches == [1] and summary == "The tenant shall pay rent.")]
+
+def test_batches_and_cache() -> list:
+    cache = ChunkSummaryCache()
+    summariser = Summariser()
+    summarize_long(lease(100), summariser, count_tokens, "test", max_tokens=50, cache=cache)
+    first_calls = list(summariser.batches)
+    summariser.batches.clear()
+    summarize_long(lease(100), summariser, count_tokens, "test", max_tokens=50, cache=cache)
+    rerun_calls = list(summariser.batches)
+    summariser.batches.clear()
+    summarize_long(lease(100, changed=40), summariser, count_tokens, "test", max_tokens=50, cache=cache)
+    edited_inputs = sum(summariser.batches)
+    return [
+        check("batches respect SUMMARY_BATCH_SIZE",
+              all(size <= long_summarizer.SUMMARY_BATCH_SIZE for size in first_calls), str(first_calls)),
+        check("a re-run document is served from the cache", rerun_calls == [], str(rerun_calls)),
+        check("an edited document only re-summarises what changed", 0 < edited_inputs < sum(first_calls),
+              f"{edited_inputs} of {sum(first_calls)} inputs"),
+    ]
+
+def test_repeated_chunks() -> list:
+    summariser = Summariser()
+    boilerplate = " ".join(["Standard confidentiality terms apply to both parties."] * 6)
+    text = "\n\n".join([boilerplate] * 4)
+    summarize_long(text, summariser, count_tokens, "test", max_tokens=50, cache=ChunkSummaryCache())
+    return [check("repeated boilerplate chunks are summarised once", summariser.batches[0] == 1,
+                  str(summariser.batches))]
+
+def test_level_cap() -> list:
+    levels = long_summarizer.SUMMARY_MAX_LEVELS
+    long_summarizer.SUMMARY_MAX_LEVELS = 1
+    try:
+        # Barely compresses, so one reduce level leaves several windows
+        summary = summarize_long(lease(200), Summariser(words=40), count_tokens, "test", max_tokens=50,
+                                 cache=ChunkSummaryCache())
+    finally:
+        long_summarizer.SUMMARY_MAX_LEVELS = levels
+    return [check("no chunk is dropped at the level cap", "number 0 " in summary and "number 199 " in summary)]
+
+def run_tests() -> bool:
+    results = []
+    for test in (test_chunking, test_short_text, test_batches_and_cache, test_repeated_chunks, test_level_cap):
+        results.extend(test())
+    return all(results)
+
+if __name__ == "__main__":
+    print("🔍 Long-document summarisation")
+    print("=" * 60)
+    passed = run_tests()
+    print("=" * 60)
+    print("✅ All checks passed" if passed else "❌ Some checks failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,152 @@
+"""
+Correctness checks for the model registry with stand-in models (their memory is the size of
+a weights file, as for ONNX Runtime models), so no model is downloaded: shared models load
+once, the memory budget evicts the least recently used model, evicted models and everything
+built on them reload on next use, idle models are evicted and failed loads are retried.
+Run from the backend directory: python test_model_registry.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from model_registry import EVICTED, FAILED, READY, ModelRegistry, shared_key
+
+MB = 1024 * 1024
+
+def check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+class FakeModel:
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+
+class Loaders:
+    """Loaders for stand-in models of a given size, counting how often each one runs."""
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, model_id: str, megabytes: float = 1, delay: float = 0):
+        path = os.path.join(self.directory, f"{model_id}.onnx")
+        with open(path, "wb") as f:
+            f.truncate(int(megabytes * MB))
+
+        def load():
+            with self._lock:
+                self.calls[model_id] = self.calls.get(model_id, 0) + 1
+            time.sleep(delay)
+            return FakeModel(path)
+        return load
+
+def key(model_id: str) -> str:
+    return shared_key(model_id, "cpu")
+
+def test_shared(loaders: Loaders) -> list:
+    registry = ModelRegistry()
+    load = loaders("bart", delay=0.1)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        models = list(pool.map(lambda _: registry.shared("bart", load, device="cpu"), range(8)))
+    return [
+        check("concurrent callers share one load", loaders.calls["bart"] == 1
+              and all(model is models[0] for model in models)),
+        check("shared model memory is recorded", registry.memory()["models"][key("bart")]["memory_bytes"] == MB),
+    ]
+
+def test_budget_and_reload(loaders: Loaders) -> list:
+    registry = ModelRegistry(memory_budget_bytes=int(2.5 * MB))
+    load = {model_id: loaders(model_id) for model_id in ("a", "b", "c")}
+    registry.shared("a", load["a"], device="cpu")
+    registry.shared("b", load["b"], device="cpu")
+    registry.shared("a", load["a"], device="cpu")  # a is now more recently used than b
+    registry.shared("c", load["c"], device="cpu")
+    results = [
+        check("the least recently used model is evicted over budget",
+              registry.is_loaded(key("a")) and not registry.is_loaded(key("b")) and registry.is_loaded(key("c"))),
+        check("loaded models fit the budget", registry.memory()["total_bytes"] <= 2.5 * MB,
+              str(registry.memory()["total_bytes"])),
+        check("evicted model is reported as evicted", registry.status()[key("b")]["state"] == EVICTED),
+    ]
+    registry.shared("b", load["b"], device="cpu")
+    stats = registry.memory()
+    results.append(check("an evicted model reloads on next use",
+                         registry.status()[key("b")]["state"] == READY and loaders.calls["b"] == 2
+                         and stats["reloads"] == 1 and stats["evictions"]["budget"] == 2, str(stats["evictions"])))
+    return results
+
+def test_dependents(loaders: Loaders) -> list:
+    registry = ModelRegistry(memory_budget_bytes=int(1.5 * MB))
+    load_encoder = loaders("encoder")
+    pipeline_loads = []
+
+    def load_pipeline():
+        pipeline_loads.append(1)
+        return {"encoder": registry.shared("encoder", load_encoder, device="cpu")}
+
+    registry.register("pipeline", load_pipeline)
+    first = registry.get("pipeline")
+    registry.shared("other", loaders("other"), device="cpu")  # pushes the encoder out
+    evicted_together = not registry.is_loaded(key("encoder")) and not registry.is_loaded("pipeline")
+    second = registry.get("pipeline")
+    return [
+        check("evicting a model evicts what was built on it", evicted_together),
+        check("the pipeline reloads with a live encoder",
+              len(pipeline_loads) == 2 and second is not first and registry.is_loaded(key("encoder"))),
+    ]
+
+def test_idle(loaders: Loaders) -> list:
+    registry = ModelRegistry(idle_ttl_seconds=0.2)
+    registry.shared("idle", loaders("idle"), device="cpu")
+    registry.warmup([key("idle")]).join()
+    kept = registry.evict_idle() == []
+    time.sleep(0.3)
+    evicted = registry.evict_idle() == [key("idle")]
+    return [
+        check("recently used models are kept", kept),
+        check("idle models are evicted", evicted and registry.memory()["evictions"]["idle"] == 1),
+        check("evicted warmup models still count as ready", registry.ready()),
+    ]
+
+def test_failed_load() -> list:
+    registry = ModelRegistry()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("download interrupted")
+        return "model"
+
+    registry.register("flaky", flaky)
+    try:
+        registry.get("flaky")
+        raised = False
+    except OSError:
+        raised = True
+    failed = registry.status()["flaky"]["state"] == FAILED
+    return [
+        check("a failed load raises and is reported", raised and failed),
+        check("the next call retries the load", registry.get("flaky") == "model" and len(attempts) == 2),
+    ]
+
+def run_tests() -> bool:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        loaders = Loaders(directory)
+        for test in (test_shared, test_budget_and_reload, test_dependents, test_idle):
+            results.extend(test(loaders))
+    results.extend(test_failed_load())
+    return all(results)
+
+if __name__ == "__main__":
+    print("🔍 Model registry")
+    print("=" * 60)
+    passed = run_tests()
+    print("=" * 60)
+    print("✅ All checks passed" if passed else "❌ Some checks failed")
+    sys.exit(0 if passed else 1)
@@ -92,16 +92,16 @@ def run_tests():
 if __name__ == "__main__":
     # Ensure models are downloaded before running tests
     print("Ensuring SpaCy and HuggingFace models are downloaded...")
-    # These imports trigger model loading in nlp_processing.py
+    # Load every model registered by nlp_processing.py up front (they are otherwise lazy)
     # If models are not found, it will attempt to download them.
     # This might take a while on the first run.
     try:
-        import spacy
-        from transformers import pipeline
-        from sentence_transformers import SentenceTransformer
-        spacy.load("en_core_web_lg")
-        pipeline("summarization", model="facebook/bart-large-cnn")
-        SentenceTransformer('all-mpnet-base-v2')
+        from nlp_processing import models
+        from model_tiers import DEFAULT_MODEL_TIER
+        # Default tier only (set MODEL_TIER to test another)
+        for name in models.status():
+            if name.endswith(f":{DEFAULT_MODEL_TIER}"):
+                models.get(name)
         print("Models loaded successfully.")
     except Exception as e:
         print(f"Error loading models. Please ensure internet connection or manual download: {e}")
@@ -0,0 +1,72 @@
+"""
+Correctness checks for the OCR result cache.
+Pages rendered from the same lease template, differing only in tenant name and rent, must
+never share a cache entry; the same page re-sent (also in another container format) must hit.
+Run from the backend directory: python test_ocr_cache.py
+"""
+
+import sys
+
+import cv2
+import numpy as np
+
+from ocr_cache import OCRResultCache, content_hash, settings_key
+
+SETTINGS = settings_key({"layout": False, "profile": "balanced", "adaptive": False})
+
+def lease_page(tenant: str, rent: str) -> np.ndarray:
+    """A letter-size page from one lease template, with the tenant's name and rent filled in."""
+    page = np.full((2200, 1700, 3), 255, np.uint8)
+    lines = ["RESIDENTIAL LEASE AGREEMENT", "This lease is made between the Landlord and",
+             f"Tenant: {tenant}", f"Monthly rent: {rent}",
+             "The tenant shall pay rent on the first day.", "Security deposit equals one month of rent."]
+    for index, line in enumerate(lines * 4):
+        cv2.putText(page, line, (100, 150 + index * 80), cv2.FONT_HERSHEY_SIMPLEX, 1.3, (0, 0, 0), 3)
+    return page
+
+def check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+def run_tests() -> bool:
+    results = []
+    cache = OCRResultCache()
+    first = lease_page("John Smith", "$1200")
+    second = lease_page("Maria Garcia", "$4750")
+    one_digit = lease_page("John Smith", "$1300")
+    cache.put(content_hash(first), SETTINGS, {"text": "Tenant: John Smith Monthly rent: $1200", "metadata": {}})
+
+    results.append(check("same-template page with another tenant misses",
+                         cache.get(content_hash(second), SETTINGS) is None))
+    results.append(check("same page with one digit changed misses",
+                         cache.get(content_hash(one_digit), SETTINGS) is None))
+
+    hit = cache.get(content_hash(first.copy()), SETTINGS)
+    results.append(check("identical page hits", hit is not None and "John Smith" in hit["text"]))
+
+    # The same pixels decoded from a lossless re-encode are the same page
+    _, png = cv2.imencode(".png", first)
+    decoded = cv2.imdecode(png, cv2.IMREAD_COLOR)
+    results.append(check("lossless re-encode of the page hits", cache.get(content_hash(decoded), SETTINGS) is not None))
+
+    other_settings = settings_key({"layout": True, "profile": "balanced", "adaptive": False})
+    results.append(check("other OCR settings miss", cache.get(content_hash(first), other_settings) is None))
+
+    stats = cache.stats()
+    results.append(check("hit and miss counters", stats["hits"] == 2 and stats["misses"] == 3, str(stats)))
+
+    small = OCRResultCache(max_bytes=1000)
+    for index in range(10):
+        small.put(f"page-{index}", SETTINGS, {"text": "x" * 200, "metadata": {}})
+    results.append(check("LRU keeps within max_bytes",
+                         small.stats()["bytes"] <= 1000 and small.get("page-0", SETTINGS) is None
+                         and small.get("page-9", SETTINGS) is not None, str(small.stats())))
+    return all(results)
+
+if __name__ == "__main__":
+    print("🔍 OCR result cache")
+    print("=" * 60)
+    passed = run_tests()
+    print("=" * 60)
+    print("✅ All checks passed" if passed else "❌ Some checks failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,113 @@
+"""
+Recovery checks for the persistent OCR worker pool: whatever happens to a job (an image that
+cannot be sent, an engine error, a worker that dies or hangs, a worker that cannot be
+restarted), the pool keeps its size and the next job is served; a job never waits forever
+for a free worker. Tesseract itself is not needed; without it every job ends in the
+engine's error, which still counts as served.
+Run from the backend directory: python test_ocr_pool.py
+"""
+
+import os
+import sys
+import time
+import signal
+
+import numpy as np
+
+from ocr_pool import OCRTimeoutError, OCRWorkerError, OCRWorkerPool
+
+PAGE = np.full((64, 256), 255, np.uint8)
+
+def check(name: str, passed: bool, detail: str = "") -> bool:
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+def served(pool: OCRWorkerPool) -> bool:
+    """True if a worker answered the job, with text or with the engine's error."""
+    try:
+        return isinstance(pool.image_to_string(PAGE, timeout=30), str)
+    except OCRWorkerError as e:
+        return not str(e).startswith("OCR worker died")
+
+def pids(pool: OCRWorkerPool) -> set:
+    return {worker.process.pid for worker in pool._workers}
+
+def healthy(pool: OCRWorkerPool) -> bool:
+    return (pool._idle.qsize() == pool.size and len(pool._workers) == pool.size
+            and all(worker.process.is_alive() for worker in pool._workers))
+
+def raises(call, error_type) -> bool:
+    try:
+        call()
+    except error_type:
+        return True
+    return False
+
+def run_tests() -> bool:
+    results = []
+    pool = OCRWorkerPool(size=2, job_timeout=30)
+    try:
+        results.append(check("jobs are served", served(pool) and healthy(pool)))
+        started = pids(pool)
+
+        # The job fails while being pickled, before anything reaches the worker
+        results.append(check("an image that cannot be sent raises",
+                             raises(lambda: pool.image_to_string(lambda: None), Exception)))
+        results.append(check("the worker goes back after a send error", healthy(pool) and pids(pool) == started))
+
+        results.append(check("an engine error keeps the worker",
+                             raises(lambda: pool.image_to_data(PAGE, psm=999), OCRWorkerError)))
+        results.append(check("workers are reused after engine errors", healthy(pool) and pids(pool) == started))
+
+        # The next idle worker is killed between jobs
+        victim = pool._idle.queue[0]
+        os.kill(victim.process.pid, signal.SIGKILL)
+        victim.process.join(timeout=5)
+        results.append(check("a job on a dead worker raises OCRWorkerError",
+                             raises(lambda: pool.image_to_string(PAGE), OCRWorkerError)))
+        results.append(check("a dead worker is replaced", healthy(pool) and victim.process.pid not in pids(pool)))
+
+        # The next idle worker hangs
+        victim = pool._idle.queue[0]
+        os.kill(victim.process.pid, signal.SIGSTOP)
+        started_at = time.perf_counter()
+        timed_out = raises(lambda: pool.image_to_string(PAGE, timeout=0.5), OCRTimeoutError)
+        results.append(check("a hung job times out", timed_out and time.perf_counter() - started_at < 10))
+        results.append(check("a hung worker is replaced", healthy(pool) and victim.process.pid not in pids(pool)))
+        results.append(check("jobs are served after recovery", served(pool) and served(pool) and healthy(pool)))
+
+        # A worker dies while no replacement can be started (e.g. out of processes)
+        spawn = pool._spawn
+        def failing_spawn():
+            raise OSError("cannot start process")
+        pool._spawn = failing_spawn
+        victim = pool._idle.queue[0]
+        os.kill(victim.process.pid, signal.SIGKILL)
+        victim.process.join(timeout=5)
+        died = raises(lambda: pool.image_to_string(PAGE), OCRWorkerError)
+        results.append(check("a failed restart keeps the worker's slot",
+                             died and pool._idle.qsize() == pool.size and len(pool._workers) == pool.size - 1))
+        pool._spawn = spawn
+        results.append(check("the slot gets a worker once one can be started",
+                             served(pool) and served(pool) and healthy(pool)))
+
+        # Every worker is busy for longer than a job may wait
+        pool.wait_timeout = 0.5
+        busy = [pool._idle.get() for _ in range(pool.size)]
+        started_at = time.perf_counter()
+        waited = raises(lambda: pool.image_to_string(PAGE), OCRTimeoutError)
+        results.append(check("waiting for a free worker times out", waited and time.perf_counter() - started_at < 5))
+        for worker in busy:
+            pool._idle.put(worker)
+    finally:
+        pool.close()
+    results.append(check("a closed pool refuses jobs", raises(lambda: pool.image_to_string(PAGE), OCRWorkerError)))
+    return all(results)
+
+if __name__ == "__main__":
+    print("🔍 OCR worker pool recovery")
+    print("=" * 60)
+    passed = run_tests()
+    print("=" * 60)
+    print("✅ All checks passed" if passed else "❌ Some checks failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,102 @@
+"""
+Parity check between the PyTorch and ONNX Runtime inference backends.
+Runs the BART summarizer, the BERT NER pipeline and Sentence-BERT on both backends over
+the same legal texts and compares outputs. fp32 ONNX should reproduce PyTorch: identical
+summaries and entities, embedding cosine similarity above 0.999. int8 quantisation trades
+a little accuracy for speed, so it is checked against looser thresholds.
+Needs transformers, torch, sentence-transformers and optimum[onnxruntime].
+Run from the backend directory: python test_onnx_parity.py [--int8]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import onnx_backend
+from onnx_backend import ONNX_AVAILABLE, load_summarization_pipeline, load_ner_pipeline, load_sentence_encoder
+from nlp_processing import SUMMARIZER_MODEL_NAME, SBERT_MODEL_NAME
+
+NER_MODEL_NAME = "dslim/bert-base-NER"
+
+SAMPLE_TEXTS = [
+    "This Lease Agreement is made on 1 March 2024 between Rahul Sharma of Mumbai and Priya Mehta of Pune. "
+    "The Tenant shall pay a monthly rent of Rs. 25,000 on or before the fifth day of each month. "
+    "If the rent remains unpaid for fifteen days, the Landlord may terminate this Agreement after written notice. "
+    "The security deposit of Rs. 1,00,000 shall be refunded within thirty days after the Tenant vacates.",
+    "Acme Corporation agrees to provide software maintenance services to Globex Ltd for a period of two years. "
+    "Either party may terminate this agreement for convenience by providing sixty days' prior written notice. "
+    "Any dispute arising hereunder shall be resolved through binding arbitration in Bengaluru under Indian law. "
+    "Confidential information must not be disclosed to any third party without prior written consent.",
+]
+
+def token_overlap(a: str, b: str) -> float:
+    """Unigram F1 between two summaries (a ROUGE-1 style agreement score)."""
+    a_tokens, b_tokens = a.lower().split(), b.lower().split()
+    common = sum(min(a_tokens.count(token), b_tokens.count(token)) for token in set(a_tokens))
+    if not common:
+        return 0.0
+    precision, recall = common / len(a_tokens), common / len(b_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+def entity_set(entities):
+    return {(entity["entity_group"], entity["word"]) for entity in entities}
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def check(name: str, passed: bool, detail: str) -> bool:
+    print(f"{'✅' if passed else '❌'} {name}: {detail}")
+    return passed
+
+def run_parity(quantize: bool) -> bool:
+    onnx_backend.ONNX_QUANTIZE = quantize
+    min_overlap, min_cosine, min_entity_match = (0.6, 0.98, 0.8) if quantize else (0.999, 0.999, 1.0)
+    results = []
+
+    print(f"--- Summarization ({SUMMARIZER_MODEL_NAME}) ---")
+    torch_summarizer = load_summarization_pipeline(SUMMARIZER_MODEL_NAME, backend="pytorch")
+    onnx_summarizer = load_summarization_pipeline(SUMMARIZER_MODEL_NAME, backend="onnx")
+    for index, text in enumerate(SAMPLE_TEXTS):
+        kwargs = dict(max_length=80, min_length=20, do_sample=False)
+        expected, torch_seconds = timed(torch_summarizer, text, **kwargs)
+        actual, onnx_seconds = timed(onnx_summarizer, text, **kwargs)
+        overlap = token_overlap(expected[0]["summary_text"], actual[0]["summary_text"])
+        results.append(check(f"summary {index}", overlap >= min_overlap,
+                             f"overlap {overlap:.3f}, pytorch {torch_seconds:.2f}s, onnx {onnx_seconds:.2f}s"))
+
+    print(f"--- NER ({NER_MODEL_NAME}) ---")
+    torch_ner = load_ner_pipeline(NER_MODEL_NAME, backend="pytorch")
+    onnx_ner = load_ner_pipeline(NER_MODEL_NAME, backend="onnx")
+    for index, text in enumerate(SAMPLE_TEXTS):
+        expected, torch_seconds = timed(torch_ner, text)
+        actual, onnx_seconds = timed(onnx_ner, text)
+        expected, actual = entity_set(expected), entity_set(actual)
+        match = len(expected & actual) / max(len(expected | actual), 1)
+        results.append(check(f"entities {index}", match >= min_entity_match,
+                             f"jaccard {match:.3f}, pytorch {torch_seconds:.3f}s, onnx {onnx_seconds:.3f}s"))
+
+    print(f"--- Sentence embeddings ({SBERT_MODEL_NAME}) ---")
+    sentences = [sentence.strip() for text in SAMPLE_TEXTS for sentence in text.split(". ") if sentence.strip()]
+    expected, torch_seconds = timed(load_sentence_encoder(SBERT_MODEL_NAME, backend="pytorch").encode, sentences)
+    actual, onnx_seconds = timed(load_sentence_encoder(SBERT_MODEL_NAME, backend="onnx").encode, sentences)
+    expected = expected / np.linalg.norm(expected, axis=1, keepdims=True)
+    cosine = np.sum(expected * actual, axis=1)
+    results.append(check("embeddings", float(cosine.min()) >= min_cosine,
+                         f"min cosine {cosine.min():.5f} over {len(sentences)} sentences, "
+                         f"pytorch {torch_seconds:.3f}s, onnx {onnx_seconds:.3f}s"))
+    return all(results)
+
+if __name__ == "__main__":
+    if not ONNX_AVAILABLE:
+        print("❌ optimum[onnxruntime] is not installed: pip install optimum[onnxruntime]")
+        sys.exit(1)
+    quantize = "--int8" in sys.argv
+    print(f"🔍 PyTorch vs ONNX Runtime ({'int8' if quantize else 'fp32'}) parity")
+    print("=" * 60)
+    passed = run_parity(quantize)
+    print("=" * 60)
+    print("✅ Outputs match" if passed else "❌ Outputs differ beyond tolerance")
+    sys.exit(0 if passed else 1)